@@ -1,30 +1,32 @@
+import logging
 from abc import ABC, abstractmethod
-import os
 
-from langchain_openai import ChatOpenAI
-from langchain_community.llms import Ollama
-from langchain.schema import HumanMessage
-from dotenv import load_dotenv
+from agents.utils.llm_factory import get_agent_llm
+from agents.utils.tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
 
 class BaseAgent(ABC):
     def __init__(self, name: str, description: str):
         self.name = name
         self.description = description
 
-        load_dotenv()
-        
-        # Check if we should use Ollama
-        use_ollama = os.getenv("USE_OLLAMA", "false").lower() == "true"
-        
-        if use_ollama:
-            ollama_url = os.getenv("OLLAMA_URL", "http://localhost:11434")
-            self.llm = Ollama(model="qwen2.5:latest", base_url=ollama_url)
-        else:
-            self.llm = ChatOpenAI(model="o4-mini")
+        # Shared client from the LLM factory (Ollama when USE_OLLAMA=true, otherwise OpenAI o4-mini),
+        # so creating an agent per node call no longer builds a new client or re-reads .env
+        self.llm = get_agent_llm()
 
     @abstractmethod
     def run(self, input: str) -> str:
         pass
 
+    def _log_prompt_tokens(self, input):
+        prompt_text = input.to_string() if hasattr(input, "to_string") else str(input)
+        logger.info(f"{self.name}: ~{estimate_tokens(prompt_text)} prompt tokens")
+
     def invoke(self, input: str) -> str:
+        self._log_prompt_tokens(input)
         return self.llm.invoke(input)
+
+    async def ainvoke(self, input: str, config: dict | None = None) -> str:
+        self._log_prompt_tokens(input)
+        return await self.llm.ainvoke(input, config=config)
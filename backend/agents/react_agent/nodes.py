@@ -1,5 +1,5 @@
-from langchain_openai import ChatOpenAI
 from langchain_core.tools import tool
+from langchain_core.runnables import RunnableConfig
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -11,55 +11,65 @@ from langgraph.prebuilt import tools_condition
 from langgraph.prebuilt import ToolNode
 
 import asyncio
+import os
+import tempfile
 
 from agents.utils.playwright_screenshot import capture_page_and_img_src
 
 from openai import OpenAI
-from agents.utils.images import encode_image
+from agents.utils.images import prepare_image
+from agents.utils.llm_factory import get_llm, bind_tools_cached
+from agents.utils.workspace import thread_id_from_config, workspace
 
+# The file tools write into the conversation's own workspace (agents/utils/workspace.py),
+# found from the thread_id in the run's config, atomically and off the event loop
 @tool
-def write_html(html_code: str) -> str:
+async def write_html(html_code: str, config: RunnableConfig) -> str:
     """
     Write HTML code to a file.
     """
-    with open("/Users/kodykendall/SoftEngineering/LLMPress/Simple/LlamaBotSimple/page.html", "w") as f:
-        f.write(html_code)
+    await workspace.awrite(thread_id_from_config(config), "page.html", html_code)
     return "HTML code written to page.html"
 
 @tool
-def write_css(css_code: str) -> str:
+async def write_css(css_code: str, config: RunnableConfig) -> str:
     """
     Write CSS code to a file.
     """
-    with open("/Users/kodykendall/SoftEngineering/LLMPress/Simple/LlamaBotSimple/assets/page.css", "w") as f:
-        f.write(css_code)
+    await workspace.awrite(thread_id_from_config(config), "assets/page.css", css_code)
     return "CSS code written to page.css"
 
 @tool
-def write_javascript(javascript_code: str) -> str:
+async def write_javascript(javascript_code: str, config: RunnableConfig) -> str:
     """
     Write JavaScript code to a file.
     """
-    with open("/Users/kodykendall/SoftEngineering/LLMPress/Simple/LlamaBotSimple/assets/page.js", "w") as f:
-        f.write(javascript_code)
+    await workspace.awrite(thread_id_from_config(config), "assets/page.js", javascript_code)
     return "JavaScript code written to page.js"
 
 
 @tool
-def get_screenshot_and_html_content_using_playwright(url: str) -> tuple[str, list[str]]:
+async def get_screenshot_and_html_content_using_playwright(url: str, config: RunnableConfig) -> tuple[str, list[str]]:
     """
     Get the screenshot and HTML content of a webpage using Playwright. Then, generate the HTML as a clone, and save it to the file system. 
     """
-    trimmed_html_content, image_sources = asyncio.run(capture_page_and_img_src(url, "assets/screenshot-of-page-to-clone.png"))
+    # Async, on the shared browser pool, so concurrent clones neither block a worker nor launch a browser each.
+    # Each call gets its own screenshot file so concurrent clones don't overwrite each other's.
+    fd, screenshot_path = tempfile.mkstemp(prefix="screenshot-of-page-to-clone-", suffix=".png")
+    os.close(fd)
+    try:
+        trimmed_html_content, image_sources = await capture_page_and_img_src(url, screenshot_path)
 
-    llm = ChatOpenAI(model="o3")
+        # Downscaled / tiled and re-encoded (JPEG by default) instead of the full-page PNG
+        screenshot_images = await asyncio.to_thread(prepare_image, screenshot_path)
+    finally:
+        os.remove(screenshot_path)
 
-    # Getting the Base64 string
-    base64_image = encode_image("assets/screenshot-of-page-to-clone.png")
+    llm = get_llm("openai", "o3")
 
     print(f"Making our call to o3 vision right now")
     
-    response = llm.invoke([
+    response = await llm.ainvoke([
         SystemMessage(content="""
             ### SYSTEM
 You are "Pixel-Perfect Front-End", a senior web-platform engineer who specialises in
@@ -98,13 +108,13 @@ No extra markdown, no explanations, no leading or trailing whitespace outside th
         """),
         HumanMessage(content=f"Here is the trimmed down HTML: {trimmed_html_content}"),
         HumanMessage(content=[
-            {"type": "text", "text": "Please clone this webpage based on the screenshot and HTML content provided."},
-            {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
+            {"type": "text", "text": "Please clone this webpage based on the screenshot and HTML content provided."
+                + (f" The screenshot is split into {len(screenshot_images)} parts, top to bottom." if len(screenshot_images) > 1 else "")},
+            *({"type": "image_url", "image_url": {"url": image.data_url}} for image in screenshot_images)
         ])
     ])
 
-    with open("/Users/kodykendall/SoftEngineering/LLMPress/Simple/LlamaBotSimple/page.html", "w") as f:
-        f.write(response.content)
+    await workspace.awrite(thread_id_from_config(config), "page.html", response.content)
     
     return "Cloned webpage written to file"
 
@@ -115,17 +125,22 @@ tools = [write_html, write_css, write_javascript, get_screenshot_and_html_conten
 sys_msg = SystemMessage(content="You are a helpful software_developer_assistant tasked with writing HTML, CSS, and JavaScript code to files. HTML is always written first, then CSS, then JavaScript. CSS will be written to assets/page.css and JavaScript will be written to assets/page.js, reference them accordingly in your generated code. If you are cloning a webpage, you will just write the final output directly into the single HTML page including the CSS and JavaScript in that single file.")
 
 # Node
-def software_developer_assistant(state: MessagesState):
-   llm = ChatOpenAI(model="o4-mini")
-   llm_with_tools = llm.bind_tools(tools)
-   return {"messages": [llm_with_tools.invoke([sys_msg] + state["messages"])]}
+# Async so the app can stream it with astream, and cancel the model call when the client disconnects
+async def software_developer_assistant(state: MessagesState, llm=None):
+   llm = llm or get_llm("openai", "o4-mini")
+   llm_with_tools = bind_tools_cached(llm, tools)  # bound once per llm, not on every step
+   return {"messages": [await llm_with_tools.ainvoke([sys_msg] + state["messages"])]}
 
-def build_workflow(checkpointer=None):
+def build_workflow(checkpointer=None, llm=None):
     # Graph
     builder = StateGraph(MessagesState)
 
     # Define nodes: these do the work
-    builder.add_node("software_developer_assistant", software_developer_assistant)
+    # If an llm is passed in (e.g. the app's Ollama model) the assistant uses it, otherwise it defaults to o4-mini
+    async def assistant_node(state: MessagesState):
+        return await software_developer_assistant(state, llm=llm)
+
+    builder.add_node("software_developer_assistant", assistant_node)
     builder.add_node("tools", ToolNode(tools))
 
     # Define edges: these determine how the control flow moves
@@ -0,0 +1,190 @@
+### Long-lived Playwright browser shared by the page-clone tool.
+"""
+Launching Chromium takes a second or more, and the clone tool used to launch (and close) a
+fresh browser on every call. The pool keeps one headless browser running and hands out
+pages from reusable browser contexts:
+
+  * at most BROWSER_POOL_MAX_PAGES pages are open at once; further callers wait their turn
+  * idle contexts are kept (up to BROWSER_POOL_MAX_IDLE_CONTEXTS) and reused with their
+    cookies cleared, and retired after BROWSER_CONTEXT_MAX_USES pages
+  * navigation and screenshots time out after BROWSER_NAVIGATION_TIMEOUT_MS and
+    BROWSER_SCREENSHOT_TIMEOUT_MS instead of hanging a request
+  * a browser that crashed or was closed is relaunched on the next call
+
+The browser belongs to the event loop it was launched on (the app's), so use the pool from
+async code only.
+
+Usage:
+
+async with get_browser_pool().page() as page:
+    await page.goto(url)
+    ...
+await close_browser_pool()   # on shutdown
+"""
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+
+from playwright.async_api import async_playwright
+
+logger = logging.getLogger(__name__)
+
+
+class BrowserPoolConfig:
+    MAX_PAGES = int(os.getenv("BROWSER_POOL_MAX_PAGES", "4"))
+    MAX_IDLE_CONTEXTS = int(os.getenv("BROWSER_POOL_MAX_IDLE_CONTEXTS", "4"))
+    CONTEXT_MAX_USES = int(os.getenv("BROWSER_CONTEXT_MAX_USES", "50"))
+    NAVIGATION_TIMEOUT_MS = float(os.getenv("BROWSER_NAVIGATION_TIMEOUT_MS", "30000"))
+    SCREENSHOT_TIMEOUT_MS = float(os.getenv("BROWSER_SCREENSHOT_TIMEOUT_MS", "30000"))
+
+
+class BrowserPool:
+    def __init__(self, max_pages: int = BrowserPoolConfig.MAX_PAGES,
+                 max_idle_contexts: int = BrowserPoolConfig.MAX_IDLE_CONTEXTS,
+                 context_max_uses: int = BrowserPoolConfig.CONTEXT_MAX_USES,
+                 navigation_timeout_ms: float = BrowserPoolConfig.NAVIGATION_TIMEOUT_MS,
+                 screenshot_timeout_ms: float = BrowserPoolConfig.SCREENSHOT_TIMEOUT_MS):
+        self.max_pages = max_pages
+        self.max_idle_contexts = max_idle_contexts
+        self.context_max_uses = context_max_uses
+        self.navigation_timeout_ms = navigation_timeout_ms
+        self.screenshot_timeout_ms = screenshot_timeout_ms
+        self._playwright = None
+        self._browser = None
+        self._lock = asyncio.Lock()
+        self._pages = asyncio.Semaphore(max_pages)
+        self._idle = []  # (context, uses) ready for reuse
+        self.open_pages = 0
+        self.waiting = 0
+        self.launches = 0
+        self.launch_seconds = 0.0
+        self.pages_served = 0
+        self.contexts_created = 0
+        self.contexts_reused = 0
+        self.errors = 0
+
+    async def _ensure_browser(self):
+        async with self._lock:
+            if self._browser is not None and self._browser.is_connected():
+                return self._browser
+            if self._browser is not None:
+                logger.warning("Playwright browser disconnected, relaunching")
+                self._idle.clear()
+            started = time.perf_counter()
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(headless=True)
+            self.launches += 1
+            self.launch_seconds += time.perf_counter() - started
+            logger.info(f"Launched headless Chromium in {time.perf_counter() - started:.2f}s")
+            return self._browser
+
+    async def _checkout_context(self):
+        browser = await self._ensure_browser()
+        while self._idle:
+            context, uses = self._idle.pop()
+            if context.browser is browser:
+                self.contexts_reused += 1
+                return context, uses
+        context = await browser.new_context()
+        context.set_default_navigation_timeout(self.navigation_timeout_ms)
+        context.set_default_timeout(self.screenshot_timeout_ms)
+        self.contexts_created += 1
+        return context, 0
+
+    async def _checkin_context(self, context, uses: int, healthy: bool):
+        if healthy and uses < self.context_max_uses and len(self._idle) < self.max_idle_contexts:
+            try:
+                # Don't leak one clone's cookies and permissions into the next
+                await context.clear_cookies()
+                await context.clear_permissions()
+                self._idle.append((context, uses))
+                return
+            except Exception as e:
+                logger.debug(f"Discarding browser context: {e}")
+        try:
+            await context.close()
+        except Exception:
+            pass
+
+    @asynccontextmanager
+    async def page(self):
+        """A fresh page in a reused context; the page is closed and the context returned on exit."""
+        self.waiting += 1
+        try:
+            await self._pages.acquire()
+        finally:
+            self.waiting -= 1
+        context, page, healthy = None, None, False
+        try:
+            context, uses = await self._checkout_context()
+            page = await context.new_page()
+            self.open_pages += 1
+            self.pages_served += 1
+            yield page
+            healthy = True
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            if page is not None:
+                self.open_pages -= 1
+                try:
+                    await page.close()
+                except Exception:
+                    healthy = False
+            if context is not None:
+                await self._checkin_context(context, uses + 1, healthy)
+            self._pages.release()
+
+    async def aclose(self):
+        async with self._lock:
+            for context, _ in self._idle:
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+            self._idle.clear()
+            if self._browser is not None:
+                try:
+                    await self._browser.close()
+                except Exception:
+                    pass
+                self._browser = None
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+
+    def stats(self) -> dict:
+        return {
+            "running": self._browser is not None and self._browser.is_connected(),
+            "max_pages": self.max_pages,
+            "open_pages": self.open_pages,
+            "waiting": self.waiting,
+            "idle_contexts": len(self._idle),
+            "launches": self.launches,
+            "avg_launch_ms": round(self.launch_seconds / self.launches * 1000, 1) if self.launches else None,
+            "pages_served": self.pages_served,
+            "contexts_created": self.contexts_created,
+            "contexts_reused": self.contexts_reused,
+            "errors": self.errors,
+        }
+
+
+_pool = None
+
+
+def get_browser_pool() -> BrowserPool:
+    global _pool
+    if _pool is None:
+        _pool = BrowserPool()
+    return _pool
+
+
+async def close_browser_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.aclose()
+        _pool = None
@@ -0,0 +1,287 @@
+### Per-node views of the current page, sized to a token budget.
+"""
+Every write_html_agent node used to receive the whole page verbatim, so a large page made
+every prompt large. page_view() gives each node only what it needs:
+
+  * router  -> a structural outline (tags, ids, classes, headings)
+  * respond -> the outline plus the sections most relevant to the user's message
+  * planner -> the outline plus the sections most relevant to the user's message
+  * writer  -> the full page, or (for line-numbered edits) a window of the relevant lines
+               keeping their original numbers
+
+A page that already fits a node's budget is passed through unchanged. Budgets are estimated
+tokens (see agents/utils/tokens.py) and can be set per node with CONTEXT_BUDGET_<NODE>_TOKENS.
+
+Usage:
+
+view = page_view("router", existing_html_content, user_message)
+numbered = numbered_page_view(existing_html_content, user_message)
+"""
+import os
+import re
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+
+from agents.utils.get_numbered_code_from_file import get_numbered_code
+from agents.utils.tokens import CHARS_PER_TOKEN, estimate_tokens
+
+
+class ContextBudgetConfig:
+    ROUTER_TOKENS = int(os.getenv("CONTEXT_BUDGET_ROUTER_TOKENS", "800"))
+    RESPOND_TOKENS = int(os.getenv("CONTEXT_BUDGET_RESPOND_TOKENS", "2000"))
+    PLANNER_TOKENS = int(os.getenv("CONTEXT_BUDGET_PLANNER_TOKENS", "4000"))
+    WRITER_TOKENS = int(os.getenv("CONTEXT_BUDGET_WRITER_TOKENS", "16000"))
+    OUTLINE_DEPTH = int(os.getenv("CONTEXT_OUTLINE_DEPTH", "5"))
+
+
+BUDGETS = {
+    "router": ContextBudgetConfig.ROUTER_TOKENS,
+    "respond": ContextBudgetConfig.RESPOND_TOKENS,
+    "planner": ContextBudgetConfig.PLANNER_TOKENS,
+    "writer": ContextBudgetConfig.WRITER_TOKENS,
+}
+
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+# Tags worth showing in an outline; inline formatting tags are left out
+OUTLINE_TAGS = {
+    "html", "head", "title", "style", "script", "body", "header", "nav", "main", "section", "article",
+    "aside", "footer", "div", "form", "table", "ul", "ol", "h1", "h2", "h3", "h4", "h5", "h6", "button",
+}
+TEXT_TAGS = {"title", "h1", "h2", "h3", "h4", "h5", "h6", "button"}
+TRUNCATED_MARKER = "... (rest of the page trimmed: token budget reached)"
+STOP_WORDS = {
+    "the", "and", "for", "with", "this", "that", "make", "please", "can", "you", "change", "add", "update",
+    "page", "site", "website", "html", "code", "section",
+}
+
+
+@dataclass
+class _Element:
+    tag: str
+    attrs: dict
+    depth: int
+    start_line: int
+    end_line: int = 0
+    text: str = ""
+    children: list = field(default_factory=list)
+
+
+class _Scanner(HTMLParser):
+    """Element tree with source line ranges; tolerant of unclosed tags."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.roots = []
+        self.stack = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_TAGS:
+            return
+        element = _Element(tag, dict(attrs), len(self.stack), self.getpos()[0])
+        (self.stack[-1].children if self.stack else self.roots).append(element)
+        self.stack.append(element)
+
+    def handle_endtag(self, tag):
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i].tag == tag:
+                for element in self.stack[i:]:
+                    element.end_line = self.getpos()[0]
+                del self.stack[i:]
+                return
+
+    def handle_data(self, data):
+        if self.stack and self.stack[-1].tag in TEXT_TAGS and len(self.stack[-1].text) < 80:
+            self.stack[-1].text = (self.stack[-1].text + " " + " ".join(data.split())).strip()[:80]
+
+
+def _parse(html: str) -> list[_Element]:
+    scanner = _Scanner()
+    scanner.feed(html)
+    scanner.close()
+    last_line = html.count("\n") + 1
+    for element in scanner.stack:
+        element.end_line = last_line
+    return scanner.roots
+
+
+def _describe(element: _Element) -> str:
+    label = element.tag
+    if element.attrs.get("id"):
+        label += f"#{element.attrs['id']}"
+    if element.attrs.get("class"):
+        label += "." + ".".join(element.attrs["class"].split()[:3])
+    if element.text:
+        label += f' "{element.text}"'
+    return label
+
+
+def outline(html: str, budget_tokens: int | None = None, max_depth: int = ContextBudgetConfig.OUTLINE_DEPTH) -> str:
+    """Indented tag outline with line ranges; repeated identical siblings are collapsed."""
+    lines = []
+
+    def walk(elements: list[_Element], depth: int):
+        previous, repeats = None, 0
+        for element in elements + [None]:
+            description = _describe(element) if element is not None and element.tag in OUTLINE_TAGS else None
+            if description is not None and description == previous:
+                repeats += 1
+                continue
+            if repeats:
+                lines[-1] += f" (x{repeats + 1})"
+            previous, repeats = description, 0
+            if element is None:
+                break
+            if description is None:
+                walk(element.children, depth)
+                continue
+            lines.append(f"{'  ' * depth}{description} [lines {element.start_line}-{element.end_line}]")
+            if depth + 1 < max_depth:
+                walk(element.children, depth + 1)
+
+    walk(_parse(html), 0)
+    text = "\n".join(lines)
+    if budget_tokens is not None:
+        text = truncate_to_budget(text, budget_tokens)
+    return text
+
+
+def truncate_to_budget(text: str, budget_tokens: int) -> str:
+    if estimate_tokens(text) <= budget_tokens:
+        return text
+    kept, used = [], 0
+    for line in text.splitlines():
+        used += estimate_tokens(line + "\n")
+        if used > budget_tokens:
+            kept.append("... (truncated)")
+            break
+        kept.append(line)
+    return "\n".join(kept)
+
+
+def _sections(html: str) -> list[_Element]:
+    """The page's top-level blocks: children of <head> and <body>, or the roots of a fragment."""
+    roots = _parse(html)
+    documents = [root for root in roots if root.tag == "html"] or [None]
+    containers = [child for child in (documents[0].children if documents[0] else roots) if child.tag in ("head", "body")]
+    if not containers:
+        return roots
+    return [section for container in containers for section in container.children]
+
+
+def _keywords(user_message: str) -> set[str]:
+    return {word for word in re.findall(r"[a-z0-9-]{3,}", (user_message or "").lower()) if word not in STOP_WORDS}
+
+
+def _score(section: _Element, lines: list[str], keywords: set[str]) -> int:
+    source = "\n".join(lines[section.start_line - 1:section.end_line]).lower()
+    # Match text, attribute values and CSS, not tag names ("section" would match every section)
+    source = re.sub(r"</?[a-z][\w-]*", " ", source)
+    return sum(1 for word in keywords if word in source)
+
+
+def _select_lines(html: str, user_message: str, budget_tokens: int, line_costs: list[int],
+                  only_relevant: bool = False) -> set[int]:
+    """Line numbers of the sections most relevant to the message that fit within budget.
+
+    Sections are taken whole, most relevant first; one too large to fit is opened up and its
+    children considered instead (keeping its own opening and closing lines).
+    """
+    lines = html.splitlines()
+    keywords = _keywords(user_message)
+    selected = set()
+    remaining = budget_tokens
+
+    def take(span) -> bool:
+        nonlocal remaining
+        span = [i for i in span if i not in selected and i <= len(line_costs)]
+        cost = sum(line_costs[i - 1] for i in span)
+        if cost > remaining:
+            return False
+        selected.update(span)
+        remaining -= cost
+        return True
+
+    def fit(sections: list[_Element]):
+        ranked = sorted(((_score(section, lines, keywords), section) for section in sections), key=lambda pair: -pair[0])
+        for score, section in ranked:
+            if only_relevant and not score:
+                break
+            if take(range(section.start_line, section.end_line + 1)) or not section.children:
+                continue
+            own_lines = set(range(section.start_line, section.end_line + 1))
+            for child in section.children:
+                own_lines -= set(range(child.start_line, child.end_line + 1))
+            if take(sorted(own_lines)):
+                fit(section.children)
+
+    fit(_sections(html))
+    return selected
+
+
+def _line_ranges(line_numbers: set[int]) -> list[tuple[int, int]]:
+    ranges = []
+    for line_number in sorted(line_numbers):
+        if ranges and ranges[-1][1] == line_number - 1:
+            ranges[-1] = (ranges[-1][0], line_number)
+        else:
+            ranges.append((line_number, line_number))
+    return ranges
+
+
+def relevant_sections_view(html: str, user_message: str, budget_tokens: int) -> str:
+    """Outline of the whole page followed by the most relevant sections, verbatim, within budget."""
+    parts = [f"Page outline:\n{outline(html, budget_tokens // 3)}"]
+    lines = html.splitlines()
+    remaining = budget_tokens - estimate_tokens(parts[0])
+    selected = _select_lines(html, user_message, remaining, [estimate_tokens(line) + 1 for line in lines], only_relevant=True)
+    for start, end in _line_ranges(selected):
+        parts.append(f"Lines {start}-{end}:\n" + "\n".join(lines[start - 1:end]))
+    return "\n\n".join(parts)
+
+
+def numbered_page_view(html: str, user_message: str = "", budget_tokens: int = ContextBudgetConfig.WRITER_TOKENS) -> str:
+    """The page with line numbers; over budget, only the relevant line ranges (original numbering kept)."""
+    numbered = get_numbered_code(html)
+    if estimate_tokens(numbered) <= budget_tokens:
+        return numbered
+
+    numbered_lines = numbered.splitlines()
+    line_costs = [estimate_tokens(line) + 1 for line in numbered_lines]
+    # Lines outside every section (doctype, <html>, <body> tags...) are always shown for orientation
+    keep = set(range(1, len(numbered_lines) + 1))
+    for section in _sections(html):
+        keep -= set(range(section.start_line, section.end_line + 1))
+    remaining = budget_tokens - sum(line_costs[i - 1] for i in keep)
+    keep |= _select_lines(html, user_message, remaining, line_costs)
+
+    view, shown_until = [], 0
+    for start, end in _line_ranges(keep):
+        if start > shown_until + 1:
+            view.append(f"... (lines {shown_until + 1}-{start - 1} omitted)")
+        view.extend(numbered_lines[start - 1:end])
+        shown_until = end
+    if shown_until < len(numbered_lines):
+        view.append(f"... (lines {shown_until + 1}-{len(numbered_lines)} omitted)")
+    return _fit_budget("\n".join(view), budget_tokens)
+
+
+def _fit_budget(text: str, budget_tokens: int) -> str:
+    """Hard cap: the lines outside every section are kept whatever they cost, and can be over
+    budget on their own (one long line, a huge <head>), so cut the view there, at a line end if possible."""
+    if estimate_tokens(text) <= budget_tokens:
+        return text
+    limit = max(0, int(budget_tokens * CHARS_PER_TOKEN) - len(TRUNCATED_MARKER) - 1)
+    cut = text.rfind("\n", 0, limit + 1)
+    return (text[:cut] if cut > 0 else text[:limit]) + "\n" + TRUNCATED_MARKER
+
+
+def page_view(node: str, html: str | None, user_message: str = "") -> str:
+    """What `node` (router, respond, planner or writer) gets to see of the current page."""
+    html = html or ""
+    budget = BUDGETS[node]
+    if estimate_tokens(html) <= budget or node == "writer":
+        # The writer regenerates the page from what it sees, so it always gets all of it
+        return html
+    if node == "router":
+        return outline(html, budget)
+    return relevant_sections_view(html, user_message, budget)
@@ -6,16 +6,22 @@ Usage:
 
 numbered = get_numbered_code_from_file("page.html")
 print(numbered)
+
+numbered = get_numbered_code("<html>\n<body></body>\n</html>")
 """
-def get_numbered_code_from_file(file_path: str) -> str:
+def get_numbered_code(code: str) -> str:
     numbered = [
         f"{i:05d}: {ln.rstrip()}"           # 5–6 digits = ≤ 999 999 lines
-        for i, ln in enumerate(open(file_path), 1)
+        for i, ln in enumerate(code.splitlines(), 1)
     ]
     return "\n".join(numbered)
 
+def get_numbered_code_from_file(file_path: str) -> str:
+    with open(file_path) as f:
+        return get_numbered_code(f.read())
+
 # Example Usage:
 # python agents/utils/get_numbered_code_from_file.py
 if __name__ == "__main__":   
     numbered = get_numbered_code_from_file("page.html")
-    print(numbered)
\ No newline at end of file
+    print(numbered)
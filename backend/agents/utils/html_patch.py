@@ -0,0 +1,113 @@
+### Line-numbered patches for editing an existing page instead of regenerating it.
+"""
+The model is shown the page with numbered lines (see get_numbered_code) and answers with
+edit blocks that reference those numbers:
+
+<<<REPLACE 12-15
+...new lines...
+>>>
+<<<INSERT_AFTER 20
+...new lines...
+>>>
+<<<DELETE 30-32
+>>>
+
+Line numbers always refer to the ORIGINAL page, so blocks can come in any order. All
+blocks are validated before any is applied: a block that is out of range, overlaps
+another one or is malformed raises PatchError and the page is left untouched.
+
+Usage:
+
+patches = parse_patches(model_output)
+new_html = apply_patches(existing_html, patches)
+"""
+import re
+from dataclasses import dataclass
+
+
+class PatchError(ValueError):
+    """The model output could not be applied as a patch."""
+
+
+@dataclass
+class Patch:
+    op: str          # REPLACE, INSERT_AFTER or DELETE
+    start: int       # first original line (1-based); for INSERT_AFTER the line to insert after (0 = top)
+    end: int         # last original line (inclusive); equals start for INSERT_AFTER
+    lines: list[str]
+
+
+_HEADER = re.compile(r"^<<<\s*(REPLACE|INSERT_AFTER|DELETE)\s+(\d+)(?:\s*-\s*(\d+))?\s*$")
+_FOOTER = ">>>"
+# Models sometimes echo the numbering prefix back ("00012: <div>"); strip it
+_NUMBER_PREFIX = re.compile(r"^\d{5,6}: ?")
+
+
+def parse_patches(text: str) -> list[Patch]:
+    patches = []
+    current = None
+    for line in text.splitlines():
+        if current is None:
+            stripped = line.strip()
+            if not stripped or stripped.startswith("```"):
+                continue
+            match = _HEADER.match(stripped)
+            if not match:
+                raise PatchError(f"Expected an edit block header, got: {stripped[:80]!r}")
+            op, start, end = match.group(1), int(match.group(2)), match.group(3)
+            end = int(end) if end else start
+            if op == "INSERT_AFTER" and match.group(3):
+                raise PatchError("INSERT_AFTER takes a single line number")
+            if end < start:
+                raise PatchError(f"Invalid line range {start}-{end}")
+            current = Patch(op, start, end, [])
+        elif line.strip() == _FOOTER:
+            if current.op == "DELETE" and any(l.strip() for l in current.lines):
+                raise PatchError(f"DELETE {current.start}-{current.end} must not contain lines")
+            if current.op == "DELETE":
+                current.lines = []
+            patches.append(current)
+            current = None
+        else:
+            current.lines.append(_NUMBER_PREFIX.sub("", line))
+    if current is not None:
+        raise PatchError(f"Unterminated {current.op} block at line {current.start}")
+    if not patches:
+        raise PatchError("No edit blocks found")
+    return patches
+
+
+def validate_patches(patches: list[Patch], line_count: int):
+    # Replaced/deleted ranges may not overlap, and nothing may be inserted inside them
+    spans = []
+    for patch in patches:
+        if patch.op == "INSERT_AFTER":
+            if not 0 <= patch.start <= line_count:
+                raise PatchError(f"INSERT_AFTER {patch.start} is outside the page (1-{line_count})")
+            continue
+        if patch.start < 1 or patch.end > line_count:
+            raise PatchError(f"{patch.op} {patch.start}-{patch.end} is outside the page (1-{line_count})")
+        spans.append((patch.start, patch.end))
+    spans.sort()
+    for (_, previous_end), (start, end) in zip(spans, spans[1:]):
+        if start <= previous_end:
+            raise PatchError(f"Edit blocks overlap at line {start}")
+    for patch in patches:
+        if patch.op == "INSERT_AFTER" and any(start <= patch.start < end for start, end in spans):
+            raise PatchError(f"INSERT_AFTER {patch.start} falls inside a replaced or deleted range")
+
+
+def apply_patches(original: str, patches: list[Patch]) -> str:
+    """Apply all patches to the original text, or raise PatchError without applying any."""
+    lines = original.splitlines()
+    validate_patches(patches, len(lines))
+    # Apply bottom-up so earlier line numbers stay valid; at equal positions, replacements
+    # go before inserts after that same line
+    ordered = sorted(patches, key=lambda p: (p.end, p.op == "INSERT_AFTER"), reverse=True)
+    for patch in ordered:
+        if patch.op == "INSERT_AFTER":
+            lines[patch.start:patch.start] = patch.lines
+        else:
+            lines[patch.start - 1:patch.end] = patch.lines
+    trailing_newline = "\n" if original.endswith("\n") else ""
+    return "\n".join(lines) + trailing_newline
@@ -0,0 +1,190 @@
+### Trim a cloned page's HTML down to what the vision model needs.
+"""
+The clone tool sends the page's DOM along with its screenshot, and real pages are mostly
+scripts, styles, SVGs and attributes the model never looks at. trim_html() keeps the
+structure, the visible text and the src/href/alt/title attributes:
+
+  * lxml (when installed) parses in C and the tree is trimmed in a single walk
+  * otherwise BeautifulSoup's html.parser does the same job, more slowly
+  * whitespace runs are collapsed (outside <pre>/<textarea>) and text nodes longer than
+    HTML_TRIM_MAX_TEXT_CHARS are cut
+  * output over HTML_TRIM_TOKEN_BUDGET (estimated) tokens is cut at a tag boundary
+
+Every call reports its input/output sizes and the estimated tokens saved.
+
+Usage:
+
+result = trim_html(html)
+result.html, result.tokens_saved
+"""
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass
+
+from agents.utils.tokens import CHARS_PER_TOKEN, estimate_tokens
+
+try:
+    import lxml.html
+    from lxml import etree
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class HtmlTrimConfig:
+    # "auto" (lxml when installed), "lxml" or "bs4"
+    ENGINE = os.getenv("HTML_TRIM_ENGINE", "auto").lower()
+    MAX_TEXT_CHARS = int(os.getenv("HTML_TRIM_MAX_TEXT_CHARS", "500"))
+    TOKEN_BUDGET = int(os.getenv("HTML_TRIM_TOKEN_BUDGET", "12000"))
+
+
+DROP_TAGS = {"script", "meta", "noscript", "iframe", "svg", "canvas", "video", "audio", "link", "style", "template"}
+ALLOWED_ATTRS = {"src", "href", "alt", "title"}
+PRESERVE_WHITESPACE = {"pre", "textarea"}
+TRUNCATED_MARKER = "<!-- trimmed: token budget reached -->"
+
+_WHITESPACE = re.compile(r"\s+")
+
+_stats = {"calls": 0, "input_bytes": 0, "output_bytes": 0, "tokens_saved": 0, "seconds": 0.0, "engines": {}}
+
+
+@dataclass
+class TrimResult:
+    html: str
+    engine: str
+    input_bytes: int
+    output_bytes: int
+    input_tokens: int
+    output_tokens: int
+    truncated: bool
+    seconds: float
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.input_tokens - self.output_tokens
+
+    def stats(self) -> dict:
+        return {
+            "engine": self.engine,
+            "input_bytes": self.input_bytes,
+            "output_bytes": self.output_bytes,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "tokens_saved": self.tokens_saved,
+            "truncated": self.truncated,
+            "ms": round(self.seconds * 1000, 1),
+        }
+
+
+def _clean_text(text: str | None, max_text_chars: int, collapse: bool = True) -> str | None:
+    if not text:
+        return text
+    if collapse:
+        text = _WHITESPACE.sub(" ", text)
+    if max_text_chars and len(text) > max_text_chars:
+        text = text[:max_text_chars] + "…"
+    return text
+
+
+def _trim_lxml(html: str, max_text_chars: int) -> str:
+    root = lxml.html.document_fromstring(html)
+    dropped = []
+    for element in root.iter():
+        # Text anywhere inside a <pre> (e.g. <pre><code>...</code></pre>) keeps its whitespace
+        preserved = next(element.iterancestors(*PRESERVE_WHITESPACE), None) is not None
+        element.tail = _clean_text(element.tail, max_text_chars, not preserved)  # kept even when the element is dropped
+        # Comments and processing instructions have a function, not a string, as their tag
+        if not isinstance(element.tag, str) or element.tag in DROP_TAGS:
+            dropped.append(element)
+            continue
+        for attr in element.attrib.keys():
+            if attr not in ALLOWED_ATTRS:
+                del element.attrib[attr]
+        collapse = not preserved and element.tag not in PRESERVE_WHITESPACE
+        element.text = _clean_text(element.text, max_text_chars, collapse)
+    for element in dropped:
+        if element.getparent() is not None:
+            element.drop_tree()  # keeps the element's tail text
+    return etree.tostring(root, encoding="unicode", method="html")
+
+
+def _trim_bs4(html: str, max_text_chars: int) -> str:
+    from bs4 import BeautifulSoup, Comment, NavigableString
+
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup.find_all(DROP_TAGS):
+        tag.decompose()
+    for comment in soup.find_all(string=lambda text: isinstance(text, Comment)):
+        comment.extract()
+    for tag in soup.find_all(True):
+        tag.attrs = {attr: value for attr, value in tag.attrs.items() if attr in ALLOWED_ATTRS}
+    for text in soup.find_all(string=True):
+        if isinstance(text, NavigableString) and text.parent is not None:
+            collapse = text.find_parent(PRESERVE_WHITESPACE) is None
+            cleaned = _clean_text(str(text), max_text_chars, collapse)
+            if cleaned != text:
+                text.replace_with(cleaned)
+    return str(soup)
+
+
+def _fit_budget(html: str, token_budget: int) -> tuple[str, bool]:
+    if not token_budget or estimate_tokens(html) <= token_budget:
+        return html, False
+    limit = int(token_budget * CHARS_PER_TOKEN) - len(TRUNCATED_MARKER)
+    cut = html.rfind(">", 0, limit) + 1  # don't cut inside a tag
+    return html[:cut] + TRUNCATED_MARKER, True
+
+
+def trim_html(html: str, engine: str = HtmlTrimConfig.ENGINE, max_text_chars: int = HtmlTrimConfig.MAX_TEXT_CHARS,
+              token_budget: int = HtmlTrimConfig.TOKEN_BUDGET) -> TrimResult:
+    started = time.perf_counter()
+    use_lxml = LXML_AVAILABLE and engine in ("auto", "lxml")
+    if engine == "lxml" and not LXML_AVAILABLE:
+        logger.warning("HTML_TRIM_ENGINE=lxml but lxml isn't installed, using BeautifulSoup")
+
+    trimmed = None
+    if use_lxml and html.strip():
+        try:
+            trimmed, used = _trim_lxml(html, max_text_chars), "lxml"
+        except (etree.ParserError, ValueError) as e:
+            logger.warning(f"lxml couldn't parse the page, falling back to BeautifulSoup: {e}")
+    if trimmed is None:
+        trimmed, used = _trim_bs4(html, max_text_chars), "bs4"
+    trimmed, truncated = _fit_budget(trimmed, token_budget)
+
+    result = TrimResult(
+        html=trimmed,
+        engine=used,
+        input_bytes=len(html.encode()),
+        output_bytes=len(trimmed.encode()),
+        input_tokens=estimate_tokens(html),
+        output_tokens=estimate_tokens(trimmed),
+        truncated=truncated,
+        seconds=time.perf_counter() - started,
+    )
+    _stats["calls"] += 1
+    _stats["input_bytes"] += result.input_bytes
+    _stats["output_bytes"] += result.output_bytes
+    _stats["tokens_saved"] += result.tokens_saved
+    _stats["seconds"] += result.seconds
+    _stats["engines"][used] = _stats["engines"].get(used, 0) + 1
+    logger.info(f"Trimmed HTML with {used}: {result.input_bytes} -> {result.output_bytes} bytes, "
+                f"~{result.tokens_saved} tokens saved{' (truncated)' if truncated else ''} in {result.seconds * 1000:.0f}ms")
+    return result
+
+
+def trim_stats() -> dict:
+    calls = _stats["calls"]
+    return {
+        "calls": calls,
+        "engines": dict(_stats["engines"]),
+        "input_bytes": _stats["input_bytes"],
+        "output_bytes": _stats["output_bytes"],
+        "reduction": round(1 - _stats["output_bytes"] / _stats["input_bytes"], 3) if _stats["input_bytes"] else None,
+        "tokens_saved": _stats["tokens_saved"],
+        "avg_ms": round(_stats["seconds"] / calls * 1000, 1) if calls else None,
+    }
@@ -1,6 +1,164 @@
+### Prepare screenshots for vision model calls.
+"""
+Full-page screenshots of long pages are huge PNGs (several MB of base64), and vision models
+downscale anything that large themselves anyway. prepare_image() turns a screenshot into one
+or more compact images ready to send:
+
+  * wider than VISION_IMAGE_MAX_WIDTH -> scaled down to that width
+  * taller than VISION_IMAGE_MAX_DIMENSION -> cut into tiles top to bottom, at most
+    VISION_IMAGE_MAX_TILES (the page is scaled down further if it would need more)
+  * re-encoded as VISION_IMAGE_FORMAT (jpeg or webp) at VISION_IMAGE_QUALITY, with the
+    matching mime type, then base64 encoded for a data URL
+
+Results are cached by a hash of the screenshot's bytes and the settings, so the same
+screenshot is only ever processed once. Without Pillow installed the screenshot is sent
+as-is, with its real mime type.
+
+Usage:
+
+images = prepare_image("assets/screenshot.png")
+content = [{"type": "image_url", "image_url": {"url": image.data_url}} for image in images]
+"""
 import base64
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+try:
+    from PIL import Image
+    PILLOW_AVAILABLE = True
+except ImportError:
+    PILLOW_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+class ImageConfig:
+    MAX_WIDTH = int(os.getenv("VISION_IMAGE_MAX_WIDTH", "1280"))
+    MAX_DIMENSION = int(os.getenv("VISION_IMAGE_MAX_DIMENSION", "2048"))
+    MAX_TILES = int(os.getenv("VISION_IMAGE_MAX_TILES", "4"))
+    FORMAT = os.getenv("VISION_IMAGE_FORMAT", "jpeg").lower()  # jpeg or webp
+    QUALITY = int(os.getenv("VISION_IMAGE_QUALITY", "80"))
+    CACHE_SIZE = int(os.getenv("VISION_IMAGE_CACHE_SIZE", "32"))
+
+
+MIME_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp", "png": "image/png", "gif": "image/gif"}
+
+_cache = OrderedDict()  # (sha256, settings) -> list[PreparedImage], least recently used first
+_stats = {"prepared": 0, "cache_hits": 0, "input_bytes": 0, "output_bytes": 0, "tiles": 0, "seconds": 0.0}
+_lock = threading.Lock()  # around _cache and _stats: prepare_image runs in asyncio.to_thread workers
+
+
+@dataclass(frozen=True)
+class PreparedImage:
+    mime_type: str
+    data: str  # base64
+    width: int | None = None
+    height: int | None = None
+
+    @property
+    def data_url(self) -> str:
+        return f"data:{self.mime_type};base64,{self.data}"
+
+
+def sniff_mime_type(header: bytes) -> str:
+    """Mime type from the file's magic bytes (file extensions and labels lie)."""
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return MIME_TYPES["png"]
+    if header.startswith(b"\xff\xd8\xff"):
+        return MIME_TYPES["jpeg"]
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return MIME_TYPES["webp"]
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+        return MIME_TYPES["gif"]
+    return "application/octet-stream"
+
 
 # Function to encode the image
 def encode_image(image_path):
     with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode("utf-8")
\ No newline at end of file
+        return base64.b64encode(image_file.read()).decode("ascii")
+
+
+def _encode_tile(tile, image_format: str, quality: int) -> PreparedImage:
+    if image_format == "jpeg" and tile.mode != "RGB":
+        tile = tile.convert("RGB")  # JPEG has no alpha channel
+    buffer = io.BytesIO()
+    tile.save(buffer, format=image_format.upper(), quality=quality, optimize=image_format == "jpeg")
+    with _lock:
+        _stats["output_bytes"] += buffer.tell()
+    return PreparedImage(MIME_TYPES[image_format], base64.b64encode(buffer.getbuffer()).decode("ascii"), tile.width, tile.height)
+
+
+def _prepare(raw: bytes, max_width: int, max_dimension: int, max_tiles: int, image_format: str, quality: int) -> list[PreparedImage]:
+    with Image.open(io.BytesIO(raw)) as image:
+        image.load()
+        width, height = image.size
+        scale = min(1.0, max_width / width, max_dimension * max_tiles / height)
+        if scale < 1.0:
+            image = image.resize((max(1, round(width * scale)), max(1, round(height * scale))), Image.LANCZOS)
+        tiles = []
+        for top in range(0, image.height, max_dimension):
+            tile = image.crop((0, top, image.width, min(top + max_dimension, image.height)))
+            tiles.append(_encode_tile(tile, image_format, quality))
+        return tiles
+
+
+def prepare_image(image_path: str, max_width: int = ImageConfig.MAX_WIDTH, max_dimension: int = ImageConfig.MAX_DIMENSION,
+                  max_tiles: int = ImageConfig.MAX_TILES, image_format: str = ImageConfig.FORMAT,
+                  quality: int = ImageConfig.QUALITY) -> list[PreparedImage]:
+    """The screenshot as compact, vision-ready images (one per tile, top to bottom)."""
+    if image_format not in ("jpeg", "webp"):
+        raise ValueError(f"Unsupported VISION_IMAGE_FORMAT '{image_format}', use jpeg or webp")
+    with open(image_path, "rb") as image_file:
+        raw = image_file.read()
+
+    key = (hashlib.sha256(raw).hexdigest(), max_width, max_dimension, max_tiles, image_format, quality)
+    with _lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+            _stats["cache_hits"] += 1
+            return cached
+
+    # Prepared outside the lock: two workers may both miss on the same screenshot, which only costs time
+    started = time.perf_counter()
+    if PILLOW_AVAILABLE:
+        images = _prepare(raw, max_width, max_dimension, max_tiles, image_format, quality)
+    else:
+        logger.warning("Pillow isn't installed, sending the screenshot without resizing or re-encoding")
+        with _lock:
+            _stats["output_bytes"] += len(raw)
+        images = [PreparedImage(sniff_mime_type(raw[:16]), base64.b64encode(raw).decode("ascii"))]
+    seconds = time.perf_counter() - started
+    logger.info(f"Prepared {image_path} ({len(raw)} bytes) as {len(images)} {images[0].mime_type} image(s), "
+                f"{sum(len(image.data) for image in images)} base64 chars, in {seconds * 1000:.0f}ms")
+
+    with _lock:
+        _stats["input_bytes"] += len(raw)
+        _stats["prepared"] += 1
+        _stats["tiles"] += len(images)
+        _stats["seconds"] += seconds
+        _cache[key] = images
+        while len(_cache) > ImageConfig.CACHE_SIZE:
+            _cache.popitem(last=False)
+    return images
+
+
+def image_stats() -> dict:
+    with _lock:
+        stats, cached = dict(_stats), len(_cache)
+    prepared = stats["prepared"]
+    return {
+        "prepared": prepared,
+        "cache_hits": stats["cache_hits"],
+        "cached": cached,
+        "tiles": stats["tiles"],
+        "input_bytes": stats["input_bytes"],
+        "output_bytes": stats["output_bytes"],
+        "avg_ms": round(stats["seconds"] / prepared * 1000, 1) if prepared else None,
+    }
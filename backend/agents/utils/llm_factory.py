@@ -0,0 +1,86 @@
+### Process-wide pool of LLM clients.
+"""
+Constructing a ChatOpenAI / Ollama client builds a fresh HTTP client (and connection pool)
+each time, and BaseAgent used to re-read .env on every construction. get_llm() returns one
+shared client per (provider, model, parameters), so every agent and node reuses the same
+warm connections. bind_tools_cached() does the same for tool-bound models.
+
+Usage:
+
+llm = get_llm("openai", "o4-mini")
+llm_with_tools = bind_tools_cached(llm, tools)
+"""
+import os
+import threading
+
+from dotenv import load_dotenv
+
+# Read .env once per process instead of once per agent
+load_dotenv()
+
+
+class LLMConfig:
+    USE_OLLAMA = os.getenv("USE_OLLAMA", "false").lower() == "true"
+    OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+    OLLAMA_AGENT_MODEL = os.getenv("OLLAMA_AGENT_MODEL", "qwen2.5:latest")
+    OPENAI_AGENT_MODEL = os.getenv("OPENAI_AGENT_MODEL", "o4-mini")
+
+
+_clients = {}
+_bound = {}
+_lock = threading.Lock()
+_stats = {"hits": 0, "creates": 0, "bind_hits": 0, "binds": 0}
+
+
+def _create(provider: str, model: str, params: dict):
+    # Provider SDKs are imported on first use so unused providers cost nothing
+    if provider == "openai":
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(model=model, **params)
+    if provider == "ollama":
+        from langchain_ollama import ChatOllama
+        return ChatOllama(model=model, **params)
+    if provider == "ollama_completion":
+        from langchain_community.llms import Ollama
+        return Ollama(model=model, **params)
+    raise ValueError(f"Unknown LLM provider '{provider}'")
+
+
+def get_llm(provider: str, model: str, **params):
+    """Shared client for this provider/model/parameters, created on first use."""
+    key = (provider, model, tuple(sorted(params.items())))
+    with _lock:
+        llm = _clients.get(key)
+        if llm is not None:
+            _stats["hits"] += 1
+            return llm
+        llm = _create(provider, model, params)
+        _clients[key] = llm
+        _stats["creates"] += 1
+        return llm
+
+
+def get_agent_llm():
+    """The model BaseAgent subclasses use: Ollama when USE_OLLAMA=true, otherwise OpenAI o4-mini."""
+    if LLMConfig.USE_OLLAMA:
+        return get_llm("ollama_completion", LLMConfig.OLLAMA_AGENT_MODEL, base_url=LLMConfig.OLLAMA_URL)
+    return get_llm("openai", LLMConfig.OPENAI_AGENT_MODEL)
+
+
+def bind_tools_cached(llm, tools: list):
+    """llm.bind_tools(tools), computed once per (llm, tool set)."""
+    key = (id(llm), tuple(getattr(tool, "name", repr(tool)) for tool in tools))
+    with _lock:
+        cached = _bound.get(key)
+        # Keep the llm in the value so its id cannot be reused by another object while cached
+        if cached is not None and cached[0] is llm:
+            _stats["bind_hits"] += 1
+            return cached[1]
+        bound = llm.bind_tools(tools)
+        _bound[key] = (llm, bound)
+        _stats["binds"] += 1
+        return bound
+
+
+def stats() -> dict:
+    return {"clients": len(_clients), "bound": len(_bound), **_stats}
@@ -0,0 +1,185 @@
+### Local cache for LangSmith hub prompts.
+"""
+hub.pull() is a network round trip (or two) per call, and the write_html_agent nodes used
+to call it on every execution. pull_prompt() serves prompts from an in-memory TTL cache
+backed by an on-disk snapshot directory:
+
+  * memory hit (not expired)  -> returned immediately
+  * miss                      -> hub.pull(), then cached in memory and snapshotted to disk
+  * hub unreachable           -> the last snapshot on disk is used instead
+  * PROMPT_CACHE_OFFLINE=true -> never touches the network, snapshots only
+
+Pinned versions (PROMPT_PINS="llamabot/respond_to_user:abc123,...") pull that exact commit.
+A pinned commit never changes, so pinned prompts never expire.
+
+Usage:
+
+prompt = pull_prompt("llamabot/respond_to_user")
+prompt = await apull_prompt("llamabot/respond_to_user")   # from async code: a miss pulls in a worker thread
+"""
+import asyncio
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from langchain import hub
+from langchain_core.load import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "prompt_snapshots")
+
+
+class PromptCacheConfig:
+    TTL_SECONDS = float(os.getenv("PROMPT_CACHE_TTL_SECONDS", "3600"))
+    SNAPSHOT_DIR = os.getenv("PROMPT_SNAPSHOT_DIR", DEFAULT_SNAPSHOT_DIR)
+    OFFLINE = os.getenv("PROMPT_CACHE_OFFLINE", "false").lower() == "true"
+    PINS = os.getenv("PROMPT_PINS", "")
+    PREWARM = os.getenv(
+        "PROMPT_PREWARM",
+        "llamabot/determine_user_intent,llamabot/design_planning_prompt,llamabot/respond_to_user,llamabot/after_planning_generate_html",
+    )
+
+
+def _parse_pins(pins: str) -> dict[str, str]:
+    parsed = {}
+    for pin in filter(None, (p.strip() for p in pins.split(","))):
+        name, _, commit = pin.partition(":")
+        if commit:
+            parsed[name] = commit
+    return parsed
+
+
+class PromptCache:
+    def __init__(self, ttl_seconds: float = PromptCacheConfig.TTL_SECONDS,
+                 snapshot_dir: str = PromptCacheConfig.SNAPSHOT_DIR,
+                 offline: bool = PromptCacheConfig.OFFLINE, pins: str = PromptCacheConfig.PINS):
+        self.ttl_seconds = ttl_seconds
+        self.snapshot_dir = snapshot_dir
+        self.offline = offline
+        self.pins = _parse_pins(pins)
+        self._cache = {}  # ref -> (prompt, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.remote_pulls = 0
+        self.snapshot_loads = 0
+        self.errors = 0
+
+    def _ref(self, name: str) -> str:
+        """The hub reference to pull: "owner/name" or "owner/name:commit" when pinned."""
+        if ":" in name or name not in self.pins:
+            return name
+        return f"{name}:{self.pins[name]}"
+
+    def _snapshot_path(self, ref: str) -> str:
+        return os.path.join(self.snapshot_dir, ref.replace("/", "__").replace(":", "@") + ".json")
+
+    def _write_snapshot(self, ref: str, prompt):
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        path = self._snapshot_path(ref)
+        # Write to a temp file and rename, so a crash never leaves a half-written snapshot
+        fd, tmp_path = tempfile.mkstemp(dir=self.snapshot_dir, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            f.write(dumps(prompt, pretty=True))
+        os.replace(tmp_path, path)
+
+    def _read_snapshot(self, ref: str):
+        with open(self._snapshot_path(ref)) as f:
+            prompt = loads(f.read())
+        self.snapshot_loads += 1
+        return prompt
+
+    def cached(self, name: str):
+        """The prompt if it's in memory and not expired (counted as a hit), else None. Never does I/O."""
+        ref = self._ref(name)
+        with self._lock:
+            cached = self._cache.get(ref)
+            if cached is not None and cached[1] > time.time():
+                self.hits += 1
+                return cached[0]
+        return None
+
+    def get(self, name: str):
+        ref = self._ref(name)
+        now = time.time()
+        with self._lock:
+            cached = self._cache.get(ref)
+            if cached is not None and cached[1] > now:
+                self.hits += 1
+                return cached[0]
+            self.misses += 1
+
+        if self.offline:
+            prompt = self._read_snapshot(ref)
+        else:
+            try:
+                prompt = hub.pull(ref)
+                self.remote_pulls += 1
+                try:
+                    self._write_snapshot(ref, prompt)
+                except OSError as e:
+                    logger.warning(f"Could not snapshot prompt {ref}: {e}")
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"hub.pull({ref}) failed, using local snapshot: {e}")
+                try:
+                    prompt = self._read_snapshot(ref)
+                except FileNotFoundError:
+                    raise e
+
+        expires_at = float("inf") if ":" in ref else now + self.ttl_seconds
+        with self._lock:
+            self._cache[ref] = (prompt, expires_at)
+        return prompt
+
+    def warm(self, names: list[str] | None = None) -> int:
+        """Load prompts ahead of the first request. Returns how many were loaded."""
+        if names is None:
+            names = [n.strip() for n in PromptCacheConfig.PREWARM.split(",") if n.strip()]
+        loaded = 0
+        for name in names:
+            try:
+                self.get(name)
+                loaded += 1
+            except Exception as e:
+                logger.warning(f"Could not pre-warm prompt {name}: {e}")
+        return loaded
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "cached": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "remote_pulls": self.remote_pulls,
+            "snapshot_loads": self.snapshot_loads,
+            "errors": self.errors,
+            "offline": self.offline,
+            "pins": self.pins,
+        }
+
+
+# Process-wide cache shared by all agents
+prompt_cache = PromptCache()
+
+
+def pull_prompt(name: str):
+    """Drop-in replacement for hub.pull(name) that goes through the prompt cache."""
+    return prompt_cache.get(name)
+
+
+async def apull_prompt(name: str):
+    """pull_prompt() for the event loop: memory hits are returned directly, anything that may
+    reach hub.pull() or the snapshot files runs in a worker thread."""
+    prompt = prompt_cache.cached(name)
+    if prompt is not None:
+        return prompt
+    return await asyncio.to_thread(prompt_cache.get, name)
@@ -0,0 +1,115 @@
+### Tests for the line-numbered HTML patches (run from backend/: python -m pytest agents/utils)
+import pytest
+
+from agents.utils.html_patch import Patch, PatchError, apply_patches, parse_patches
+from agents.utils.workspace import Workspace
+
+PAGE = "\n".join(f"<p>line {n}</p>" for n in range(1, 11)) + "\n"
+
+
+def test_patches_apply_against_original_line_numbers():
+    patches = parse_patches("""
+<<<DELETE 9-10
+>>>
+<<<REPLACE 2-3
+<p>new 2</p>
+>>>
+<<<INSERT_AFTER 0
+<!DOCTYPE html>
+>>>
+""")
+    lines = apply_patches(PAGE, patches).splitlines()
+    assert lines[:4] == ["<!DOCTYPE html>", "<p>line 1</p>", "<p>new 2</p>", "<p>line 4</p>"]
+    assert lines[-1] == "<p>line 8</p>"
+
+
+def test_echoed_line_numbers_are_stripped():
+    patches = parse_patches("<<<REPLACE 1\n00001: <h1>Title</h1>\n>>>")
+    assert apply_patches(PAGE, patches).splitlines()[0] == "<h1>Title</h1>"
+
+
+@pytest.mark.parametrize("blocks", [
+    "<<<REPLACE 2-5\n<p>a</p>\n>>>\n<<<DELETE 4-6\n>>>",
+    "<<<REPLACE 3-3\n<p>a</p>\n>>>\n<<<REPLACE 3\n<p>b</p>\n>>>",
+    "<<<DELETE 2-6\n>>>\n<<<INSERT_AFTER 4\n<p>inside</p>\n>>>",
+])
+def test_overlapping_ranges_are_rejected(blocks):
+    with pytest.raises(PatchError):
+        apply_patches(PAGE, parse_patches(blocks))
+
+
+def test_adjacent_ranges_are_not_overlapping():
+    patches = parse_patches("<<<REPLACE 2-3\n<p>a</p>\n>>>\n<<<DELETE 4-5\n>>>\n<<<INSERT_AFTER 3\n<p>b</p>\n>>>")
+    assert apply_patches(PAGE, patches).splitlines()[:4] == ["<p>line 1</p>", "<p>a</p>", "<p>b</p>", "<p>line 6</p>"]
+
+
+@pytest.mark.parametrize("patch", [
+    Patch("REPLACE", 0, 1, ["x"]),
+    Patch("REPLACE", 10, 11, ["x"]),
+    Patch("DELETE", 11, 11, []),
+    Patch("INSERT_AFTER", 11, 11, ["x"]),
+])
+def test_out_of_range_lines_are_rejected(patch):
+    with pytest.raises(PatchError, match="outside the page"):
+        apply_patches(PAGE, [patch])
+
+
+def test_insert_after_last_line():
+    assert apply_patches(PAGE, [Patch("INSERT_AFTER", 10, 10, ["<footer></footer>"])]).endswith("<footer></footer>\n")
+
+
+def test_empty_replacement_removes_the_lines():
+    patches = parse_patches("<<<REPLACE 2-9\n>>>")
+    assert patches[0].lines == []
+    assert apply_patches(PAGE, patches) == "<p>line 1</p>\n<p>line 10</p>\n"
+
+
+@pytest.mark.parametrize("output", [
+    "",
+    "Sure! Here is the updated page: <html></html>",
+    "<<<REPLACE 3\n<p>never closed</p>",
+    "<<<DELETE 2-3\n<p>not allowed</p>\n>>>",
+    "<<<REPLACE 5-2\n>>>",
+    "<<<INSERT_AFTER 2-3\n<p>x</p>\n>>>",
+])
+def test_malformed_output_is_rejected(output):
+    with pytest.raises(PatchError):
+        parse_patches(output)
+
+
+class _FakeWriter:
+    """Stands in for WriteHtmlCode: canned patch output and full regeneration, no model calls."""
+
+    def __init__(self, patch_output: str):
+        self.patch_output = patch_output
+        self.full_runs = 0
+
+    def run_edit(self, user_message, existing_html_content, design_plan):
+        return self.patch_output
+
+    def run(self, user_message, existing_html_content, design_plan):
+        self.full_runs += 1
+        return "<html><body>regenerated</body></html>"
+
+
+@pytest.mark.parametrize("patch_output, mode, full_runs", [
+    ("<<<REPLACE 1\n<h1>patched</h1>\n>>>", "patch", 0),
+    ("<<<REPLACE 40-41\n<h1>out of range</h1>\n>>>", "fallback", 1),
+    ("<<<REPLACE 1-3\n>>>\n<<<DELETE 2\n>>>", "fallback", 1),
+    ("Here's your new page!", "fallback", 1),
+])
+def test_write_html_code_falls_back_to_full_regeneration(monkeypatch, tmp_path, patch_output, mode, full_runs):
+    write_html_code = pytest.importorskip("agents.write_html_agent.write_html_code")
+    writer = _FakeWriter(patch_output)
+    monkeypatch.setattr(write_html_code, "WriteHtmlCode", lambda: writer)
+    monkeypatch.setattr(write_html_code, "HTML_EDIT_MODE", "patch")
+    monkeypatch.setattr(write_html_code, "workspace", Workspace(str(tmp_path)))
+
+    state = {"initial_user_message": "make the title bold", "existing_html_content": PAGE, "design_plan": "", "messages": []}
+    result = write_html_code.write_html_code_node(state, {"configurable": {"thread_id": "t1"}})
+
+    assert result["html_edit_stats"]["mode"] == mode
+    assert writer.full_runs == full_runs
+    expected = "<html><body>regenerated</body></html>" if full_runs else "<h1>patched</h1>\n" + PAGE.split("\n", 1)[1]
+    assert result["final_html_content"] == expected
+    assert (tmp_path / "t1" / "page.html").read_text() == expected
@@ -0,0 +1,76 @@
+### Tests for the per-thread workspace and its revision log (run from backend/: python -m pytest agents/utils)
+import multiprocessing
+import os
+
+import pytest
+
+from agents.utils.workspace import Workspace, WorkspaceError, content_hash
+
+
+def test_writes_are_versioned_and_identical_writes_are_no_ops(tmp_path):
+    workspace = Workspace(str(tmp_path))
+    first = workspace.write("t1", "page.html", "<p>one</p>")
+    assert workspace.write("t1", "page.html", "<p>one</p>") == first
+    workspace.write("t1", "page.html", "<p>two</p>")
+    assert [entry["sha256"] for entry in workspace.revisions("t1", "page.html")] == [content_hash("<p>one</p>"), content_hash("<p>two</p>")]
+    assert workspace.read("t1", "page.html") == "<p>two</p>"
+    assert workspace.read_revision("t1", first["sha256"]) == "<p>one</p>"
+    assert "-<p>one</p>" in workspace.diff("t1", "page.html", first["sha256"])
+    assert workspace.stats()["unchanged_writes"] == 1
+
+
+def test_trimming_keeps_the_latest_revisions_of_each_file(tmp_path):
+    workspace = Workspace(str(tmp_path), max_revisions=3)
+    for n in range(6):
+        workspace.write("t1", "page.html", f"<p>{n}</p>")
+        if n < 2:
+            workspace.write("t1", "assets/page.css", f"p {{ order: {n} }}")
+    assert [entry["sha256"] for entry in workspace.revisions("t1", "page.html")] == [content_hash(f"<p>{n}</p>") for n in (3, 4, 5)]
+    # Another file's revisions aren't trimmed by this one's writes
+    assert len(workspace.revisions("t1", "assets/page.css")) == 2
+    stored = set(os.listdir(tmp_path / "t1" / ".revisions")) - {"log.jsonl", ".lock"}
+    assert stored == {entry["sha256"] for entry in workspace.revisions("t1")}
+    with pytest.raises(WorkspaceError):
+        workspace.diff("t1", "page.html", content_hash("<p>0</p>"))
+
+
+def test_trimming_keeps_content_still_used_by_a_later_revision(tmp_path):
+    workspace = Workspace(str(tmp_path), max_revisions=2)
+    for content in ("<p>a</p>", "<p>b</p>", "<p>a</p>", "<p>c</p>"):
+        workspace.write("t1", "page.html", content)
+    assert workspace.read_revision("t1", content_hash("<p>a</p>")) == "<p>a</p>"
+    assert workspace.read_revision("t1", content_hash("<p>b</p>")) is None
+
+
+def _write_revisions(root: str, name: str):
+    workspace = Workspace(root, max_revisions=5)
+    for n in range(100):
+        workspace.write("t1", name, f"{name} {n}")
+
+
+def test_writers_in_other_processes_keep_the_log_consistent(tmp_path):
+    names = ["a.html", "b.html", "c.html"]
+    processes = [multiprocessing.Process(target=_write_revisions, args=(str(tmp_path), name)) for name in names]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    workspace = Workspace(str(tmp_path), max_revisions=5)
+    for name in names:
+        revisions = workspace.revisions("t1", name)
+        assert [entry["sha256"] for entry in revisions] == [content_hash(f"{name} {n}") for n in range(95, 100)]
+        assert all(workspace.read_revision("t1", entry["sha256"]) is not None for entry in revisions)
+
+
+@pytest.mark.parametrize("name", ["../other/page.html", "/etc/passwd", ".revisions/log.jsonl"])
+def test_names_outside_the_workspace_are_rejected(tmp_path, name):
+    with pytest.raises(WorkspaceError):
+        Workspace(str(tmp_path)).path("t1", name)
+
+
+def test_delete_removes_files_and_revisions(tmp_path):
+    workspace = Workspace(str(tmp_path))
+    workspace.write("t1", "page.html", "<p>one</p>")
+    assert workspace.delete("t1")
+    assert not workspace.delete("t1")
+    assert workspace.revisions("t1") == [] and workspace.read("t1", "page.html") is None
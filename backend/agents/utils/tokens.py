@@ -0,0 +1,20 @@
+### Cheap token-count estimates for prompt budgeting and reporting.
+"""
+Exact counts need the model's own tokenizer, which we don't have for every provider (and
+loading one per call is slow). About 4 characters per token holds well enough for English
+prose and HTML to budget prompts and report savings.
+
+Usage:
+
+estimate_tokens("<div>Hello</div>")  # -> 4
+"""
+import math
+import os
+
+CHARS_PER_TOKEN = float(os.getenv("TOKEN_ESTIMATE_CHARS_PER_TOKEN", "4"))
+
+
+def estimate_tokens(text: str | None) -> int:
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
@@ -0,0 +1,271 @@
+### Per-thread workspace for the generated page files (page.html, assets/page.css, ...).
+"""
+The agents used to write their output to hard-coded paths shared by every conversation, so
+concurrent threads overwrote each other and readers could see half-written files. Each
+thread now gets its own directory under WORKSPACE_ROOT:
+
+  <root>/<thread_id>/page.html
+  <root>/<thread_id>/assets/page.css
+  <root>/<thread_id>/.revisions/<sha256>          every version ever written, stored once
+  <root>/<thread_id>/.revisions/log.jsonl         {"name", "sha256", "bytes", "at"} per write
+  <root>/<thread_id>/.revisions/.lock             flock()ed around writes, log trims and deletes
+
+Writes go to a temp file in the same directory and are os.replace()d into place, so a
+reader sees either the old file or the new one, never a partial write. The MCP server
+writes the same directories from its own process, so writers serialize on the thread's
+lock file as well as on an in-process lock. Writing the same content again is a no-op. The a*-prefixed methods run the file I/O in a worker thread so
+they don't block the event loop.
+
+Usage:
+
+thread_id = thread_id_from_config(config)
+revision = await workspace.awrite(thread_id, "page.html", html)
+html = await workspace.aread(thread_id, "page.html")
+workspace.revisions(thread_id, "page.html")           # oldest first
+workspace.diff(thread_id, "page.html", old_sha256)    # unified diff against the current file
+workspace.add_listener(lambda thread_id, name, revision, path: ...)  # called after each write
+workspace.delete(thread_id)                           # the whole directory, revisions included
+"""
+import asyncio
+import difflib
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within the process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Thread used when a request doesn't name one (matches /chat-message's default)
+DEFAULT_THREAD_ID = "5"
+DEFAULT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "workspace")
+REVISIONS_DIR = ".revisions"
+LOCK_FILE = ".lock"
+_SAFE_THREAD_ID = re.compile(r"^[A-Za-z0-9_.-]{1,128}$")
+
+
+class WorkspaceConfig:
+    ROOT = os.getenv("WORKSPACE_ROOT", DEFAULT_ROOT)
+    # Revisions kept in each thread's log per file (stored contents are shared between entries)
+    MAX_REVISIONS = int(os.getenv("WORKSPACE_MAX_REVISIONS", "50"))
+
+
+class WorkspaceError(ValueError):
+    """Bad thread id, file name or revision."""
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def thread_id_from_config(config: dict | None) -> str:
+    """The graph run's thread_id (tools and nodes get it through their RunnableConfig)."""
+    return ((config or {}).get("configurable") or {}).get("thread_id") or DEFAULT_THREAD_ID
+
+
+class Workspace:
+    def __init__(self, root: str = WorkspaceConfig.ROOT, max_revisions: int = WorkspaceConfig.MAX_REVISIONS):
+        self.root = os.path.abspath(root)
+        self.max_revisions = max_revisions
+        self._locks = defaultdict(threading.Lock)  # thread dir -> lock around writes and the log
+        self._stats = {"writes": 0, "unchanged_writes": 0, "reads": 0, "bytes_written": 0, "deleted_threads": 0}
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """callback(thread_id, name, revision, path) after every write that changed a file.
+
+        Writes usually happen in a worker thread, so callbacks must be thread-safe and quick."""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def thread_dir(self, thread_id: str) -> str:
+        thread_id = str(thread_id)
+        if not _SAFE_THREAD_ID.match(thread_id) or thread_id in (".", ".."):
+            # Arbitrary ids still get a stable directory, just not one they can name directly
+            thread_id = "t-" + content_hash(thread_id)[:32]
+        return os.path.join(self.root, thread_id)
+
+    def path(self, thread_id: str, name: str) -> str:
+        """Absolute path of `name` in the thread's workspace; refuses to leave it."""
+        base = self.thread_dir(thread_id)
+        path = os.path.normpath(os.path.join(base, name))
+        parts = os.path.relpath(path, base).split(os.sep)
+        if os.path.isabs(name) or parts[0] in ("..", REVISIONS_DIR):
+            raise WorkspaceError(f"Invalid workspace file name '{name}'")
+        return path
+
+    def _revision_path(self, thread_id: str, sha256: str) -> str:
+        if not re.fullmatch(r"[0-9a-f]{64}", sha256 or ""):
+            raise WorkspaceError(f"Invalid revision '{sha256}'")
+        return os.path.join(self.thread_dir(thread_id), REVISIONS_DIR, sha256)
+
+    @contextmanager
+    def _lock(self, thread_id: str):
+        """Hold the thread's in-process lock and, where supported, an flock() other processes honour."""
+        thread_dir = self.thread_dir(thread_id)
+        with self._locks[thread_dir]:
+            if fcntl is None:
+                yield
+                return
+            lock_path = os.path.join(thread_dir, REVISIONS_DIR, LOCK_FILE)
+            while True:
+                os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+                fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                    try:
+                        # Another process may have deleted the thread (and the lock file) while we waited
+                        current = os.stat(lock_path).st_ino
+                    except FileNotFoundError:
+                        current = None
+                    if current == os.fstat(fd).st_ino:
+                        yield
+                        return
+                finally:
+                    os.close(fd)  # also releases the flock
+
+    @staticmethod
+    def _atomic_write(path: str, content: str):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def read(self, thread_id: str, name: str) -> str | None:
+        self._stats["reads"] += 1
+        try:
+            with open(self.path(thread_id, name), encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def write(self, thread_id: str, name: str, content: str) -> dict:
+        """Atomically replace the file and record a revision; returns the log entry."""
+        path = self.path(thread_id, name)
+        sha256 = content_hash(content)
+        with self._lock(thread_id):
+            latest = self.revisions(thread_id, name)[-1:]
+            if latest and latest[0]["sha256"] == sha256 and os.path.exists(path):
+                self._stats["unchanged_writes"] += 1
+                return latest[0]
+
+            revision_path = self._revision_path(thread_id, sha256)
+            if not os.path.exists(revision_path):
+                self._atomic_write(revision_path, content)
+            self._atomic_write(path, content)
+
+            entry = {"name": name, "sha256": sha256, "bytes": len(content.encode()), "at": time.time()}
+            self._append_log(thread_id, name, entry)
+            self._stats["writes"] += 1
+            self._stats["bytes_written"] += entry["bytes"]
+        logger.info(f"Workspace {os.path.basename(self.thread_dir(thread_id))}/{name}: wrote revision {sha256[:12]} ({entry['bytes']} bytes)")
+        for listener in list(self._listeners):
+            try:
+                listener(thread_id, name, entry, path)
+            except Exception as e:
+                logger.warning(f"Workspace listener failed: {e}")
+        return entry
+
+    def log_path(self, thread_id: str) -> str:
+        return os.path.join(self.thread_dir(thread_id), REVISIONS_DIR, "log.jsonl")
+
+    def _read_log(self, thread_id: str) -> list[dict]:
+        try:
+            with open(self.log_path(thread_id), encoding="utf-8") as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def _append_log(self, thread_id: str, name: str, entry: dict):
+        log = self._read_log(thread_id) + [entry]
+        kept, trimmed = [], []
+        for position, existing in enumerate(log):
+            later = sum(1 for other in log[position + 1:] if other["name"] == existing["name"])
+            (kept if later < self.max_revisions else trimmed).append(existing)
+        if trimmed:
+            self._atomic_write(self.log_path(thread_id), "".join(json.dumps(e) + "\n" for e in kept))
+            still_used = {e["sha256"] for e in kept}
+            for old in {e["sha256"] for e in trimmed} - still_used:
+                try:
+                    os.remove(self._revision_path(thread_id, old))
+                except FileNotFoundError:
+                    pass
+        else:
+            os.makedirs(os.path.dirname(self.log_path(thread_id)), exist_ok=True)
+            with open(self.log_path(thread_id), "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def revisions(self, thread_id: str, name: str | None = None) -> list[dict]:
+        """Revision log entries for the thread (optionally one file), oldest first."""
+        return [entry for entry in self._read_log(thread_id) if name is None or entry["name"] == name]
+
+    def read_revision(self, thread_id: str, sha256: str) -> str | None:
+        try:
+            with open(self._revision_path(thread_id, sha256), encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def diff(self, thread_id: str, name: str, from_sha256: str, to_sha256: str | None = None) -> str:
+        """Unified diff between two revisions of `name` (to the current file by default)."""
+        before = self.read_revision(thread_id, from_sha256)
+        after = self.read(thread_id, name) if to_sha256 is None else self.read_revision(thread_id, to_sha256)
+        if before is None or after is None:
+            raise WorkspaceError(f"Unknown revision of '{name}'")
+        return "".join(difflib.unified_diff(
+            before.splitlines(keepends=True), after.splitlines(keepends=True),
+            fromfile=f"{name}@{from_sha256[:12]}", tofile=f"{name}@{(to_sha256 or 'current')[:12]}",
+        ))
+
+    def delete(self, thread_id: str) -> bool:
+        """Remove the thread's directory and its revisions; False if it had none."""
+        thread_dir = self.thread_dir(thread_id)
+        if not os.path.isdir(thread_dir):
+            return False
+        with self._lock(thread_id):
+            if not os.path.isdir(thread_dir):
+                return False
+            shutil.rmtree(thread_dir)
+            self._stats["deleted_threads"] += 1
+        self._locks.pop(thread_dir, None)
+        return True
+
+    async def aread(self, thread_id: str, name: str) -> str | None:
+        return await asyncio.to_thread(self.read, thread_id, name)
+
+    async def awrite(self, thread_id: str, name: str, content: str) -> dict:
+        return await asyncio.to_thread(self.write, thread_id, name, content)
+
+    async def adelete(self, thread_id: str) -> bool:
+        return await asyncio.to_thread(self.delete, thread_id)
+
+    def stats(self) -> dict:
+        return {"root": self.root, "max_revisions": self.max_revisions, **self._stats}
+
+
+workspace = Workspace()
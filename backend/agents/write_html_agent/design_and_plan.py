@@ -1,22 +1,36 @@
 from agents.base_agent import BaseAgent
 from langsmith import Client
 import os
-from langchain import hub
+from agents.utils.prompt_cache import apull_prompt, pull_prompt
+from agents.utils.context_budget import page_view
+from agents.write_html_agent import speculation
 from agents.write_html_agent.state import State
 
 class DesignAndPlan(BaseAgent):
     def __init__(self):
         super().__init__("Design and Plan Agent", "A design and plan agent that designs and plans a project.")
 
+    def build_prompt(self, user_message: str, existing_html_content: str, prompt=None):
+        prompt = prompt or pull_prompt("llamabot/design_planning_prompt")
+        return prompt.invoke({"user_message": user_message, "existing_html_content": existing_html_content})
+
     def run(self, user_message: str, existing_html_content: str) -> str:
-        prompt = hub.pull("llamabot/design_planning_prompt")
-        prompt_value = prompt.invoke({"user_message": user_message, "existing_html_content": existing_html_content})
-        intent_response = self.invoke(prompt_value)
+        intent_response = self.invoke(self.build_prompt(user_message, existing_html_content))
         return intent_response.content
 
-def design_and_plan_node(state: State) -> State:
-    agent = DesignAndPlan()
-    design_plan = agent.run(state.get("initial_user_message"), state.get("existing_html_content"))
+    async def arun(self, user_message: str, existing_html_content: str, config: dict | None = None) -> str:
+        prompt = await apull_prompt("llamabot/design_planning_prompt")  # a cache miss must not block the event loop
+        intent_response = await self.ainvoke(self.build_prompt(user_message, existing_html_content, prompt), config=config)
+        return intent_response.content
+
+async def design_and_plan_node(state: State) -> State:
+    # Reuse the plan the router already started speculatively, if its prediction held
+    speculative = speculation.take(state.get("speculation_id"), "design_and_plan")
+    if speculative is not None:
+        design_plan = await speculative
+    else:
+        user_message = state.get("initial_user_message")
+        design_plan = await DesignAndPlan().arun(user_message, page_view("planner", state.get("existing_html_content"), user_message))
     
     return {
         "design_plan": design_plan
@@ -24,4 +38,4 @@ def design_and_plan_node(state: State) -> State:
 
 if __name__ == "__main__":
     agent = DesignAndPlan()
-    print(agent.run("Hello, world!", ""))
\ No newline at end of file
+    print(agent.run("Hello, world!", ""))
@@ -1,6 +1,6 @@
+import asyncio
 from typing import Annotated
 
-from langchain_openai import ChatOpenAI
 from typing_extensions import TypedDict
 
 from langgraph.graph import StateGraph, START
@@ -18,11 +18,9 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-def build_workflow():
+def build_workflow(checkpointer=None):
     graph_builder = StateGraph(State)
 
-    llm = ChatOpenAI(model="o4-mini")
-
     # The first argument is the unique node name
     # The second argument is the function or object that will be called whenever
     # the node is used.
@@ -44,12 +42,12 @@ def build_workflow():
 
     graph_builder.add_edge("design_and_plan", "write_html_code")
 
-    graph = graph_builder.compile()
+    graph = graph_builder.compile(checkpointer=checkpointer)
     
     return graph
 
 # Only run this code when the file is executed directly
 if __name__ == "__main__":
     graph = build_workflow()
-    output = graph.invoke({"messages": [HumanMessage(content="Please change this background to white")]})
+    output = asyncio.run(graph.ainvoke({"messages": [HumanMessage(content="Please change this background to white")]}))
     print(output)
\ No newline at end of file
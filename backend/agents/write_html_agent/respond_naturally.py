@@ -1,7 +1,9 @@
 from agents.base_agent import BaseAgent
 from langsmith import Client
 import os
-from langchain import hub
+from agents.utils.prompt_cache import apull_prompt, pull_prompt
+from agents.utils.context_budget import page_view
+from agents.write_html_agent import speculation
 from agents.write_html_agent.state import State
 from langchain.schema import HumanMessage
 
@@ -9,15 +11,27 @@ class RespondNaturally(BaseAgent):
     def __init__(self):
         super().__init__("Respond Naturally Agent", "A agent that responds naturally to a user's message.")
 
+    def build_prompt(self, user_message: str, existing_html_content: str, prompt=None):
+        prompt = prompt or pull_prompt("llamabot/respond_to_user")
+        return prompt.invoke({"user_message": user_message, "existing_html_content": existing_html_content})
+
     def run(self, user_message: str, existing_html_content: str) -> str:
-        prompt = hub.pull("llamabot/respond_to_user")
-        prompt_value = prompt.invoke({"user_message": user_message, "existing_html_content": existing_html_content})
-        intent_response = self.invoke(prompt_value)
+        intent_response = self.invoke(self.build_prompt(user_message, existing_html_content))
         return intent_response.content
 
-def respond_naturally_node(state: State) -> State:
-    agent = RespondNaturally()
-    return_response = agent.run(state.get("initial_user_message"), state.get("existing_html_content"))
+    async def arun(self, user_message: str, existing_html_content: str, config: dict | None = None) -> str:
+        prompt = await apull_prompt("llamabot/respond_to_user")  # a cache miss must not block the event loop
+        intent_response = await self.ainvoke(self.build_prompt(user_message, existing_html_content, prompt), config=config)
+        return intent_response.content
+
+async def respond_naturally_node(state: State) -> State:
+    # Reuse the response the router already started speculatively, if its prediction held
+    speculative = speculation.take(state.get("speculation_id"), "respond_naturally")
+    if speculative is not None:
+        return_response = await speculative
+    else:
+        user_message = state.get("initial_user_message")
+        return_response = await RespondNaturally().arun(user_message, page_view("respond", state.get("existing_html_content"), user_message))
     
     # Get existing messages or empty list if none
     existing_messages = state.get("messages", [])
@@ -28,4 +42,4 @@ def respond_naturally_node(state: State) -> State:
 
 if __name__ == "__main__":
     agent = RespondNaturally()
-    print(agent.run("Hello, world!", ""))
\ No newline at end of file
+    print(agent.run("Hello, world!", ""))
@@ -1,32 +1,112 @@
+import re
+import time
+
 from agents.base_agent import BaseAgent
 from langsmith import Client
 import os
-from langchain import hub
+from agents.utils.prompt_cache import apull_prompt, pull_prompt
+from agents.utils.context_budget import page_view
+from agents.write_html_agent import speculation
+from agents.write_html_agent.design_and_plan import DesignAndPlan
+from agents.write_html_agent.respond_naturally import RespondNaturally
 from agents.write_html_agent.state import State
 
+# Speculative branches never stream tokens: a mispredicted answer must not reach the user.
+# The branch node emits the finished result once the prediction is confirmed.
+NOSTREAM = {"tags": ["nostream"]}
+
+WRITE_VERBS = (
+    "make", "create", "build", "add", "change", "update", "remove", "delete", "edit", "fix", "replace", "move",
+    "set", "turn", "put", "insert", "design", "generate", "write", "rewrite", "redesign", "resize", "center",
+    "align", "style", "restyle", "rename", "swap", "use", "give", "include", "convert",
+)
+WRITE_WORDS = {
+    "html", "css", "page", "website", "site", "landing", "layout", "section", "header", "footer", "navbar", "nav",
+    "button", "background", "color", "colour", "font", "image", "logo", "form", "table", "menu", "hero", "card",
+    "bigger", "smaller", "bold", "padding", "margin", "border", "dark", "theme", "animation", "responsive",
+}
+# Verbs like "use", "give" or "set" open plenty of plain questions ("give me an example of..."), so a
+# leading verb only skips the LLM router when the message also names something on the page
+PAGE_NOUNS = {
+    "html", "css", "page", "website", "site", "landing", "layout", "section", "header", "footer", "navbar", "nav",
+    "button", "background", "font", "image", "logo", "form", "table", "menu", "hero", "card", "theme",
+}
+GREETINGS = {"hi", "hello", "hey", "thanks", "thank", "thx", "ok", "okay", "cool", "great", "nice", "bye", "yo", "sup"}
+QUESTION_WORDS = ("what", "why", "how", "who", "when", "where", "which", "is", "are", "do", "does", "can", "could", "should")
+
+def classify_intent_fast(user_message: str) -> tuple[str, bool]:
+    """Keyword guess at the next node, and whether the guess is confident enough to skip the LLM router."""
+    words = re.findall(r"[a-z']+", (user_message or "").lower())
+    if not words:
+        return "respond_naturally", True
+    write_signals = sum(1 for word in words if word in WRITE_WORDS)
+    if words[0] in WRITE_VERBS or (words[0] == "please" and len(words) > 1 and words[1] in WRITE_VERBS):
+        return "design_and_plan", any(word in PAGE_NOUNS for word in words)
+    if len(words) <= 5 and words[0] in GREETINGS and not write_signals:
+        return "respond_naturally", True
+    if words[0] in QUESTION_WORDS and not write_signals:
+        return "respond_naturally", True
+    return ("design_and_plan" if write_signals else "respond_naturally"), False
+
 class RouteInitialUserMessage(BaseAgent):
     def __init__(self):
         super().__init__("Route Initial User Message Agent", "A agent that routes the initial user message to the appropriate agent.")
 
+    def build_prompt(self, user_message: str, existing_html_content: str, prompt=None):
+        prompt = prompt or pull_prompt("llamabot/determine_user_intent")
+        return prompt.invoke({"user_message": user_message, "existing_html_content": existing_html_content})
+
     def run(self, user_message: str, existing_html_content: str) -> str:
-        prompt = hub.pull("llamabot/determine_user_intent")
-        prompt_value = prompt.invoke({"user_message": user_message, "existing_html_content": existing_html_content})
-        intent_response = self.invoke(prompt_value)
+        intent_response = self.invoke(self.build_prompt(user_message, existing_html_content))
         return intent_response.content
 
-def route_initial_user_message_node(state: State) -> State:
-    agent = RouteInitialUserMessage()
-    user_intent = agent.run(state.get("initial_user_message"), state.get("existing_html_content"))
+    async def arun(self, user_message: str, existing_html_content: str, config: dict | None = None) -> str:
+        prompt = await apull_prompt("llamabot/determine_user_intent")  # a cache miss must not block the event loop
+        intent_response = await self.ainvoke(self.build_prompt(user_message, existing_html_content, prompt), config=config)
+        return intent_response.content
+
+async def route_with_llm(user_message: str, existing_html_content: str) -> str:
+    started = time.perf_counter()
+    # Classifying intent only needs the page's structure, not all of it
+    user_intent = await RouteInitialUserMessage().arun(user_message, page_view("router", existing_html_content, user_message))
+    speculation.record_latency("llm", time.perf_counter() - started)
+    return "design_and_plan" if user_intent.strip() == "WRITE_CODE" else "respond_naturally"
 
-    if user_intent == "WRITE_CODE":
-        return {
-            "next": "design_and_plan"
-        }
+def speculate(node: str, user_message: str, existing_html_content: str) -> str:
+    if node == "design_and_plan":
+        coroutine = DesignAndPlan().arun(user_message, page_view("planner", existing_html_content, user_message), config=NOSTREAM)
     else:
-        return {
-            "next": "respond_naturally"
-        }
+        coroutine = RespondNaturally().arun(user_message, page_view("respond", existing_html_content, user_message), config=NOSTREAM)
+    return speculation.start(node, coroutine)
+
+async def route_initial_user_message_node(state: State) -> State:
+    user_message = state.get("initial_user_message")
+    existing_html_content = state.get("existing_html_content")
+
+    if speculation.ROUTING_MODE == "llm":
+        speculation.record_decision("llm")
+        return {"next": await route_with_llm(user_message, existing_html_content), "speculation_id": None}
+
+    started = time.perf_counter()
+    predicted, confident = classify_intent_fast(user_message)
+    speculation.record_latency("rules", time.perf_counter() - started)
+    if confident or speculation.ROUTING_MODE == "rules":
+        speculation.record_decision("rules")
+        return {"next": predicted, "speculation_id": None}
+
+    # Not sure: start the likely branch now and let the LLM router confirm or overrule it
+    speculation_id = speculate(predicted, user_message, existing_html_content)
+    try:
+        routed = await route_with_llm(user_message, existing_html_content)
+    except BaseException:
+        speculation.cancel(speculation_id, mispredicted=False)
+        raise
+    speculation.record_decision("llm")
+    if routed != predicted:
+        speculation.cancel(speculation_id)
+        return {"next": routed, "speculation_id": None}
+    return {"next": routed, "speculation_id": speculation_id}
 
 if __name__ == "__main__":
     agent = RouteInitialUserMessage()
-    print(agent.run("Hello, world!", ""))
\ No newline at end of file
+    print(agent.run("Hello, world!", ""))
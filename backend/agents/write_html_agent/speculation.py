@@ -0,0 +1,111 @@
+### Speculative execution of the write_html_agent branch nodes, plus routing metrics.
+"""
+With ROUTING_MODE=speculative the router starts the branch it thinks is most likely
+(respond_naturally or design_and_plan) while the LLM router is still deciding. The running
+branch is parked here under a speculation id that goes into the graph state:
+
+  * prediction confirmed -> the branch node picks up the result with take()
+  * misprediction        -> the router cancels the speculative task, the right branch runs
+
+Speculations that are never picked up (e.g. the run was cancelled between the router and
+the branch) are cancelled by their own timer SPECULATION_TTL_SECONDS after they started.
+
+Usage:
+
+speculation_id = start("respond_naturally", coroutine)
+task = take(speculation_id, "respond_naturally")   # None if there is nothing to reuse
+"""
+import asyncio
+import os
+import uuid
+
+# "llm": always ask the LLM router (one extra LLM round trip before any branch starts)
+# "rules": keyword rules only, no LLM round trip
+# "speculative": rules when they're confident, otherwise the LLM router runs alongside the likely branch
+ROUTING_MODE = os.getenv("ROUTING_MODE", "speculative").lower()
+SPECULATION_TTL_SECONDS = float(os.getenv("SPECULATION_TTL_SECONDS", "120"))
+
+_speculations = {}  # speculation_id -> (node, task, expiry timer handle)
+
+_stats = {
+    "decisions": {"rules": 0, "llm": 0},
+    "rules_routes": 0,
+    "rules_route_seconds": 0.0,
+    "llm_routes": 0,
+    "llm_route_seconds": 0.0,
+    "speculations": 0,
+    "hits": 0,
+    "mispredictions": 0,
+    "expired": 0,
+}
+
+
+def _expire(speculation_id: str):
+    speculation = _speculations.pop(speculation_id, None)
+    if speculation is not None:
+        speculation[1].cancel()
+        _stats["expired"] += 1
+
+
+def _pop(speculation_id: str):
+    speculation = _speculations.pop(speculation_id, None)
+    if speculation is not None:
+        speculation[2].cancel()
+    return speculation
+
+
+def start(node: str, coroutine) -> str:
+    """Run `node`'s work in the background and return the id to claim it with."""
+    speculation_id = uuid.uuid4().hex
+    timer = asyncio.get_running_loop().call_later(SPECULATION_TTL_SECONDS, _expire, speculation_id)
+    _speculations[speculation_id] = (node, asyncio.create_task(coroutine), timer)
+    _stats["speculations"] += 1
+    return speculation_id
+
+
+def take(speculation_id: str | None, node: str) -> asyncio.Task | None:
+    """The speculative task for `node`, if the router confirmed one."""
+    if not speculation_id:
+        return None
+    speculation = _pop(speculation_id)
+    if speculation is None or speculation[0] != node:
+        if speculation is not None:
+            speculation[1].cancel()
+        return None
+    _stats["hits"] += 1
+    return speculation[1]
+
+
+def cancel(speculation_id: str, mispredicted: bool = True):
+    speculation = _pop(speculation_id)
+    if speculation is not None:
+        speculation[1].cancel()
+        if mispredicted:
+            _stats["mispredictions"] += 1
+
+
+def record_decision(source: str):
+    """Which router's answer the graph followed: "rules" or "llm"."""
+    _stats["decisions"][source] += 1
+
+
+def record_latency(source: str, seconds: float):
+    _stats[f"{source}_routes"] += 1
+    _stats[f"{source}_route_seconds"] += seconds
+
+
+def routing_stats() -> dict:
+    checked = _stats["hits"] + _stats["mispredictions"]
+    decisions = _stats["decisions"]
+    return {
+        "mode": ROUTING_MODE,
+        "decisions": dict(decisions),
+        "avg_rules_route_ms": round(_stats["rules_route_seconds"] / _stats["rules_routes"] * 1000, 3) if _stats["rules_routes"] else None,
+        "avg_llm_route_ms": round(_stats["llm_route_seconds"] / _stats["llm_routes"] * 1000, 1) if _stats["llm_routes"] else None,
+        "speculations": _stats["speculations"],
+        "in_flight": len(_speculations),
+        "hits": _stats["hits"],
+        "mispredictions": _stats["mispredictions"],
+        "misprediction_rate": round(_stats["mispredictions"] / checked, 3) if checked else None,
+        "expired": _stats["expired"],
+    }
@@ -7,4 +7,9 @@ class State(TypedDict):
     initial_user_message: str
     existing_html_content: str
     final_html_content: str
-    design_plan: str
\ No newline at end of file
+    design_plan: str
+    # Set by route_initial_user_message
+    next: str
+    speculation_id: str | None
+    # Output tokens of the last write_html_code run vs. a full-page regeneration
+    html_edit_stats: dict
@@ -1,35 +1,111 @@
+import logging
+import os
+
 from agents.base_agent import BaseAgent
 from langsmith import Client
-import os
-from langchain import hub
+from agents.utils.prompt_cache import pull_prompt
+from agents.utils.context_budget import BUDGETS, numbered_page_view, page_view
+from agents.utils.html_patch import PatchError, apply_patches, parse_patches
+from agents.utils.tokens import estimate_tokens
+from agents.utils.workspace import thread_id_from_config, workspace
 from agents.write_html_agent.state import State
 from langchain.schema import HumanMessage
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableConfig
+
+logger = logging.getLogger(__name__)
+
+# "patch": edit an existing page with line-numbered edit blocks, regenerating it only if the
+# patch can't be applied. "full": always regenerate the whole page.
+HTML_EDIT_MODE = os.getenv("HTML_EDIT_MODE", "patch").lower()
+
+EDIT_HTML_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You edit an existing HTML page. The page is shown with line numbers in the form "00012: <line>".
+Do NOT rewrite the page. Answer ONLY with edit blocks, using the original line numbers:
+
+<<<REPLACE start-end
+new lines that replace lines start..end
+>>>
+<<<INSERT_AFTER line
+new lines to insert after that line (0 inserts at the top)
+>>>
+<<<DELETE start-end
+>>>
+
+Blocks must not overlap. Do not include line numbers in the new lines. No explanations, no markdown.
+Parts of a long page may be shown as "... (lines X-Y omitted)"; leave those lines alone."""),
+    ("human", """User request:
+{user_message}
+
+Design plan:
+{design_plan}
+
+Current page:
+{numbered_html}"""),
+])
 
 class WriteHtmlCode(BaseAgent):
     def __init__(self):
         super().__init__("Write Html Code Agent", "A agent that writes html code.")
 
     def run(self, user_message: str, existing_html_content: str, design_plan: str) -> str:
-        prompt = hub.pull("llamabot/after_planning_generate_html")
+        prompt = pull_prompt("llamabot/after_planning_generate_html")
         prompt_value = prompt.invoke({"user_message": user_message, "existing_html_content": existing_html_content, "design_plan": design_plan})
         intent_response = self.invoke(prompt_value)
         return intent_response.content
 
-def write_html_code_node(state: State) -> State:
+    def run_edit(self, user_message: str, existing_html_content: str, design_plan: str) -> str:
+        """Ask for line-numbered edit blocks against the existing page instead of a whole new page."""
+        prompt_value = EDIT_HTML_PROMPT.invoke({
+            "user_message": user_message,
+            "design_plan": design_plan,
+            # Over the writer's budget only the relevant lines are shown, with their original numbers
+            "numbered_html": numbered_page_view(existing_html_content, user_message, BUDGETS["writer"]),
+        })
+        edit_response = self.invoke(prompt_value)
+        return edit_response.content
+
+def write_html_code_node(state: State, config: RunnableConfig) -> State:
     agent = WriteHtmlCode()
-    return_response = agent.run(state.get("initial_user_message"), state.get("existing_html_content"), state.get("design_plan"))
+    user_message = state.get("initial_user_message")
+    existing_html_content = state.get("existing_html_content") or ""
+    design_plan = state.get("design_plan")
+
+    return_response = None
+    patch_output = ""
+    if HTML_EDIT_MODE == "patch" and existing_html_content.strip():
+        patch_output = agent.run_edit(user_message, existing_html_content, design_plan)
+        try:
+            return_response = apply_patches(existing_html_content, parse_patches(patch_output))
+        except PatchError as e:
+            logger.warning(f"Could not apply HTML edit blocks, regenerating the full page: {e}")
+
+    mode = "patch"
+    if return_response is None:
+        mode = "full" if not patch_output else "fallback"
+        return_response = agent.run(user_message, page_view("writer", existing_html_content, user_message), design_plan)
+
+    # Tokens the model generated vs. what a full regeneration of the final page would have cost.
+    # A failed patch attempt is wasted output, so a fallback shows up as negative savings.
+    full_page_tokens = estimate_tokens(return_response)
+    output_tokens = estimate_tokens(patch_output) + (full_page_tokens if mode != "patch" else 0)
+    html_edit_stats = {
+        "mode": mode,
+        "output_tokens": output_tokens,
+        "full_page_tokens": full_page_tokens,
+        "tokens_saved": full_page_tokens - output_tokens,
+    }
+    logger.info(f"write_html_code: {html_edit_stats}")
 
-    try:
-        with open("page.html", "w") as f:
-            f.write(return_response)
-    except Exception as write_error:
-        raise write_error
+    # Into this conversation's workspace, atomically, with a revision recorded
+    workspace.write(thread_id_from_config(config), "page.html", return_response)
 
     return {
         "final_html_content": return_response,
-        "messages": state.get("messages", []) + [HumanMessage(content=return_response)]
+        "messages": state.get("messages", []) + [HumanMessage(content=return_response)],
+        "html_edit_stats": html_edit_stats,
     }
 
 if __name__ == "__main__":
     agent = WriteHtmlCode()
-    print(agent.run("Hello, world!", "", ""))
\ No newline at end of file
+    print(agent.run("Hello, world!", "", ""))
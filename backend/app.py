@@ -1,33 +1,49 @@
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+import importlib.util
 
-# Ollama imports instead of OpenAI
-try:
-    from langchain_ollama import ChatOllama
-    OLLAMA_AVAILABLE = True
+# Ollama instead of OpenAI (the clients come from agents/utils/llm_factory.py)
+OLLAMA_AVAILABLE = importlib.util.find_spec("langchain_ollama") is not None
+if OLLAMA_AVAILABLE:
     print("✅ Ollama integration available")
-except ImportError:
+else:
     print("⚠️ langchain_ollama not available, using direct API calls")
-    OLLAMA_AVAILABLE = False
 
-from langchain.schema import HumanMessage
+from langchain.schema import AIMessage, HumanMessage
 from pydantic import BaseModel
 from dotenv import load_dotenv
 import os
 import logging
 import time
-import json
+import asyncio
+import mimetypes
+import re
+import sys
+import uuid
 import httpx
 from datetime import datetime
-from agents.react_agent.nodes import build_workflow
-
-# Uncomment these if you have PostgreSQL setup
-# from langgraph.checkpoint.postgres import PostgresSaver
-# from langgraph.checkpoint.memory import MemorySaver
-# from langgraph.checkpoint.base import CheckpointTuple
-# from psycopg_pool import ConnectionPool
+from urllib.parse import quote
+from contextlib import asynccontextmanager
+from services.graph_registry import GRAPH_PREWARM, GraphRegistry, prewarm_agents
+from services.streaming import GraphStreamer
+from services.checkpointers import CheckpointConfig, CheckpointRetention, create_checkpointer, open_checkpointer
+from services.thread_index import create_thread_index
+from services.ollama_pool import OllamaPool
+from services.health import HealthProber
+from services.response_cache import ResponseCache
+from services.admission import PRIORITIES, AdmissionController, AdmissionRejected
+from services.static_cache import StaticFileCache
+from services.page_events import PageEventHub, PageEventsConfig, format_sse
+from services.stream_protocol import PROTOCOLS, StreamEncoder, StreamProtocolConfig, TokenCoalescer, dumps
+from services.replay import ReplayGap, ReplayStore
+from services.jobs import STATUSES as JOB_STATUSES, JobManager, JobQueueFull
+from services.batch import BatchConfig, BatchError, NotRetryable, batch_stats, parse_batch, run_batch
+from agents.utils.prompt_cache import prompt_cache
+from agents.utils import llm_factory
+from agents.utils.workspace import DEFAULT_THREAD_ID, WorkspaceError, workspace
+from agents.write_html_agent.speculation import routing_stats
 
 from langsmith import Client
 
@@ -45,7 +61,90 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
-app = FastAPI()
+# Agent the /chat-message endpoint runs when a request doesn't name one
+DEFAULT_AGENT = os.getenv("DEFAULT_AGENT", "react_agent")
+
+# Page sizes for /threads
+THREADS_PAGE_SIZE = int(os.getenv("THREADS_PAGE_SIZE", "20"))
+THREADS_MAX_PAGE_SIZE = int(os.getenv("THREADS_MAX_PAGE_SIZE", "200"))
+
+# Runs that pass through these nodes changed something (tool calls, page writes), so their
+# responses are never cached: replaying the text would not replay the change
+SIDE_EFFECT_NODES = {"tools", "write_html_code"}
+
+# Messages with a URL are usually "clone this site": Playwright plus a long generation
+URL_PATTERN = re.compile(r"https?://", re.IGNORECASE)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Ollama backends (OLLAMA_BASE_URLS), each with a pooled keep-alive HTTP client; requests go
+    # to the least-loaded backend that has the model loaded, failing over when one goes down
+    app.state.ollama_pool = OllamaPool(OllamaConfig.BASE_URLS)
+    await app.state.ollama_pool.start()
+
+    # Bounds concurrent generations per model; queued requests are served by priority, fairly per thread
+    app.state.admission = AdmissionController()
+
+    # HTML pages served from memory with ETag/Last-Modified and gzip/br; workspace writes drop the stale copy
+    app.state.static_cache = StaticFileCache()
+    app.state.static_cache_listener = lambda thread_id, name, revision, path: app.state.static_cache.invalidate(path)
+    workspace.add_listener(app.state.static_cache_listener)
+
+    # Page revisions pushed to previews over /page/events
+    app.state.page_events = PageEventHub()
+    app.state.page_events.attach(workspace)
+
+    # Every /chat-message run's events, so a dropped client can resume its stream
+    app.state.replay = ReplayStore()
+
+    # Background jobs (POST /jobs), run by a bounded worker pool with their state in sqlite
+    app.state.jobs = JobManager(run_job)
+
+    # Completed side-effect free runs, replayed for repeated messages
+    app.state.response_cache = ResponseCache(app.state.ollama_pool)
+
+    # /health serves the cached result of this background prober
+    app.state.health_prober = HealthProber(app.state.ollama_pool, OllamaConfig.MODEL)
+    app.state.health_prober.start()
+
+    # Open the configured checkpoint backend (sqlite by default, pooled Postgres when CHECKPOINT_BACKEND=postgres)
+    if app.state.checkpointer is None:
+        app.state.checkpointer = await open_checkpointer()
+        attach_thread_index(app.state.checkpointer)
+    await app.state.thread_index.backfill(app.state.checkpointer)
+    app.state.checkpoint_retention = CheckpointRetention(app.state.checkpointer)
+    app.state.checkpoint_retention.start()
+
+    # Pull the agents' hub prompts in the background so the first request finds them cached
+    app.state.prompt_warmup = asyncio.create_task(asyncio.to_thread(prompt_cache.warm))
+
+    # Graphs are compiled once and shared. GRAPH_PREWARM ones are built in the background; any other
+    # agent's module is only imported when a request first asks for it
+    app.state.graph_prewarm = asyncio.create_task(app.state.graph_registry.awarm(
+        checkpointer=get_or_create_checkpointer(), llm=llm, model_config=current_model_config(),
+        agent_names=prewarm_agents(GRAPH_PREWARM, DEFAULT_AGENT),
+    ))
+    await app.state.jobs.start()  # after the graphs and checkpointer, since re-queued jobs start straight away
+    yield
+
+    app.state.prompt_warmup.cancel()
+    app.state.graph_prewarm.cancel()
+    await app.state.health_prober.stop()
+    await app.state.checkpoint_retention.stop()
+    if hasattr(app.state.checkpointer, "aclose"):
+        await app.state.checkpointer.aclose()  # flushes batched sqlite writes / closes the Postgres pool
+    app.state.checkpointer = None
+    app.state.thread_index.close()
+    app.state.graph_registry.clear()
+    await app.state.jobs.aclose()
+    await app.state.replay.aclose()  # cancels runs still going, before their backends are closed
+    await app.state.ollama_pool.aclose()
+    if (browser_pool := sys.modules.get("agents.utils.browser_pool")) is not None:
+        await browser_pool.close_browser_pool()  # the clone tool's Chromium, if it was ever launched
+    workspace.remove_listener(app.state.static_cache_listener)
+    app.state.page_events.detach()
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware for React frontend
 app.add_middleware(
@@ -63,15 +162,18 @@ app.mount("/assets", StaticFiles(directory="../assets"), name="assets")
 class OllamaConfig:
     MODEL = os.getenv("OLLAMA_MODEL", "qwen2.5:latest")
     BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+    # Several Ollama hosts, comma separated; defaults to just BASE_URL
+    BASE_URLS = [url.strip() for url in os.getenv("OLLAMA_BASE_URLS", "").split(",") if url.strip()] or [BASE_URL]
     TEMPERATURE = float(os.getenv("OLLAMA_TEMPERATURE", "0.7"))
 
 # Initialize the Ollama LLM
-def get_ollama_llm():
-    """Get Ollama LLM instance"""
+def get_ollama_llm(base_url: str = None):
+    """Get Ollama LLM instance (shared per backend)"""
     if OLLAMA_AVAILABLE:
-        return ChatOllama(
-            model=OllamaConfig.MODEL,
-            base_url=OllamaConfig.BASE_URL,
+        return llm_factory.get_llm(
+            "ollama",
+            OllamaConfig.MODEL,
+            base_url=base_url or OllamaConfig.BASE_URLS[0],
             temperature=OllamaConfig.TEMPERATURE,
         )
     else:
@@ -80,6 +182,14 @@ def get_ollama_llm():
 # Global LLM instance
 llm = get_ollama_llm()
 
+def current_model_config(base_url: str = None) -> dict:
+    """The model settings a compiled graph depends on (part of the graph registry key)"""
+    return {
+        "model": OllamaConfig.MODEL,
+        "base_url": base_url or OllamaConfig.BASE_URLS[0],
+        "temperature": OllamaConfig.TEMPERATURE,
+    }
+
 client = Client(api_key=os.getenv("LANGSMITH_API_KEY"))
 
 # Pydantic model for chat request
@@ -87,43 +197,55 @@ class ChatMessage(BaseModel):
     message: str
     thread_id: str = None  # Optional thread_id parameter
     agent: str = None  # Optional agent parameter
+    priority: str = None  # "interactive" or "heavy"; guessed from the message when not given
+    protocol: str = None  # "ndjson" (default), "compact" or "sse", see services/stream_protocol.py
 
 # Application state to hold persistent checkpointer, important for session-based persistence.
 app.state.checkpointer = None
 
+# Compiled graphs, shared across requests
+app.state.graph_registry = GraphRegistry()
+
+# Runs graphs with astream so generation never blocks the event loop
+app.state.graph_streamer = GraphStreamer()
+
+async def get_graph(agent_name: str = DEFAULT_AGENT, base_url: str = None):
+    """Get the shared compiled graph for an agent, bound to one Ollama backend (the first by default).
+    The first request for an agent imports and compiles its graph in a worker thread. Agents whose
+    builder takes no llm are compiled once, whatever the backend."""
+    if base_url and not await app.state.graph_registry.aaccepts_llm(agent_name):
+        base_url = None
+    return await app.state.graph_registry.aget(
+        agent_name,
+        checkpointer=get_or_create_checkpointer(),
+        llm=get_ollama_llm(base_url) if base_url else llm,
+        model_config=current_model_config(base_url),
+    )
+
 def get_or_create_checkpointer():
     """Get persistent checkpointer, creating once if needed"""
     if app.state.checkpointer is None:
-        # For now, use MemorySaver. Uncomment PostgreSQL code below if you have it set up
-        from langgraph.checkpoint.memory import MemorySaver
-        app.state.checkpointer = MemorySaver()
-        logger.info("Using MemorySaver for session-based persistence.")
-        
-        # Uncomment this section if you want PostgreSQL persistence:
-        # db_uri = os.getenv("DB_URI")
-        # if db_uri:
-        #     try:
-        #         # Create connection pool and PostgresSaver directly
-        #         pool = ConnectionPool(db_uri)
-        #         app.state.checkpointer = PostgresSaver(pool)
-        #         app.state.checkpointer.setup()
-        #         logger.info("Using PostgreSQL persistence.")
-        #     except Exception as e:
-        #         logger.warning(f"Failed to connect to PostgreSQL: {e}. Using MemorySaver.")
-        #         app.state.checkpointer = MemorySaver()
-        # else:
-        #     logger.info("No DB_URI found. Using MemorySaver for session-based persistence.")
-        #     app.state.checkpointer = MemorySaver()
-    
+        # The lifespan hook normally opens it (Postgres needs the running event loop); this covers
+        # code paths that run without the lifespan, using the local sqlite/memory backends.
+        backend = CheckpointConfig.BACKEND if CheckpointConfig.BACKEND != "postgres" else "sqlite"
+        app.state.checkpointer = create_checkpointer(backend)
+        attach_thread_index(app.state.checkpointer)
+        logger.info(f"Using {backend} checkpoint persistence.")
+
     return app.state.checkpointer
 
+def attach_thread_index(checkpointer):
+    """Give the checkpointer a thread index to keep up to date as it writes checkpoints"""
+    app.state.thread_index = create_thread_index(checkpointer)
+    checkpointer.thread_index = app.state.thread_index
+
 @app.get("/", response_class=HTMLResponse)
-async def root():
+async def root(request: Request):
     # Serve the home.html file
-    try:
-        with open("home.html") as f:
-            return f.read()
-    except FileNotFoundError:
+    cached = await app.state.static_cache.aresponse(request, "home.html")
+    if cached is not None:
+        return cached
+    else:
         return """
         <html>
             <body>
@@ -137,210 +259,490 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Check Ollama connectivity"""
+    """Ollama health, as of the last background probe (never runs a generation itself)"""
+    return {
+        **app.state.health_prober.result,
+        "ollama_model": OllamaConfig.MODEL,
+        "ollama_url": OllamaConfig.BASE_URL,
+        "ollama_backends": [
+            {"url": backend.url, "healthy": backend.healthy, "model_loaded": OllamaConfig.MODEL in backend.loaded_models}
+            for backend in app.state.ollama_pool.backends
+        ],
+    }
+
+@app.get("/health/live")
+async def liveness():
+    """The process is up and serving requests"""
+    return {"status": "alive", "uptime_seconds": round(time.time() - app.state.health_prober.started_at, 1)}
+
+@app.get("/health/ready")
+async def readiness():
+    """Ollama answered a recent probe and the model is available; 503 otherwise"""
+    result = app.state.health_prober.result
+    body = {
+        "status": "ready" if app.state.health_prober.ready else "not_ready",
+        "model_loaded": result["model_loaded"],
+        "model_available": result["model_available"],
+        "last_probe_at": result["last_probe_at"],
+        "last_probe_latency_ms": result["last_probe_latency_ms"],
+        "error": result["error"],
+    }
+    return JSONResponse(body, status_code=200 if app.state.health_prober.ready else 503)
+
+async def record_cached_turn(config: dict, message: str, entry, agent_name: str = DEFAULT_AGENT):
+    """Add a replayed exchange to the thread, so its history matches what the user saw."""
+    if entry.reply is None:
+        return
     try:
-        if OLLAMA_AVAILABLE and llm:
-            # Test with a simple message
-            test_response = llm.invoke([HumanMessage(content="Hello")])
-            return {
-                "status": "healthy",
-                "ollama_model": OllamaConfig.MODEL,
-                "ollama_url": OllamaConfig.BASE_URL,
-                "test_response": str(test_response.content)[:50] + "..."
-            }
-        else:
-            # Test direct API call
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{OllamaConfig.BASE_URL}/api/tags")
-                if response.status_code == 200:
-                    return {
-                        "status": "healthy",
-                        "ollama_model": OllamaConfig.MODEL,
-                        "ollama_url": OllamaConfig.BASE_URL,
-                        "direct_api": True
-                    }
-                else:
-                    return {"status": "unhealthy", "error": "Ollama not responding"}
+        await (await get_graph(agent_name)).aupdate_state(
+            config,
+            {"messages": [HumanMessage(content=message), AIMessage(content=entry.reply)]},
+            as_node=entry.last_node,
+        )
     except Exception as e:
-        return {"status": "unhealthy", "error": str(e)}
-
-@app.post("/chat-message")
-async def chat_message(chat_message: ChatMessage):
-    request_id = f"req_{int(time.time())}_{hash(chat_message.message)%1000}"
-    logger.info(f"[{request_id}] New chat message received: {chat_message.message[:50]}...")
-    
-    # Get the existing HTML content from page.html
+        logger.warning(f"Could not record cached response in thread history: {e}")
+
+async def thread_history(config: dict) -> list:
+    """The thread's messages so far (as of config's checkpoint), as (type, content) pairs for the response cache key."""
+    checkpoint = await get_or_create_checkpointer().aget_tuple(config)
+    if checkpoint is None:
+        return []
+    messages = checkpoint.checkpoint.get("channel_values", {}).get("messages", [])
+    return [(getattr(message, "type", None), getattr(message, "content", message)) for message in messages]
+
+async def delete_thread(thread_id: str):
+    """Drop a thread's checkpoints and workspace files."""
+    try:
+        await get_or_create_checkpointer().adelete_thread(thread_id)
+        await workspace.adelete(thread_id)
+    except Exception as e:
+        logger.warning(f"Could not delete thread {thread_id}: {e}")
+
+def request_priority(chat_message: ChatMessage) -> str:
+    if chat_message.priority:
+        return chat_message.priority
+    return "heavy" if URL_PATTERN.search(chat_message.message) else "interactive"
+
+async def chat_events(request_id: str, chat_message: ChatMessage, priority: str, coalescer: TokenCoalescer | None = None,
+                      use_cache: bool = True, checkpoint_id: str | None = None):
+    """One chat run as stream events (start, queued, update..., final). /chat-message streams them,
+    background jobs record them and /chat-batch measures them.
+    With a coalescer, tokens go out in frames instead of one event each; use_cache=False always runs
+    the model (and doesn't store the result). With a checkpoint_id the run continues the thread from
+    that checkpoint instead of its latest one, forking it."""
+    # Get the existing HTML content from this conversation's page.html
+    existing_html_content = await workspace.aread(chat_message.thread_id or DEFAULT_THREAD_ID, "page.html") or ""
+    final_state = None
+    # Events after "start", kept for the response cache unless the run had side effects
+    cached, recorded, cacheable, graph_completed = None, [], True, False
+    ticket, backend = None, None
+    reply, last_node = None, None
     try:
-        with open("../page.html", "r") as f:
-            existing_html_content = f.read()
-    except FileNotFoundError:
-        existing_html_content = ""
+        logger.info(f"[{request_id}] Starting streaming response with Ollama")
 
-    # Define a generator function to stream the response
-    async def response_generator():
-        try:
-            logger.info(f"[{request_id}] Starting streaming response with Ollama")
+        # Initial response with request ID
+        yield {
+            "type": "start",
+            "request_id": request_id,
+            "model": OllamaConfig.MODEL
+        }
 
-            # Initial response with request ID
-            yield json.dumps({
-                "type": "start",
+        # Use the provided thread_id or default to "5"
+        thread_id = chat_message.thread_id or DEFAULT_THREAD_ID
+        logger.info(f"[{request_id}] Using thread_id: {thread_id}")
+        agent_name = chat_message.agent or DEFAULT_AGENT
+        config = {"configurable": {"thread_id": thread_id}, "metadata": {"agent": agent_name}}
+        if checkpoint_id is not None:
+            config["configurable"]["checkpoint_id"] = checkpoint_id
+
+        if use_cache and app.state.response_cache.enabled:
+            cached = await app.state.response_cache.lookup(chat_message.message, agent_name, OllamaConfig.MODEL,
+                                                           existing_html_content, await thread_history(config))
+        if cached is not None and cached.entry is not None:
+            logger.info(f"[{request_id}] Response cache hit ({cached.kind}), replaying {len(cached.entry.events)} events")
+            await record_cached_turn(config, chat_message.message, cached.entry, agent_name)
+            for event in cached.entry.events:
+                yield event
+            return
+
+        # Wait for a free generation slot on the model, telling the client where it is in the queue
+        ticket = app.state.admission.enqueue(OllamaConfig.MODEL, thread_id, priority)
+        async for position in ticket.wait():
+            logger.info(f"[{request_id}] Queued at position {position}")
+            yield {
+                "type": "queued",
                 "request_id": request_id,
+                "position": position,
                 "model": OllamaConfig.MODEL
-            }) + "\n"
+            }
 
-            # Use the provided thread_id or default to "5"
-            thread_id = chat_message.thread_id or "5"
-            logger.info(f"[{request_id}] Using thread_id: {thread_id}")
+        # Least-loaded Ollama backend that has the model loaded, for graphs that take the llm to use
+        # (the others get their model from the LLM factory)
+        if await app.state.graph_registry.aaccepts_llm(agent_name):
+            backend = app.state.ollama_pool.acquire(OllamaConfig.MODEL)
+            logger.info(f"[{request_id}] Routed to Ollama backend {backend.url}")
+
+        # Check if we have LangGraph workflow available
+        try:
+            graph = await get_graph(agent_name, base_url=backend.url if backend else None)  # Compiled once per agent and backend, reused across requests
             
-            # Check if we have LangGraph workflow available
-            try:
-                checkpointer = get_or_create_checkpointer()
-                graph = build_workflow(checkpointer=checkpointer, llm=llm)  # Pass Ollama LLM to workflow
-                
-                stream = graph.stream({
+            # graph.astream runs in its own task, so token generation never blocks the event loop.
+            # If the client goes away and doesn't resume in time, the replay store cancels the run
+            # and the model request with it.
+            stream = app.state.graph_streamer.stream(
+                graph,
+                {
                     "messages": [HumanMessage(content=chat_message.message)],
                     "initial_user_message": chat_message.message,
                     "existing_html_content": existing_html_content
-                    }, 
-                    config={"configurable": {"thread_id": thread_id}},
-                    stream_mode=["updates", "messages"] # "values" is the third option ( to return the entire state object )
-                ) 
+                },
+                config=config,
+                stream_mode=["updates", "messages"], # "values" is the third option ( to return the entire state object )
+                # Wake up while the model is quiet, so coalesced tokens still go out on time
+                tick_seconds=StreamProtocolConfig.COALESCE_MS / 1000 if coalescer else None,
+            )
 
-                # Track the final state to serialize at the end
-                final_state = None
+            # Stream each chunk
+            async for chunk in stream:
+                if chunk is not None:
 
-                # Stream each chunk
-                for chunk in stream:
-                    if chunk is not None:
+                    is_this_chunk_an_llm_message = isinstance(chunk, tuple) and len(chunk) == 2 and chunk[0] == 'messages'
+                    is_this_chunk_an_update_stream_type = isinstance(chunk, tuple) and len(chunk) == 2 and chunk[0] == 'updates'
 
-                        is_this_chunk_an_llm_message = isinstance(chunk, tuple) and len(chunk) == 2 and chunk[0] == 'messages'
-                        is_this_chunk_an_update_stream_type = isinstance(chunk, tuple) and len(chunk) == 2 and chunk[0] == 'updates'
-
-                        if is_this_chunk_an_llm_message: ## If this is a message from the LLM. (Known as a 'Messages' Chunk streaming from LangGraph
-
-                            # Get the langgraph_node_info.
-                            langgraph_node_info = chunk[1][1] # this is dict object with keys => dict_keys(['langgraph_step', 'langgraph_node', 'langgraph_triggers', 'langgraph_path', 'langgraph_checkpoint_ns', 'checkpoint_ns', 'ls_provider', 'ls_model_name', 'ls_model_type', 'ls_temperature'])
-                            
-                            # Get the AI message from the LLM.
-                            message_from_llm = chunk[1][0] #AIMessageChunk object -> https://python.langchain.com/api_reference/core/messages/langchain_core.messages.ai.AIMessageChunk.html
-
-                            # Handle tuple format (node, value)
-                            node, value = chunk
-                            if value is not None:
-                                # Log the streaming output
-                                logger.info(f"[{request_id}] Stream update from {langgraph_node_info['langgraph_node']}: {str(message_from_llm)[:100]}...")
+                    if is_this_chunk_an_llm_message: ## If this is a message from the LLM. (Known as a 'Messages' Chunk streaming from LangGraph
 
+                        # Get the langgraph_node_info.
+                        langgraph_node_info = chunk[1][1] # this is dict object with keys => dict_keys(['langgraph_step', 'langgraph_node', 'langgraph_triggers', 'langgraph_path', 'langgraph_checkpoint_ns', 'checkpoint_ns', 'ls_provider', 'ls_model_name', 'ls_model_type', 'ls_temperature'])
+                        
+                        # Get the AI message from the LLM.
+                        message_from_llm = chunk[1][0] #AIMessageChunk object -> https://python.langchain.com/api_reference/core/messages/langchain_core.messages.ai.AIMessageChunk.html
+
+                        # Handle tuple format (node, value)
+                        node, value = chunk
+                        if value is not None:
+                            # Per-token logging is DEBUG only: at INFO it cost about as much as the token itself
+                            if logger.isEnabledFor(logging.DEBUG):
+                                logger.debug(f"[{request_id}] Stream update from {langgraph_node_info['langgraph_node']}: {str(message_from_llm)[:100]}...")
+
+                            if coalescer is not None:
+                                # Tokens go out in frames, bounded by size and age
+                                for event in coalescer.add(langgraph_node_info['langgraph_node'], str(message_from_llm.content)):
+                                    recorded.append(event)
+                                    yield event
+                            else:
                                 # Send streaming update for React frontend
-                                yield json.dumps({
+                                event = {
                                     "type": "update",
                                     "node": langgraph_node_info['langgraph_node'],
                                     "value": str(message_from_llm.content),  # Convert value to string for safety
                                     "model": OllamaConfig.MODEL
-                                }) + "\n"
+                                }
+                                recorded.append(event)
+                                yield event
+                    
+                    elif is_this_chunk_an_update_stream_type:
+                        updated_langgraph_state_object = chunk[1] # Dict object
                         
-                        elif is_this_chunk_an_update_stream_type:
-                            updated_langgraph_state_object = chunk[1] # Dict object
-                            
-                            node_step_name = list(chunk[1].keys())[-1] # will be one of the following:'route_initial_user_message', 'respond_naturally', 'design_and_plan', 'write_html_code'
-                            
-                            node, value = chunk
-                            if updated_langgraph_state_object is not None:
-                                # Log the streaming output
-                                logger.info(f"[{request_id}] Stream update from {node}: {str(value)[:100]}...")
-
-                                # Store final state for the final response
-                                if 'messages' in updated_langgraph_state_object:
-                                    final_state = updated_langgraph_state_object
-
-                        else:
-                            # Handle other formats or just log
-                            logger.info(f"[{request_id}] Received chunk in unknown format: {type(chunk)}")
-                            
-            except Exception as workflow_error:
-                logger.warning(f"[{request_id}] Workflow error, falling back to direct Ollama call: {workflow_error}")
+                        node_step_name = list(chunk[1].keys())[-1] # will be one of the following:'route_initial_user_message', 'respond_naturally', 'design_and_plan', 'write_html_code'
+                        
+                        node, value = chunk
+                        if updated_langgraph_state_object is not None:
+                            # Log the streaming output
+                            logger.info(f"[{request_id}] Stream update from {node}: {str(value)[:100]}...")
+
+                            # A node finished: send what it streamed before anything that follows
+                            for event in coalescer.flush() if coalescer is not None else []:
+                                recorded.append(event)
+                                yield event
+
+                            # Store final state for the final response
+                            if 'messages' in updated_langgraph_state_object:
+                                final_state = updated_langgraph_state_object
+
+                            for node_name, node_update in updated_langgraph_state_object.items():
+                                cacheable = cacheable and node_name not in SIDE_EFFECT_NODES
+                                node_messages = node_update.get("messages") if isinstance(node_update, dict) else None
+                                if node_messages:
+                                    reply, last_node = getattr(node_messages[-1], "content", None), node_name
+
+                    else:
+                        # Handle other formats or just log
+                        logger.info(f"[{request_id}] Received chunk in unknown format: {type(chunk)}")
+
+                # Frames that have waited long enough (chunk is None on a quiet tick)
+                for event in coalescer.due() if coalescer is not None else []:
+                    recorded.append(event)
+                    yield event
+
+            for event in coalescer.flush() if coalescer is not None else []:
+                recorded.append(event)
+                yield event
+            graph_completed = True
+                        
+        except Exception as workflow_error:
+            logger.warning(f"[{request_id}] Workflow error, falling back to direct Ollama call: {workflow_error}")
+            if backend is not None and isinstance(workflow_error, (httpx.TransportError, ConnectionError)):
+                backend.mark_down(workflow_error)  # the fallback below then goes to another backend
+            
+            # Fallback to direct Ollama API call
+            fallback_llm = get_ollama_llm(app.state.ollama_pool.choose(OllamaConfig.MODEL).url)
+            if OLLAMA_AVAILABLE and fallback_llm:
+                response = await fallback_llm.ainvoke([HumanMessage(content=chat_message.message)])
+                yield {
+                    "type": "update",
+                    "node": "direct_ollama",
+                    "value": response.content,
+                    "model": OllamaConfig.MODEL
+                }
                 
-                # Fallback to direct Ollama API call
-                if OLLAMA_AVAILABLE and llm:
-                    response = llm.invoke([HumanMessage(content=chat_message.message)])
-                    yield json.dumps({
+                final_state = {
+                    "messages": [
+                        {"role": "user", "content": chat_message.message},
+                        {"role": "assistant", "content": response.content}
+                    ]
+                }
+            else:
+                # Direct HTTP call to Ollama API
+                client = app.state.ollama_pool  # pooled keep-alive clients, with failover across backends
+                ollama_request = {
+                    "model": OllamaConfig.MODEL,
+                    "messages": [
+                        {"role": "user", "content": chat_message.message}
+                    ],
+                    "stream": False
+                }
+                
+                response = await client.post(
+                    "/api/chat",
+                    json=ollama_request
+                )
+                
+                if response.status_code == 200:
+                    result = response.json()
+                    content = result["message"]["content"]
+                    
+                    yield {
                         "type": "update",
-                        "node": "direct_ollama",
-                        "value": response.content,
+                        "node": "direct_api",
+                        "value": content,
                         "model": OllamaConfig.MODEL
-                    }) + "\n"
+                    }
                     
                     final_state = {
                         "messages": [
                             {"role": "user", "content": chat_message.message},
-                            {"role": "assistant", "content": response.content}
+                            {"role": "assistant", "content": content}
                         ]
                     }
                 else:
-                    # Direct HTTP call to Ollama API
-                    async with httpx.AsyncClient(timeout=60.0) as client:
-                        ollama_request = {
-                            "model": OllamaConfig.MODEL,
-                            "messages": [
-                                {"role": "user", "content": chat_message.message}
-                            ],
-                            "stream": False
-                        }
-                        
-                        response = await client.post(
-                            f"{OllamaConfig.BASE_URL}/api/chat",
-                            json=ollama_request
-                        )
-                        
-                        if response.status_code == 200:
-                            result = response.json()
-                            content = result["message"]["content"]
-                            
-                            yield json.dumps({
-                                "type": "update",
-                                "node": "direct_api",
-                                "value": content,
-                                "model": OllamaConfig.MODEL
-                            }) + "\n"
-                            
-                            final_state = {
-                                "messages": [
-                                    {"role": "user", "content": chat_message.message},
-                                    {"role": "assistant", "content": content}
-                                ]
-                            }
-                        else:
-                            raise Exception(f"Ollama API error: {response.status_code}")
-
-        except Exception as e:
-            logger.error(f"[{request_id}] Error in stream: {str(e)}", exc_info=True)
-            yield json.dumps({
-                "type": "error",
-                "error": str(e),
-                "request_id": request_id
-            }) + "\n"
-        finally:
-            logger.info(f"[{request_id}] Stream completed")
-            # Send final update with complete messages
-            yield json.dumps({
-                "type": "final",
-                "node": "final",
-                "value": "final",
-                "messages": final_state.get("messages", []) if final_state else [],
-                "model": OllamaConfig.MODEL
-            }) + "\n"
+                    raise Exception(f"Ollama API error: {response.status_code}")
 
+    except (asyncio.CancelledError, GeneratorExit):
+        # Nobody resumed the stream (or the app is shutting down), so there is nothing left to send
+        logger.info(f"[{request_id}] Run cancelled")
+        raise
+    except Exception as e:
+        logger.error(f"[{request_id}] Error in stream: {str(e)}", exc_info=True)
+        yield {
+            "type": "error",
+            "error": str(e),
+            "request_id": request_id
+        }
+    finally:
+        if backend is not None:
+            app.state.ollama_pool.release(backend)
+        if ticket is not None:
+            ticket.release()
+
+    logger.info(f"[{request_id}] Stream completed")
+    # Send final update with complete messages
+    final_event = {
+        "type": "final",
+        "node": "final",
+        "value": "final",
+        "messages": final_state.get("messages", []) if final_state else [],
+        "model": OllamaConfig.MODEL
+    }
+    if cached is not None and graph_completed and cacheable:
+        app.state.response_cache.store(cached, recorded + [final_event], reply=reply, last_node=last_node)
+    yield final_event
+
+@app.post("/chat-message")
+async def chat_message(chat_message: ChatMessage, request: Request):
+    request_id = f"req_{uuid.uuid4().hex}"
+    logger.info(f"[{request_id}] New chat message received: {chat_message.message[:50]}...")
+
+    priority = request_priority(chat_message)
+    if priority not in PRIORITIES:
+        return JSONResponse({"error": f"priority must be one of {', '.join(PRIORITIES)}"}, status_code=400)
+    protocol = chat_message.protocol or "ndjson"
+    if protocol not in PROTOCOLS:
+        return JSONResponse({"error": f"protocol must be one of {', '.join(PROTOCOLS)}"}, status_code=400)
+    if chat_message.agent and not app.state.graph_registry.has(chat_message.agent):
+        return JSONResponse({"error": f"agent must be one of {', '.join(app.state.graph_registry.agent_names())}"}, status_code=400)
+    encoder = StreamEncoder(protocol)
+    # Shed load before starting a stream that would only sit in a full queue
+    try:
+        app.state.admission.check(OllamaConfig.MODEL)
+    except AdmissionRejected as e:
+        logger.warning(f"[{request_id}] Rejected: {e}")
+        return JSONResponse({"error": str(e), "request_id": request_id}, status_code=429, headers={"Retry-After": "5"})
+    
+    run = app.state.replay.start(request_id, chat_events(request_id, chat_message, priority, encoder.coalescer()))
     # Return a streaming response
     return StreamingResponse(
-        response_generator(),
-        media_type="text/event-stream"
+        follow_run(run, encoder),
+        media_type=encoder.media_type,
+        headers={"X-Request-ID": request_id}
     )
 
-@app.get("/chat", response_class=HTMLResponse)
-async def chat():
+async def follow_run(run, encoder: StreamEncoder, after: int = -1):
+    """Encode a run's events after index `after`, following it live until it finishes"""
     try:
-        with open("chat.html") as f:
-            return f.read()
-    except FileNotFoundError:
+        async for index, event in run.follow(after):
+            yield encoder.encode(event, index)
+    except ReplayGap as e:
+        # This client fell further behind than the buffer holds
+        yield encoder.encode({"type": "error", "error": str(e), "request_id": run.request_id})
+
+def follow_response(request: Request, run, request_id: str, after: int | None, protocol: str):
+    """Stream a run's events after index `after` (or the SSE Last-Event-ID), or the reason it can't"""
+    if protocol not in PROTOCOLS:
+        return JSONResponse({"error": f"protocol must be one of {', '.join(PROTOCOLS)}"}, status_code=400)
+    if after is None:
+        try:
+            after = int(request.headers.get("last-event-id", "-1"))
+        except ValueError:
+            return JSONResponse({"error": "Last-Event-ID must be an event index"}, status_code=400)
+    if run is None:
+        return JSONResponse({"error": f"No buffered events for '{request_id}'", "request_id": request_id}, status_code=404)
+    if after + 1 < run.first_index:
+        return JSONResponse({
+            "error": f"Events after {after} are no longer buffered",
+            "request_id": request_id,
+            "first_index": run.first_index,
+        }, status_code=410)
+    logger.info(f"[{request_id}] Following stream after event {after} ({'running' if not run.done else 'completed'})")
+    encoder = StreamEncoder(protocol)
+    return StreamingResponse(follow_run(run, encoder, after), media_type=encoder.media_type, headers={"X-Request-ID": request_id})
+
+@app.get("/chat-message/{request_id}/resume")
+async def resume_chat_message(request: Request, request_id: str, after: int = None, protocol: str = "ndjson"):
+    """Pick a /chat-message stream back up: the events after index `after` (the "start" event is 0),
+    live if the run is still going. SSE clients can send Last-Event-ID instead of `after`."""
+    return follow_response(request, app.state.replay.resume(request_id), request_id, after, protocol)
+
+def run_job(job):
+    """A job's run: the same events as /chat-message, with tokens coalesced into frames"""
+    chat_message = ChatMessage(**job.request)
+    return chat_events(job.job_id, chat_message, request_priority(chat_message), TokenCoalescer())
+
+@app.post("/jobs", status_code=202)
+async def submit_job(chat_message: ChatMessage):
+    """Queue a chat run in the background; poll GET /jobs/{job_id} or follow /jobs/{job_id}/events"""
+    # Background runs yield to interactive ones unless told otherwise
+    chat_message.priority = chat_message.priority or "heavy"
+    if chat_message.priority not in PRIORITIES:
+        return JSONResponse({"error": f"priority must be one of {', '.join(PRIORITIES)}"}, status_code=400)
+    if chat_message.agent and not app.state.graph_registry.has(chat_message.agent):
+        return JSONResponse({"error": f"agent must be one of {', '.join(app.state.graph_registry.agent_names())}"}, status_code=400)
+    try:
+        job = app.state.jobs.submit(chat_message.model_dump(exclude={"protocol"}, exclude_none=True))
+    except JobQueueFull as e:
+        return JSONResponse({"error": str(e)}, status_code=429, headers={"Retry-After": "30"})
+    return JSONResponse(job.to_dict(), status_code=202, headers={"Location": f"/jobs/{job.job_id}"})
+
+@app.get("/jobs", response_class=JSONResponse)
+async def list_jobs(status: str = None, limit: int = 50):
+    """Most recent jobs first, optionally only those with the given status"""
+    if status is not None and status not in JOB_STATUSES:
+        return JSONResponse({"error": f"status must be one of {', '.join(JOB_STATUSES)}"}, status_code=400)
+    return {"jobs": [job.to_dict() for job in app.state.jobs.list(status, max(1, min(limit, 500)))]}
+
+@app.get("/jobs/{job_id}", response_class=JSONResponse)
+async def get_job(job_id: str):
+    job = app.state.jobs.get(job_id)
+    if job is None:
+        return JSONResponse({"error": f"Unknown job '{job_id}'"}, status_code=404)
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(request: Request, job_id: str, after: int = None, protocol: str = "ndjson"):
+    """A job's events after index `after`, live while it runs (kept for JOBS_EVENTS_TTL_SECONDS after it ends).
+    For a job that is still queued, this waits for it to start."""
+    if app.state.jobs.get(job_id) is None:
+        return JSONResponse({"error": f"Unknown job '{job_id}'"}, status_code=404)
+    await app.state.jobs.wait_started(job_id)
+    return follow_response(request, app.state.jobs.events(job_id), job_id, after, protocol)
+
+@app.delete("/jobs/{job_id}", response_class=JSONResponse)
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job (finished jobs are returned unchanged)"""
+    job = await app.state.jobs.cancel(job_id)
+    if job is None:
+        return JSONResponse({"error": f"Unknown job '{job_id}'"}, status_code=404)
+    return job.to_dict()
+
+@app.post("/chat-batch")
+async def chat_batch(request: Request, concurrency: int = BatchConfig.CONCURRENCY, retries: int = BatchConfig.RETRIES,
+                     cache: bool = False):
+    """Run a JSONL body of {message, thread_id, agent, priority} records, streaming back one JSONL result
+    per record (latency, token counts, reply) and a summary; see services/batch.py.
+    The response cache is skipped unless cache=true, so every record measures a real generation."""
+    try:
+        items, errors = parse_batch((await request.body()).decode("utf-8", errors="replace"))
+    except BatchError as e:
+        return JSONResponse({"error": str(e)}, status_code=413)
+    for item in items:
+        if item.get("priority") not in (None, *PRIORITIES):
+            return JSONResponse({"error": f"Record {item['index']}: priority must be one of {', '.join(PRIORITIES)}"}, status_code=400)
+        if item.get("agent") and not app.state.graph_registry.has(item["agent"]):
+            return JSONResponse({"error": f"Record {item['index']}: agent must be one of {', '.join(app.state.graph_registry.agent_names())}"}, status_code=400)
+        item["agent"] = item.get("agent") or DEFAULT_AGENT  # reported with the result
+    batch_id = f"batch_{uuid.uuid4().hex}"
+    concurrency = max(1, min(concurrency, BatchConfig.MAX_CONCURRENCY))
+    logger.info(f"[{batch_id}] Running {len(items)} records, {concurrency} at a time")
+
+    rollback_to = {}  # record index -> checkpoint its thread was at before the first attempt (None: no checkpoint yet)
+
+    async def run_item(item: dict, attempt: int):
+        request_id = f"{batch_id}_{item['index']}_{attempt}"
+        # Records without a thread run on a scratch one per attempt, deleted once the attempt ends
+        scratch = not item.get("thread_id")
+        thread_id = request_id if scratch else item["thread_id"]
+        checkpoint_id = None
+        if not scratch and attempt == 0:
+            latest = await get_or_create_checkpointer().aget_tuple({"configurable": {"thread_id": thread_id}})
+            rollback_to[item["index"]] = latest.config["configurable"]["checkpoint_id"] if latest else None
+        elif not scratch:
+            # Retry from where the thread was, so the failed attempt's partial turn isn't part of its history
+            checkpoint_id = rollback_to[item["index"]]
+            if checkpoint_id is None:
+                # Deleting the thread would also drop what other records or clients wrote to it since
+                raise NotRetryable(f"thread {thread_id} had no checkpoint to roll back to")
+        chat_message = ChatMessage(message=item["message"], thread_id=thread_id, agent=item["agent"],
+                                   priority=item.get("priority") or "heavy")
+        events = chat_events(request_id, chat_message, chat_message.priority, use_cache=cache, checkpoint_id=checkpoint_id)
+        try:
+            async for event in events:
+                yield event
+        finally:
+            await events.aclose()
+            if scratch:
+                await delete_thread(thread_id)
+
+    async def results():
+        async for result in run_batch(items, run_item, concurrency, max(0, retries), errors, batch_id):
+            yield dumps(result) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson", headers={"X-Batch-ID": batch_id})
+
+@app.get("/chat", response_class=HTMLResponse)
+async def chat(request: Request):
+    cached = await app.state.static_cache.aresponse(request, "chat.html")
+    if cached is not None:
+        return cached
+    else:
         return """
         <html>
             <body>
@@ -398,37 +800,135 @@ async def chat():
         """.format(OllamaConfig.MODEL)
 
 @app.get("/page", response_class=HTMLResponse)
-async def page():
+async def page(request: Request, thread_id: str = DEFAULT_THREAD_ID):
+    """The conversation's generated page (the default thread's without thread_id).
+
+    Served with a <base href> pointing at the thread's workspace, so the relative
+    assets/page.css and assets/page.js it links resolve to that thread's files instead of
+    the app's /assets mount."""
     try:
-        with open("../page.html") as f:
-            return f.read()
-    except FileNotFoundError:
-        return "<html><body><h1>Page not found</h1></body></html>"
+        path = workspace.path(thread_id, "page.html")
+    except WorkspaceError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    cached = await app.state.static_cache.aresponse(request, path, base_href=f"/workspace/{quote(thread_id, safe='')}/")
+    return cached or "<html><body><h1>Page not found</h1></body></html>"
+
+@app.get("/page/events")
+async def page_events(request: Request, thread_id: str = DEFAULT_THREAD_ID, diff: bool = False):
+    """
+    Server-Sent Events for a conversation's workspace writes, so previews don't have to poll /page.
+
+    - "ready" first, with the page's current revision (sha256, or null)
+    - "page_revision" per write: {thread_id, name, sha256, previous_sha256, bytes, at}, plus "diff" with diff=true
+    """
+    async def event_stream():
+        async with app.state.page_events.subscribe(thread_id) as queue:
+            latest = (await asyncio.to_thread(workspace.revisions, thread_id, "page.html"))[-1:]
+            yield format_sse("ready", {"thread_id": thread_id, "sha256": latest[0]["sha256"] if latest else None})
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), PageEventsConfig.HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": heartbeat\n\n"
+                    continue
+                if diff and event["previous_sha256"]:
+                    try:
+                        event = {**event, "diff": await asyncio.to_thread(
+                            workspace.diff, thread_id, event["name"], event["previous_sha256"], event["sha256"])}
+                    except WorkspaceError:
+                        pass  # the previous revision was already trimmed from the log
+                yield format_sse("page_revision", event, event_id=event["sha256"])
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/page/revisions", response_class=JSONResponse)
+async def page_revisions(thread_id: str = DEFAULT_THREAD_ID, name: str = "page.html"):
+    """Revisions of a workspace file, oldest first: [{name, sha256, bytes, at}]"""
+    try:
+        workspace.path(thread_id, name)
+    except WorkspaceError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    return {"thread_id": thread_id, "name": name, "revisions": await asyncio.to_thread(workspace.revisions, thread_id, name)}
+
+@app.get("/page/revisions/{sha256}")
+async def page_revision(sha256: str, thread_id: str = DEFAULT_THREAD_ID):
+    """The content of one revision"""
+    try:
+        content = await asyncio.to_thread(workspace.read_revision, thread_id, sha256)
+    except WorkspaceError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    if content is None:
+        return JSONResponse({"error": "Revision not found"}, status_code=404)
+    return PlainTextResponse(content)
+
+@app.get("/page/diff", response_class=PlainTextResponse)
+async def page_diff(from_revision: str, to_revision: str = None, thread_id: str = DEFAULT_THREAD_ID, name: str = "page.html"):
+    """Unified diff between two revisions (to_revision defaults to the current file)"""
+    try:
+        return await asyncio.to_thread(workspace.diff, thread_id, name, from_revision, to_revision)
+    except WorkspaceError as e:
+        return JSONResponse({"error": str(e)}, status_code=404)
+
+@app.get("/workspace/{thread_id}/{name:path}")
+async def workspace_file(request: Request, thread_id: str, name: str):
+    """A file from a conversation's workspace, so a page's relative assets/page.css etc. resolve"""
+    try:
+        path = workspace.path(thread_id, name)
+    except WorkspaceError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    # The preview page's assets, refetched with it: mostly answered with 304s from the in-memory copy
+    media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    if media_type.startswith("text/") or media_type in ("application/javascript", "application/json"):
+        media_type += "; charset=utf-8"
+    cached = await app.state.static_cache.aresponse(request, path, media_type=media_type)
+    return cached or JSONResponse({"error": "File not found"}, status_code=404)
     
 @app.get("/conversations", response_class=HTMLResponse)
-async def conversations():
-    try:
-        with open("conversations.html") as f:
-            return f.read()
-    except FileNotFoundError:
+async def conversations(request: Request):
+    cached = await app.state.static_cache.aresponse(request, "conversations.html")
+    if cached is None:
         return "<html><body><h1>Conversations page not found</h1></body></html>"
+    return cached
+
+def thread_agent(agent_name: str | None) -> str:
+    """The agent to read a thread with: the one that wrote it, as recorded in the thread index"""
+    return agent_name if app.state.graph_registry.has(agent_name) else DEFAULT_AGENT
 
 @app.get("/threads", response_class=JSONResponse)
-async def threads():
+async def threads(limit: int = None, cursor: str = None, summary: bool = False):
+    """
+    List threads from the thread index, most recently updated first.
+
+    - summary=true returns {"threads": [{thread_id, title, preview, message_count, updated_at, agent}], "next_cursor"}
+    - limit/cursor page through threads; pass next_cursor back to get the following page
+    - without limit or summary, returns every thread with its full state (the original format)
+    """
     try:
-        checkpointer = get_or_create_checkpointer()
-        config = {}
-        checkpoint_generator = checkpointer.list(config=config)
-        all_checkpoints = list(checkpoint_generator) #convert to list
-        
-        # reduce only to the unique thread_ids  
-        unique_thread_ids = list(set([checkpoint[0]["configurable"]["thread_id"] for checkpoint in all_checkpoints]))
-        state_history = []
-        for thread_id in unique_thread_ids:
-            graph = build_workflow(checkpointer=checkpointer, llm=llm)
-            config = {"configurable": {"thread_id": thread_id}}
-            state_history.append({"thread_id": thread_id, "state": graph.get_state(config=config)})
-        return state_history
+        thread_index = app.state.thread_index
+        if limit is None and not summary:
+            threads = []
+            page, next_cursor = thread_index.list(limit=THREADS_PAGE_SIZE)
+            threads.extend(page)
+            while next_cursor:
+                page, next_cursor = thread_index.list(limit=THREADS_PAGE_SIZE, cursor=next_cursor)
+                threads.extend(page)
+
+            state_history = []
+            for thread in threads:
+                graph = await get_graph(thread_agent(thread.get("agent")))
+                config = {"configurable": {"thread_id": thread["thread_id"]}}
+                state_history.append({"thread_id": thread["thread_id"], "state": await graph.aget_state(config=config)})
+            return state_history
+
+        page, next_cursor = thread_index.list(limit=min(limit or THREADS_PAGE_SIZE, THREADS_MAX_PAGE_SIZE), cursor=cursor)
+        if not summary:
+            for thread in page:
+                graph = await get_graph(thread_agent(thread.get("agent")))
+                thread["state"] = await graph.aget_state(config={"configurable": {"thread_id": thread["thread_id"]}})
+        return {"threads": page, "next_cursor": next_cursor}
     except Exception as e:
         logger.error(f"Error getting threads: {e}")
         return {"error": str(e)}
@@ -436,10 +936,9 @@ async def threads():
 @app.get("/chat-history/{thread_id}")
 async def chat_history(thread_id: str):
     try:
-        checkpointer = get_or_create_checkpointer()
-        graph = build_workflow(checkpointer=checkpointer, llm=llm)
+        graph = await get_graph(thread_agent(app.state.thread_index.agent(thread_id)))
         config = {"configurable": {"thread_id": thread_id}}
-        state_history = graph.get_state(config=config)
+        state_history = await graph.aget_state(config=config)
         print(state_history)
         return state_history
     except Exception as e:
@@ -448,35 +947,64 @@ async def chat_history(thread_id: str):
 
 @app.get("/available-agents", response_class=JSONResponse)
 async def available_agents():
-    try:
-        # map from langgraph.json to a list of agent names
-        with open("../langgraph.json", "r") as f:
-            langgraph_json = json.load(f)
-        return {"agents": list(langgraph_json["graphs"].keys())}
-    except FileNotFoundError:
-        return {"agents": [], "error": "langgraph.json not found"}
+    # Agent names from langgraph.json, the ones /chat-message's "agent" accepts
+    return {"agents": app.state.graph_registry.agent_names(), "default": DEFAULT_AGENT}
+
+def loaded_module_stats(module_name: str, stats) -> dict | None:
+    """stats(module) for a helper module that only agent graphs import; None until one has, since
+    importing it here would load what lazy graph imports avoid (Playwright, Pillow, lxml)"""
+    module = sys.modules.get(module_name)
+    return stats(module) if module is not None else None
+
+@app.get("/metrics")
+async def metrics():
+    """Runtime counters for the app's shared components"""
+    return {
+        "graph_registry": app.state.graph_registry.stats(),
+        "graph_streamer": app.state.graph_streamer.stats(),
+        "checkpointer": get_or_create_checkpointer().stats(),
+        "checkpoint_retention": app.state.checkpoint_retention.stats(),
+        "thread_index": app.state.thread_index.stats(),
+        "ollama_pool": app.state.ollama_pool.stats(),
+        "health_prober": app.state.health_prober.stats(),
+        "prompt_cache": prompt_cache.stats(),
+        "llm_factory": llm_factory.stats(),
+        "routing": routing_stats(),
+        "response_cache": app.state.response_cache.stats(),
+        "admission": app.state.admission.stats(),
+        "browser_pool": loaded_module_stats("agents.utils.browser_pool", lambda module: module.get_browser_pool().stats()),
+        "html_trim": loaded_module_stats("agents.utils.html_trim", lambda module: module.trim_stats()),
+        "vision_images": loaded_module_stats("agents.utils.images", lambda module: module.image_stats()),
+        "workspace": workspace.stats(),
+        "static_cache": app.state.static_cache.stats(),
+        "page_events": app.state.page_events.stats(),
+        "stream_replay": app.state.replay.stats(),
+        "jobs": app.state.jobs.stats(),
+        "chat_batch": batch_stats(),
+    }
 
 @app.get("/models")
 async def list_models():
-    """List available Ollama models"""
+    """List available Ollama models, across all backends"""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{OllamaConfig.BASE_URL}/api/tags")
-            
-            if response.status_code == 200:
-                data = response.json()
-                models = [model["name"] for model in data.get("models", [])]
-                return {
-                    "provider": "ollama",
-                    "models": models,
-                    "current": OllamaConfig.MODEL,
-                    "base_url": OllamaConfig.BASE_URL
-                }
-            else:
-                return {
-                    "error": "Failed to fetch models from Ollama",
-                    "current": OllamaConfig.MODEL
-                }
+        pool = app.state.ollama_pool
+        # Refresh from every backend rather than serving the last poll
+        await pool.poll()
+        
+        if any(backend.healthy for backend in pool.backends):
+            models = pool.models()
+            return {
+                "provider": "ollama",
+                "models": list(models),
+                "current": OllamaConfig.MODEL,
+                "base_url": OllamaConfig.BASE_URL,
+                "backends": models,
+            }
+        else:
+            return {
+                "error": "Failed to fetch models from Ollama",
+                "current": OllamaConfig.MODEL
+            }
                 
     except Exception as e:
         return {
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Run a JSONL file of chat messages through a running LlamaBot backend (POST /chat-batch).
+
+Each line is a {"message", "thread_id", "agent", "priority"} record; only "message" is
+required. Results are written as JSONL as they complete (one line per record with its
+latency, token count and reply, then a summary line), and the summary is printed to stderr.
+
+Usage:
+
+python chat_batch.py prompts.jsonl -o results.jsonl --concurrency 8 --retries 2
+python chat_batch.py prompts.jsonl --url http://localhost:8000 --cache
+"""
+import argparse
+import json
+import sys
+
+import httpx
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a JSONL batch of chat messages through /chat-batch")
+    parser.add_argument("input", help="JSONL file of {message, thread_id, agent, priority} records ('-' for stdin)")
+    parser.add_argument("-o", "--output", default="-", help="Where to write the JSONL results (default: stdout)")
+    parser.add_argument("--url", default="http://localhost:8000", help="Backend base URL (default: http://localhost:8000)")
+    parser.add_argument("--concurrency", type=int, default=None, help="Records run at once (default: CHAT_BATCH_CONCURRENCY)")
+    parser.add_argument("--retries", type=int, default=None, help="Retries per failed record (default: CHAT_BATCH_RETRIES)")
+    parser.add_argument("--cache", action="store_true", help="Allow replies from the response cache")
+    args = parser.parse_args()
+
+    body = sys.stdin.read() if args.input == "-" else open(args.input, encoding="utf-8").read()
+    params = {"cache": str(args.cache).lower()}
+    if args.concurrency is not None:
+        params["concurrency"] = args.concurrency
+    if args.retries is not None:
+        params["retries"] = args.retries
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    summary, failed = None, 0
+    try:
+        with httpx.stream("POST", f"{args.url.rstrip('/')}/chat-batch", content=body.encode("utf-8"), params=params,
+                          headers={"Content-Type": "application/x-ndjson"}, timeout=None) as response:
+            if response.status_code != 200:
+                response.read()
+                print(f"Batch rejected ({response.status_code}): {response.text}", file=sys.stderr)
+                return 2
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                output.write(line + "\n")
+                output.flush()
+                result = json.loads(line)
+                if result["type"] == "summary":
+                    summary = result
+                elif result["status"] == "succeeded":
+                    print(f"#{result['index']}: {result['latency_ms']} ms, {result['tokens']} tokens", file=sys.stderr)
+                else:
+                    failed += 1
+                    print(f"#{result['index']}: failed after {result['attempts']} attempts: {result['error']}", file=sys.stderr)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    if summary is not None:
+        print(json.dumps(summary, indent=2), file=sys.stderr)
+    return 1 if failed or summary is None else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
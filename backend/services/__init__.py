@@ -0,0 +1 @@
+# Make services a Python package (app-level infrastructure shared by the FastAPI endpoints)
@@ -0,0 +1,225 @@
+"""
+Admission control in front of the model.
+
+A single Ollama instance gets slower for everyone when it runs many generations at once, so
+each model admits at most ADMISSION_MAX_IN_FLIGHT runs at a time and queues the rest:
+
+  * interactive requests are always admitted before heavy ones (e.g. site cloning with
+    Playwright, batch and background jobs)
+  * within a priority, waiting requests take turns per thread_id (round robin), so one busy
+    conversation can't starve the others
+  * once ADMISSION_MAX_QUEUE requests are waiting, new ones are rejected (HTTP 429)
+
+Usage:
+
+admission.check(model)                      # raises AdmissionRejected when the queue is full
+ticket = admission.enqueue(model, thread_id, priority="interactive")
+try:
+    async for position in ticket.wait():
+        ...  # tell the client where it is in the queue
+    ...  # run the graph
+finally:
+    ticket.release()
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict, deque
+
+logger = logging.getLogger(__name__)
+
+PRIORITIES = ("interactive", "heavy")
+
+
+class AdmissionConfig:
+    MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "2"))
+    MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+    # Waiting longer than this gives up with an error instead of queueing forever
+    QUEUE_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "300"))
+
+
+class AdmissionRejected(Exception):
+    """The queue for this model is full."""
+
+    def __init__(self, model: str, queued: int):
+        super().__init__(f"Too many requests waiting for {model} ({queued} queued)")
+        self.model = model
+        self.queued = queued
+
+
+class AdmissionTimeout(Exception):
+    """Waited longer than ADMISSION_QUEUE_TIMEOUT_SECONDS without being admitted."""
+
+
+class Ticket:
+    def __init__(self, controller: "AdmissionController", model: str, thread_id: str, priority: str):
+        self.controller = controller
+        self.model = model
+        self.thread_id = thread_id
+        self.priority = priority
+        self.enqueued_at = time.perf_counter()
+        self.admitted = False
+        self.released = False
+        self.changed = asyncio.Event()
+
+    async def wait(self, timeout: float | None = None):
+        """Yield this ticket's queue position (1 = next) whenever it changes, until admitted."""
+        timeout = AdmissionConfig.QUEUE_TIMEOUT_SECONDS if timeout is None else timeout
+        deadline = time.perf_counter() + timeout
+        last_position = None
+        try:
+            while not self.admitted:
+                position = self.controller.position(self)
+                if position != last_position:
+                    last_position = position
+                    yield position
+                self.changed.clear()
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    raise AdmissionTimeout(f"Waited {timeout:.0f}s for {self.model}")
+                try:
+                    await asyncio.wait_for(self.changed.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            # Cancelled, timed out or the client went away: give up the place in the queue
+            self.release()
+            raise
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.controller._release(self)
+
+
+class _ModelQueue:
+    def __init__(self):
+        self.in_flight = 0
+        # priority -> thread_id -> waiting tickets; thread order is the round-robin order
+        self.waiting = {priority: OrderedDict() for priority in PRIORITIES}
+
+    def __len__(self):
+        return sum(len(tickets) for threads in self.waiting.values() for tickets in threads.values())
+
+    def service_order(self) -> list[Ticket]:
+        """Waiting tickets in the order they would be admitted."""
+        order = []
+        for priority in PRIORITIES:
+            queues = [deque(tickets) for tickets in self.waiting[priority].values()]
+            while queues:
+                for queue in queues:
+                    order.append(queue.popleft())
+                queues = [queue for queue in queues if queue]
+        return order
+
+    def pop_next(self) -> Ticket | None:
+        for priority in PRIORITIES:
+            threads = self.waiting[priority]
+            if threads:
+                thread_id, tickets = next(iter(threads.items()))
+                ticket = tickets.popleft()
+                # This thread had its turn: move it to the back of the round robin
+                del threads[thread_id]
+                if tickets:
+                    threads[thread_id] = tickets
+                return ticket
+        return None
+
+    def remove(self, ticket: Ticket):
+        threads = self.waiting[ticket.priority]
+        tickets = threads.get(ticket.thread_id)
+        if tickets and ticket in tickets:
+            tickets.remove(ticket)
+            if not tickets:
+                del threads[ticket.thread_id]
+
+
+class AdmissionController:
+    def __init__(self, max_in_flight: int = AdmissionConfig.MAX_IN_FLIGHT, max_queue: int = AdmissionConfig.MAX_QUEUE):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self._models = {}
+        self.admitted = {priority: 0 for priority in PRIORITIES}
+        self.rejected = 0
+        self.abandoned = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _queue(self, model: str) -> _ModelQueue:
+        if model not in self._models:
+            self._models[model] = _ModelQueue()
+        return self._models[model]
+
+    def check(self, model: str):
+        """Reject up front (before a response has started) when the model's queue is full."""
+        queued = len(self._queue(model))
+        if queued >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected(model, queued)
+
+    def enqueue(self, model: str, thread_id: str | None, priority: str = "interactive") -> Ticket:
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}'")
+        queue = self._queue(model)
+        ticket = Ticket(self, model, thread_id or "", priority)
+        if queue.in_flight < self.max_in_flight and not len(queue):
+            self._admit(queue, ticket)
+            return ticket
+        if len(queue) >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected(model, len(queue))
+        tickets = queue.waiting[priority].setdefault(ticket.thread_id, deque())
+        tickets.append(ticket)
+        self._notify(queue)
+        return ticket
+
+    def position(self, ticket: Ticket) -> int:
+        order = self._queue(ticket.model).service_order()
+        return order.index(ticket) + 1 if ticket in order else 0
+
+    def _admit(self, queue: _ModelQueue, ticket: Ticket):
+        queue.in_flight += 1
+        ticket.admitted = True
+        waited = time.perf_counter() - ticket.enqueued_at
+        self.admitted[ticket.priority] += 1
+        self.total_wait_seconds += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        ticket.changed.set()
+
+    def _release(self, ticket: Ticket):
+        queue = self._queue(ticket.model)
+        if ticket.admitted:
+            queue.in_flight -= 1
+        else:
+            queue.remove(ticket)
+            self.abandoned += 1
+        while queue.in_flight < self.max_in_flight:
+            next_ticket = queue.pop_next()
+            if next_ticket is None:
+                break
+            self._admit(queue, next_ticket)
+        self._notify(queue)
+
+    def _notify(self, queue: _ModelQueue):
+        # Queue positions moved: wake every waiter so it can report its new position
+        for threads in queue.waiting.values():
+            for tickets in threads.values():
+                for ticket in tickets:
+                    ticket.changed.set()
+
+    def stats(self) -> dict:
+        admitted = sum(self.admitted.values())
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "models": {
+                model: {"in_flight": queue.in_flight, "queued": len(queue)}
+                for model, queue in self._models.items()
+            },
+            "admitted": dict(self.admitted),
+            "rejected": self.rejected,
+            "abandoned": self.abandoned,
+            "avg_wait_ms": round(self.total_wait_seconds / admitted * 1000, 1) if admitted else None,
+            "max_wait_ms": round(self.max_wait_seconds * 1000, 1),
+        }
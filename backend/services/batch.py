@@ -0,0 +1,206 @@
+"""
+Batch runs of many chat messages, for regression tests and bulk generation.
+
+POST /chat-batch takes a JSONL body, one {"message", "thread_id", "agent", "priority"} record
+per line (only "message" is required), and runs the records through the same chat run as
+/chat-message, CHAT_BATCH_CONCURRENCY at a time. Results stream back as JSONL in completion
+order, one line per record:
+
+  {"type": "result", "index": 3, "status": "succeeded", "attempts": 1, "latency_ms": 2140.5,
+   "first_token_ms": 310.2, "tokens": 182, "chars": 730, "reply": "...", "node": "respond_naturally", ...}
+
+followed by a {"type": "summary"} line with totals and latency percentiles. "tokens" counts
+the streamed model chunks, which is one per token with Ollama.
+
+Each record is isolated: a failed or timed-out run (CHAT_BATCH_ITEM_TIMEOUT_SECONDS) is
+retried up to CHAT_BATCH_RETRIES times with exponential backoff, and a record that still
+fails is reported without affecting the others. Records without a thread_id run on a scratch
+thread per attempt, so they don't see each other's history, and the endpoint deletes it
+(checkpoints and workspace) when the attempt ends. Records with a thread_id are retried from
+the checkpoint their thread was at before the first attempt, dropping the failed partial turn;
+a thread that had no checkpoint yet can't be rolled back without deleting what others wrote to
+it since, so such a record isn't retried (run_item raises NotRetryable).
+
+Usage:
+
+items, errors = parse_batch(body)
+async for line in run_batch(items, run_item, concurrency=4):   # run_item(item, attempt) -> events
+    ...
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+_stats = {"batches": 0, "items": 0, "succeeded": 0, "failed": 0, "retries": 0}
+
+
+class BatchConfig:
+    CONCURRENCY = int(os.getenv("CHAT_BATCH_CONCURRENCY", "4"))
+    MAX_CONCURRENCY = int(os.getenv("CHAT_BATCH_MAX_CONCURRENCY", "16"))
+    MAX_ITEMS = int(os.getenv("CHAT_BATCH_MAX_ITEMS", "1000"))
+    RETRIES = int(os.getenv("CHAT_BATCH_RETRIES", "1"))
+    RETRY_BACKOFF_SECONDS = float(os.getenv("CHAT_BATCH_RETRY_BACKOFF_SECONDS", "2"))
+    ITEM_TIMEOUT_SECONDS = float(os.getenv("CHAT_BATCH_ITEM_TIMEOUT_SECONDS", "600"))
+
+
+class BatchError(ValueError):
+    """The batch as a whole can't be run (e.g. too many records)."""
+
+
+class NotRetryable(Exception):
+    """Raised by run_item when a failed record can't safely be run again; its last error stands."""
+
+
+def parse_batch(body: str, max_items: int = BatchConfig.MAX_ITEMS) -> tuple[list[dict], list[dict]]:
+    """Records to run (each with its line "index") and results for the lines that aren't valid records."""
+    items, errors = [], []
+    for index, line in enumerate(line for line in body.splitlines() if line.strip()):
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            errors.append(_invalid(index, f"Invalid JSON: {e}"))
+            continue
+        if not isinstance(record, dict) or not isinstance(record.get("message"), str) or not record["message"].strip():
+            errors.append(_invalid(index, "Each record needs a non-empty \"message\""))
+            continue
+        items.append({**record, "index": index})
+    if len(items) + len(errors) > max_items:
+        raise BatchError(f"A batch can hold at most {max_items} records")
+    return items, errors
+
+
+def _invalid(index: int, error: str) -> dict:
+    return {"type": "result", "index": index, "status": "failed", "attempts": 0, "error": error}
+
+
+def _percentile(values: list[float], fraction: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def _attempt(item: dict, attempt: int, run_item, timeout: float) -> dict:
+    """One run of a record, measured."""
+    started = time.perf_counter()
+    measured = {"first_token_ms": None, "tokens": 0, "chars": 0, "node": None, "error": None}
+    reply = []  # text streamed by the latest node, i.e. the answer
+
+    async def consume():
+        events = run_item(item, attempt)
+        try:
+            async for event in events:
+                if event["type"] == "update" and event.get("node"):
+                    if measured["first_token_ms"] is None:
+                        measured["first_token_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                    if event["node"] != measured["node"]:
+                        measured["node"] = event["node"]
+                        reply.clear()
+                    value = str(event.get("value", ""))
+                    reply.append(value)
+                    measured["tokens"] += 1
+                    measured["chars"] += len(value)
+                elif event["type"] == "error":
+                    measured["error"] = event.get("error") or "Run failed"
+        finally:
+            await events.aclose()
+
+    try:
+        await asyncio.wait_for(consume(), timeout)
+    except NotRetryable:
+        raise
+    except asyncio.TimeoutError:
+        measured["error"] = f"Timed out after {timeout:.0f}s"
+    except Exception as e:
+        measured["error"] = str(e) or type(e).__name__
+    return {**measured, "reply": "".join(reply), "latency_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+
+async def run_item_with_retries(item: dict, run_item, retries: int = BatchConfig.RETRIES,
+                                retry_backoff_seconds: float = BatchConfig.RETRY_BACKOFF_SECONDS,
+                                timeout: float = BatchConfig.ITEM_TIMEOUT_SECONDS) -> dict:
+    attempts = 0
+    for attempt in range(retries + 1):
+        if attempt:
+            await asyncio.sleep(retry_backoff_seconds * 2 ** (attempt - 1))
+        try:
+            measured = await _attempt(item, attempt, run_item, timeout)
+        except NotRetryable as e:
+            logger.warning(f"Batch record {item['index']} not retried: {e}")
+            measured["error"] = f"{measured['error']} (not retried: {e})"
+            break
+        attempts += 1
+        if attempt:
+            _stats["retries"] += 1
+        if measured["error"] is None:
+            break
+        logger.warning(f"Batch record {item['index']} failed (attempt {attempt + 1}/{retries + 1}): {measured['error']}")
+    _stats["failed" if measured["error"] else "succeeded"] += 1
+    return {
+        "type": "result",
+        "index": item["index"],
+        "thread_id": item.get("thread_id"),
+        "agent": item.get("agent"),
+        "status": "failed" if measured["error"] else "succeeded",
+        "attempts": attempts,
+        **measured,
+    }
+
+
+async def run_batch(items: list[dict], run_item, concurrency: int = BatchConfig.CONCURRENCY,
+                    retries: int = BatchConfig.RETRIES, errors: list[dict] = (), batch_id: str | None = None,
+                    retry_backoff_seconds: float = BatchConfig.RETRY_BACKOFF_SECONDS,
+                    timeout: float = BatchConfig.ITEM_TIMEOUT_SECONDS):
+    """Yield one result per record as it completes, then a summary. Stopping early cancels the rest."""
+    _stats["batches"] += 1
+    _stats["items"] += len(items) + len(errors)
+    _stats["failed"] += len(errors)
+    started = time.perf_counter()
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    results = asyncio.Queue()
+
+    async def run(item):
+        async with semaphore:
+            result = await run_item_with_retries(item, run_item, retries, retry_backoff_seconds, timeout)
+        results.put_nowait(result)
+
+    tasks = [asyncio.create_task(run(item)) for item in items]
+    finished = list(errors)
+    try:
+        for result in errors:
+            yield result
+        for _ in items:
+            result = await results.get()
+            finished.append(result)
+            yield result
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    succeeded = [result for result in finished if result["status"] == "succeeded"]
+    latencies = [result["latency_ms"] for result in succeeded]
+    yield {
+        "type": "summary",
+        "batch_id": batch_id,
+        "items": len(finished),
+        "succeeded": len(succeeded),
+        "failed": len(finished) - len(succeeded),
+        "retried": sum(1 for result in finished if result["attempts"] > 1),
+        "tokens": sum(result.get("tokens", 0) for result in finished),
+        "wall_ms": round((time.perf_counter() - started) * 1000, 1),
+        "latency_ms": {
+            "p50": _percentile(latencies, 0.5),
+            "p95": _percentile(latencies, 0.95),
+            "max": max(latencies, default=None),
+        },
+        "first_token_ms_p50": _percentile([result["first_token_ms"] for result in succeeded if result["first_token_ms"] is not None], 0.5),
+    }
+
+
+def batch_stats() -> dict:
+    return dict(_stats)
@@ -0,0 +1,563 @@
+"""
+Pluggable checkpoint backends for LangGraph thread persistence.
+
+CHECKPOINT_BACKEND selects the backend:
+  * "sqlite"   (default) - stdlib sqlite3 in WAL mode, writes batched into group commits. No extra dependencies.
+  * "postgres" - AsyncPostgresSaver on a psycopg AsyncConnectionPool (DB_URI), for multi-worker deployments.
+                 Needs langgraph-checkpoint-postgres and psycopg-pool.
+  * "memory"   - in-process MemorySaver (lost on restart), for tests and throwaway sessions.
+
+Every backend implements `aprune(...)`, which CheckpointRetention calls on a schedule to
+keep the newest CHECKPOINT_KEEP_LAST checkpoints per thread and drop the ones older than
+CHECKPOINT_MAX_AGE_DAYS (the newest checkpoint of a thread is always kept).
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from collections.abc import AsyncIterator, Iterator, Sequence
+from typing import Any
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import MemorySaver
+
+logger = logging.getLogger(__name__)
+
+
+class CheckpointConfig:
+    BACKEND = os.getenv("CHECKPOINT_BACKEND", "sqlite").lower()
+    SQLITE_PATH = os.getenv("CHECKPOINT_SQLITE_PATH", "checkpoints.sqlite")
+    # Group commit: flush after this many writes, or after this many milliseconds, whichever comes first
+    BATCH_SIZE = int(os.getenv("CHECKPOINT_BATCH_SIZE", "32"))
+    FLUSH_INTERVAL_MS = int(os.getenv("CHECKPOINT_FLUSH_INTERVAL_MS", "200"))
+    DB_URI = os.getenv("DB_URI")
+    POOL_MIN_SIZE = int(os.getenv("CHECKPOINT_POOL_MIN_SIZE", "1"))
+    POOL_MAX_SIZE = int(os.getenv("CHECKPOINT_POOL_MAX_SIZE", "10"))
+    # Retention (0 disables the rule)
+    KEEP_LAST = int(os.getenv("CHECKPOINT_KEEP_LAST", "50"))
+    MAX_AGE_DAYS = float(os.getenv("CHECKPOINT_MAX_AGE_DAYS", "0"))
+    COMPACT_INTERVAL_SECONDS = float(os.getenv("CHECKPOINT_COMPACT_INTERVAL_SECONDS", "300"))
+
+
+class ThreadIndexMixin:
+    """Keeps a ThreadIndex up to date as checkpoints are written (see services/thread_index.py)."""
+
+    thread_index = None
+
+    def _record_thread(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata):
+        if self.thread_index is not None:
+            self.thread_index.record(config, checkpoint, get_checkpoint_metadata(config, metadata))
+
+    def _forget_thread(self, thread_id: str):
+        if self.thread_index is not None:
+            self.thread_index.delete(thread_id)
+
+
+class SqliteCheckpointSaver(ThreadIndexMixin, BaseCheckpointSaver[str]):
+    """Checkpoint saver on stdlib sqlite3, in WAL mode with batched (group) commits.
+
+    All access goes through one connection guarded by a lock, so reads in this process
+    always see writes that are still waiting to be committed. Committed data is visible to
+    other processes; at most FLUSH_INTERVAL_MS of writes are lost if the process crashes.
+    """
+
+    def __init__(self, path: str = CheckpointConfig.SQLITE_PATH, batch_size: int = CheckpointConfig.BATCH_SIZE,
+                 flush_interval_ms: int = CheckpointConfig.FLUSH_INTERVAL_MS, serde=None):
+        super().__init__(serde=serde)
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval_ms / 1000
+        self.lock = threading.RLock()
+        self.pending = 0
+        self.commits = 0
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._setup()
+
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name="checkpoint-flusher", daemon=True)
+        self._flusher.start()
+
+    def _setup(self):
+        with self.lock:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS checkpoints (
+                    thread_id TEXT NOT NULL,
+                    checkpoint_ns TEXT NOT NULL DEFAULT '',
+                    checkpoint_id TEXT NOT NULL,
+                    parent_checkpoint_id TEXT,
+                    type TEXT,
+                    checkpoint BLOB,
+                    metadata_type TEXT,
+                    metadata BLOB,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+                );
+                CREATE TABLE IF NOT EXISTS writes (
+                    thread_id TEXT NOT NULL,
+                    checkpoint_ns TEXT NOT NULL DEFAULT '',
+                    checkpoint_id TEXT NOT NULL,
+                    task_id TEXT NOT NULL,
+                    idx INTEGER NOT NULL,
+                    channel TEXT NOT NULL,
+                    type TEXT,
+                    value BLOB,
+                    task_path TEXT NOT NULL DEFAULT '',
+                    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+                );
+            """)
+
+    # --- batching -----------------------------------------------------------------------
+
+    def _begin_write(self):
+        if not self.conn.in_transaction:
+            self.conn.execute("BEGIN")
+
+    def _end_write(self):
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self._commit()
+
+    def _commit(self):
+        if self.conn.in_transaction:
+            self.conn.execute("COMMIT")
+            self.commits += 1
+        self.pending = 0
+
+    def _flush_loop(self):
+        while not self._closed.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Commit any batched writes now."""
+        with self.lock:
+            if self.pending:
+                self._commit()
+
+    def close(self):
+        self._closed.set()
+        with self.lock:
+            self._commit()
+            self.conn.close()
+
+    # --- reads ----------------------------------------------------------------------------
+
+    def _row_to_tuple(self, row) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type_, checkpoint, metadata_type, metadata = row
+        writes = self.conn.execute(
+            "SELECT task_id, channel, type, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}},
+            checkpoint=self.serde.loads_typed((type_, checkpoint)),
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_checkpoint_id}}
+                if parent_checkpoint_id else None
+            ),
+            pending_writes=[(task_id, channel, self.serde.loads_typed((t, v))) for task_id, channel, t, v in writes],
+        )
+
+    _COLUMNS = "thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata"
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        with self.lock:
+            if checkpoint_id:
+                row = self.conn.execute(
+                    f"SELECT {self._COLUMNS} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self.conn.execute(
+                    f"SELECT {self._COLUMNS} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+            return self._row_to_tuple(row) if row else None
+
+    def list(self, config: RunnableConfig | None, *, filter: dict[str, Any] | None = None,
+             before: RunnableConfig | None = None, limit: int | None = None) -> Iterator[CheckpointTuple]:
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if config["configurable"].get("checkpoint_ns") is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(config["configurable"]["checkpoint_ns"])
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT {self._COLUMNS} FROM checkpoints {where} ORDER BY checkpoint_id DESC", params
+            ).fetchall()
+            results = []
+            for row in rows:
+                if limit is not None and len(results) >= limit:
+                    break
+                checkpoint_tuple = self._row_to_tuple(row)
+                # Metadata is serialized, so filtering happens here rather than in SQL
+                if filter and not all(checkpoint_tuple.metadata.get(k) == v for k, v in filter.items()):
+                    continue
+                results.append(checkpoint_tuple)
+        yield from results
+
+    # --- writes ---------------------------------------------------------------------------
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        type_, serialized_checkpoint = self.serde.dumps_typed(checkpoint)
+        metadata_type, serialized_metadata = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        with self.lock:
+            self._begin_write()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO checkpoints "
+                "(thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                 type_, serialized_checkpoint, metadata_type, serialized_metadata, time.time()),
+            )
+            # Same transaction as the checkpoint when the index shares this connection
+            self._record_thread(config, checkpoint, metadata)
+            self._end_write()
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[tuple[str, Any]], task_id: str,
+                   task_path: str = "") -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        # Special channels (errors, interrupts...) overwrite; regular writes are only written once
+        verb = "INSERT OR REPLACE" if all(channel in WRITES_IDX_MAP for channel, _ in writes) else "INSERT OR IGNORE"
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, serialized_value = self.serde.dumps_typed(value)
+            rows.append((thread_id, checkpoint_ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, idx),
+                         channel, type_, serialized_value, task_path))
+        with self.lock:
+            self._begin_write()
+            self.conn.executemany(
+                f"{verb} INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value, task_path) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._end_write()
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self.lock:
+            self._begin_write()
+            self.conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            self.conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+            self._forget_thread(thread_id)
+            self._commit()
+
+    def prune(self, thread_id: str | None = None, keep_last: int = CheckpointConfig.KEEP_LAST,
+              max_age_seconds: float = 0) -> int:
+        """Apply the retention policy to one thread (or all of them). Returns the number of checkpoints removed."""
+        removed = 0
+        with self.lock:
+            if thread_id is None:
+                keys = self.conn.execute("SELECT DISTINCT thread_id, checkpoint_ns FROM checkpoints").fetchall()
+            else:
+                keys = self.conn.execute(
+                    "SELECT DISTINCT thread_id, checkpoint_ns FROM checkpoints WHERE thread_id = ?", (thread_id,)
+                ).fetchall()
+            self._begin_write()
+            for key_thread_id, checkpoint_ns in keys:
+                newest = "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC LIMIT ?"
+                if keep_last > 0:
+                    removed += self.conn.execute(
+                        f"DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id NOT IN ({newest})",
+                        (key_thread_id, checkpoint_ns, key_thread_id, checkpoint_ns, keep_last),
+                    ).rowcount
+                if max_age_seconds > 0:
+                    removed += self.conn.execute(
+                        f"DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND created_at < ? AND checkpoint_id NOT IN ({newest})",
+                        (key_thread_id, checkpoint_ns, time.time() - max_age_seconds, key_thread_id, checkpoint_ns, 1),
+                    ).rowcount
+                self.conn.execute(
+                    "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id NOT IN "
+                    "(SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?)",
+                    (key_thread_id, checkpoint_ns, key_thread_id, checkpoint_ns),
+                )
+            self._commit()
+        return removed
+
+    # --- async ----------------------------------------------------------------------------
+    # sqlite3 calls are short but still blocking, so they run in a worker thread.
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config: RunnableConfig | None, *, filter: dict[str, Any] | None = None,
+                    before: RunnableConfig | None = None, limit: int | None = None) -> AsyncIterator[CheckpointTuple]:
+        results = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for checkpoint_tuple in results:
+            yield checkpoint_tuple
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[tuple[str, Any]], task_id: str,
+                          task_path: str = "") -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    async def aprune(self, thread_id: str | None = None, keep_last: int = CheckpointConfig.KEEP_LAST,
+                     max_age_seconds: float = 0) -> int:
+        return await asyncio.to_thread(self.prune, thread_id, keep_last, max_age_seconds)
+
+    async def aclose(self):
+        await asyncio.to_thread(self.close)
+
+    def stats(self) -> dict:
+        return {"backend": "sqlite", "path": self.path, "pending_writes": self.pending, "commits": self.commits}
+
+
+class CompactingMemorySaver(ThreadIndexMixin, MemorySaver):
+    """MemorySaver with the same retention and thread index hooks as the persistent backends."""
+
+    # MemorySaver's async methods call these sync ones, so hooking them covers both
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        next_config = super().put(config, checkpoint, metadata, new_versions)
+        self._record_thread(config, checkpoint, metadata)
+        return next_config
+
+    def delete_thread(self, thread_id: str) -> None:
+        super().delete_thread(thread_id)
+        self._forget_thread(thread_id)
+
+    def prune(self, thread_id: str | None = None, keep_last: int = CheckpointConfig.KEEP_LAST,
+              max_age_seconds: float = 0) -> int:
+        removed = 0
+        cutoff = time.time() - max_age_seconds
+        for key_thread_id in [thread_id] if thread_id is not None else list(self.storage.keys()):
+            namespaces = self.storage.get(key_thread_id, {})
+            referenced_blobs = set()
+            for checkpoint_ns, checkpoints in namespaces.items():
+                ordered = sorted(checkpoints.keys(), reverse=True)
+                drop = set(ordered[keep_last:]) if keep_last > 0 else set()
+                if max_age_seconds > 0:
+                    for checkpoint_id in ordered[1:]:
+                        checkpoint = self.serde.loads_typed(checkpoints[checkpoint_id][0])
+                        if _iso_to_timestamp(checkpoint["ts"]) < cutoff:
+                            drop.add(checkpoint_id)
+                for checkpoint_id in drop:
+                    del checkpoints[checkpoint_id]
+                    self.writes.pop((key_thread_id, checkpoint_ns, checkpoint_id), None)
+                removed += len(drop)
+                for stored in checkpoints.values():
+                    for channel, version in self.serde.loads_typed(stored[0])["channel_versions"].items():
+                        referenced_blobs.add((key_thread_id, checkpoint_ns, channel, version))
+            for blob_key in [k for k in self.blobs if k[0] == key_thread_id and k not in referenced_blobs]:
+                del self.blobs[blob_key]
+        return removed
+
+    async def aprune(self, thread_id: str | None = None, keep_last: int = CheckpointConfig.KEEP_LAST,
+                     max_age_seconds: float = 0) -> int:
+        return self.prune(thread_id, keep_last, max_age_seconds)
+
+    async def aclose(self):
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "threads": len(self.storage)}
+
+
+def _iso_to_timestamp(ts: str) -> float:
+    return datetime.fromisoformat(ts).timestamp()
+
+
+async def open_postgres_checkpointer(db_uri: str = CheckpointConfig.DB_URI,
+                                     min_size: int = CheckpointConfig.POOL_MIN_SIZE,
+                                     max_size: int = CheckpointConfig.POOL_MAX_SIZE):
+    """AsyncPostgresSaver on a shared connection pool. Must be called from the running event loop."""
+    from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+    from psycopg.rows import dict_row
+    from psycopg_pool import AsyncConnectionPool
+
+    class PooledAsyncPostgresSaver(ThreadIndexMixin, AsyncPostgresSaver):
+        # The sync methods of AsyncPostgresSaver delegate to these, so only the async side is hooked
+        async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                       new_versions: ChannelVersions) -> RunnableConfig:
+            next_config = await super().aput(config, checkpoint, metadata, new_versions)
+            await asyncio.to_thread(self._record_thread, config, checkpoint, metadata)
+            return next_config
+
+        async def adelete_thread(self, thread_id: str) -> None:
+            await super().adelete_thread(thread_id)
+            self._forget_thread(thread_id)
+
+        async def aprune(self, thread_id: str | None = None, keep_last: int = CheckpointConfig.KEEP_LAST,
+                         max_age_seconds: float = 0) -> int:
+            thread_filter, params = ("AND thread_id = %(thread_id)s", {"thread_id": thread_id}) if thread_id else ("", {})
+            removed = 0
+            async with self.conn.connection() as conn:
+                if keep_last > 0:
+                    result = await conn.execute(f"""
+                        DELETE FROM checkpoints c USING (
+                            SELECT thread_id, checkpoint_ns, checkpoint_id,
+                                   row_number() OVER (PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC) AS rank
+                            FROM checkpoints WHERE true {thread_filter}
+                        ) ranked
+                        WHERE c.thread_id = ranked.thread_id AND c.checkpoint_ns = ranked.checkpoint_ns
+                          AND c.checkpoint_id = ranked.checkpoint_id AND ranked.rank > %(keep_last)s
+                    """, {**params, "keep_last": keep_last})
+                    removed += result.rowcount
+                if max_age_seconds > 0:
+                    result = await conn.execute(f"""
+                        DELETE FROM checkpoints c USING (
+                            SELECT thread_id, checkpoint_ns, checkpoint_id,
+                                   row_number() OVER (PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC) AS rank
+                            FROM checkpoints WHERE true {thread_filter}
+                        ) ranked
+                        WHERE c.thread_id = ranked.thread_id AND c.checkpoint_ns = ranked.checkpoint_ns
+                          AND c.checkpoint_id = ranked.checkpoint_id AND ranked.rank > 1
+                          AND (c.checkpoint->>'ts')::timestamptz < now() - make_interval(secs => %(max_age)s)
+                    """, {**params, "max_age": max_age_seconds})
+                    removed += result.rowcount
+                await conn.execute(f"""
+                    DELETE FROM checkpoint_writes w WHERE true {thread_filter.replace('thread_id', 'w.thread_id')}
+                      AND NOT EXISTS (SELECT 1 FROM checkpoints c WHERE c.thread_id = w.thread_id
+                                      AND c.checkpoint_ns = w.checkpoint_ns AND c.checkpoint_id = w.checkpoint_id)
+                """, params)
+                # Blobs are shared between checkpoints, so only drop the versions no remaining checkpoint points at
+                await conn.execute(f"""
+                    DELETE FROM checkpoint_blobs b WHERE true {thread_filter.replace('thread_id', 'b.thread_id')}
+                      AND NOT EXISTS (SELECT 1 FROM checkpoints c WHERE c.thread_id = b.thread_id
+                                      AND c.checkpoint_ns = b.checkpoint_ns
+                                      AND c.checkpoint -> 'channel_versions' ->> b.channel = b.version)
+                """, params)
+            return removed
+
+        async def aclose(self):
+            await self.conn.close()
+
+        def stats(self) -> dict:
+            return {"backend": "postgres", "pool": self.conn.get_stats()}
+
+    pool = AsyncConnectionPool(
+        conninfo=db_uri,
+        min_size=min_size,
+        max_size=max_size,
+        kwargs={"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row},
+        open=False,
+    )
+    await pool.open()
+    saver = PooledAsyncPostgresSaver(pool)
+    await saver.setup()
+    return saver
+
+
+def create_checkpointer(backend: str = CheckpointConfig.BACKEND):
+    """Create a local (sqlite or memory) checkpointer. Postgres is opened with open_postgres_checkpointer()."""
+    if backend == "memory":
+        return CompactingMemorySaver()
+    if backend == "sqlite":
+        return SqliteCheckpointSaver()
+    raise ValueError(f"Checkpoint backend '{backend}' must be opened asynchronously or is unknown")
+
+
+async def open_checkpointer(backend: str = CheckpointConfig.BACKEND):
+    """Open the configured checkpointer, falling back to SQLite if Postgres is unavailable."""
+    if backend == "postgres":
+        if CheckpointConfig.DB_URI:
+            try:
+                saver = await open_postgres_checkpointer()
+                logger.info("Using pooled PostgreSQL checkpoint persistence.")
+                return saver
+            except Exception as e:
+                logger.warning(f"Failed to connect to PostgreSQL: {e}. Using SQLite.")
+        else:
+            logger.warning("CHECKPOINT_BACKEND=postgres but no DB_URI found. Using SQLite.")
+        backend = "sqlite"
+
+    saver = create_checkpointer(backend)
+    logger.info(f"Using {backend} checkpoint persistence.")
+    return saver
+
+
+class CheckpointRetention:
+    """Background task applying the retention policy to all threads on a schedule."""
+
+    def __init__(self, checkpointer, keep_last: int = CheckpointConfig.KEEP_LAST,
+                 max_age_days: float = CheckpointConfig.MAX_AGE_DAYS,
+                 interval_seconds: float = CheckpointConfig.COMPACT_INTERVAL_SECONDS):
+        self.checkpointer = checkpointer
+        self.keep_last = keep_last
+        self.max_age_seconds = max_age_days * 86400
+        self.interval_seconds = interval_seconds
+        self.runs = 0
+        self.removed = 0
+        self._task = None
+
+    @property
+    def enabled(self) -> bool:
+        return hasattr(self.checkpointer, "aprune") and (self.keep_last > 0 or self.max_age_seconds > 0)
+
+    async def compact(self, thread_id: str | None = None) -> int:
+        removed = await self.checkpointer.aprune(thread_id, keep_last=self.keep_last, max_age_seconds=self.max_age_seconds)
+        self.runs += 1
+        self.removed += removed
+        if removed:
+            logger.info(f"Checkpoint retention removed {removed} old checkpoints")
+        return removed
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.compact()
+            except Exception as e:
+                logger.warning(f"Checkpoint retention failed: {e}")
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "keep_last": self.keep_last,
+            "max_age_seconds": self.max_age_seconds,
+            "runs": self.runs,
+            "removed": self.removed,
+        }
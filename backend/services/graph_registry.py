@@ -0,0 +1,182 @@
+"""
+Registry of compiled LangGraph workflows.
+
+Building a workflow means creating the StateGraph, binding tools and compiling it,
+which is far too expensive to repeat for every request. The registry compiles each
+graph once per (agent name, checkpointer, model config) and hands out the shared
+compiled graph afterwards. Compiled graphs are stateless between invocations
+(state lives in the checkpointer), so sharing them across requests is safe.
+
+A graph's module is only imported when the graph is first built, so an agent that is never
+used never loads its dependencies (the react_agent pulls in langchain_openai, openai,
+Playwright, Pillow and lxml). GRAPH_PREWARM picks the graphs built in the background at
+startup: "default" (the DEFAULT_AGENT), "all", "none" or a comma separated list of agents.
+
+Usage:
+
+registry = GraphRegistry()
+graph = registry.get("react_agent", checkpointer=checkpointer, llm=llm, model_config={"model": "qwen2.5:latest"})
+graph = await registry.aget("write_html", ...)   # builds in a worker thread instead of on the event loop
+await registry.awarm(agent_names=prewarm_agents(GRAPH_PREWARM, "react_agent"), checkpointer=checkpointer, llm=llm)
+"""
+import asyncio
+import importlib
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# langgraph.json lives at the repository root, one level above backend/
+DEFAULT_LANGGRAPH_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "langgraph.json")
+LANGGRAPH_CONFIG_PATH = os.getenv("LANGGRAPH_CONFIG_PATH", DEFAULT_LANGGRAPH_CONFIG)
+GRAPH_PREWARM = os.getenv("GRAPH_PREWARM", "default")
+
+
+def load_graph_specs(config_path: str = LANGGRAPH_CONFIG_PATH) -> dict[str, str]:
+    """Read the agent name -> "path/to/module.py:function" map from langgraph.json"""
+    with open(config_path, "r") as f:
+        return json.load(f)["graphs"]
+
+
+def resolve_builder(spec: str):
+    """Turn a langgraph.json spec like "./agents/react_agent/nodes.py:build_workflow" into the callable."""
+    file_path, attr = spec.rsplit(":", 1)
+    module_name = file_path.removeprefix("./").removesuffix(".py").replace("/", ".")
+    module = importlib.import_module(module_name)
+    return getattr(module, attr)
+
+
+def prewarm_agents(setting: str, default_agent: str) -> list[str]:
+    """The agents a GRAPH_PREWARM value names."""
+    setting = setting.strip()
+    if setting == "default":
+        return [default_agent]
+    if setting == "all":
+        return list(load_graph_specs())
+    if setting in ("none", ""):
+        return []
+    return [name.strip() for name in setting.split(",") if name.strip()]
+
+
+def _freeze(model_config: dict | None) -> tuple:
+    return tuple(sorted((model_config or {}).items()))
+
+
+class GraphRegistry:
+    def __init__(self, config_path: str = LANGGRAPH_CONFIG_PATH):
+        self.config_path = config_path
+        self.specs = load_graph_specs(config_path)
+        self._graphs = {}
+        self._builders = {}  # agent name -> build function, once its module is imported
+        self._lock = threading.Lock()
+        self.import_seconds = {}  # agent name -> time spent importing its module
+        self.hits = 0
+        self.builds = 0
+        self.build_seconds = 0.0
+
+    def agent_names(self) -> list[str]:
+        return list(self.specs.keys())
+
+    def has(self, agent_name: str) -> bool:
+        return agent_name in self.specs
+
+    def _builder(self, agent_name: str):
+        builder = self._builders.get(agent_name)
+        if builder is None:
+            started = time.perf_counter()
+            builder = resolve_builder(self.specs[agent_name])  # imports the module the first time
+            self.import_seconds[agent_name] = time.perf_counter() - started
+            logger.info(f"Imported graph module for '{agent_name}' in {self.import_seconds[agent_name] * 1000:.1f}ms")
+            self._builders[agent_name] = builder
+        return builder
+
+    def accepts_llm(self, agent_name: str) -> bool:
+        """Whether the agent's graph is built with the caller's llm; the others don't depend on the
+        Ollama backend (imports the module the first time)."""
+        if agent_name not in self.specs:
+            raise KeyError(f"Unknown agent '{agent_name}'. Available agents: {self.agent_names()}")
+        return "llm" in inspect.signature(self._builder(agent_name)).parameters
+
+    async def aaccepts_llm(self, agent_name: str) -> bool:
+        """accepts_llm(), with the first module import run in a worker thread."""
+        if agent_name in self._builders:
+            return "llm" in inspect.signature(self._builders[agent_name]).parameters
+        return await asyncio.to_thread(self.accepts_llm, agent_name)
+
+    def _build(self, agent_name: str, checkpointer, llm):
+        builder = self._builder(agent_name)
+        accepted = inspect.signature(builder).parameters
+        kwargs = {}
+        if "checkpointer" in accepted:
+            kwargs["checkpointer"] = checkpointer
+        if "llm" in accepted and llm is not None:
+            kwargs["llm"] = llm
+        return builder(**kwargs)
+
+    def get(self, agent_name: str, checkpointer=None, llm=None, model_config: dict | None = None):
+        """Return the shared compiled graph for this agent/checkpointer/model, compiling it on first use."""
+        if agent_name not in self.specs:
+            raise KeyError(f"Unknown agent '{agent_name}'. Available agents: {self.agent_names()}")
+
+        key = (agent_name, id(checkpointer), _freeze(model_config))
+        graph = self._graphs.get(key)
+        if graph is not None:
+            self.hits += 1
+            return graph
+
+        with self._lock:
+            graph = self._graphs.get(key)
+            if graph is not None:
+                self.hits += 1
+                return graph
+
+            started = time.perf_counter()
+            graph = self._build(agent_name, checkpointer, llm)
+            elapsed = time.perf_counter() - started
+
+            self._graphs[key] = graph
+            self.builds += 1
+            self.build_seconds += elapsed
+            logger.info(f"Compiled graph '{agent_name}' in {elapsed * 1000:.1f}ms")
+            return graph
+
+    async def aget(self, agent_name: str, checkpointer=None, llm=None, model_config: dict | None = None):
+        """get(), with a first build (module import + compile) run in a worker thread."""
+        graph = self._graphs.get((agent_name, id(checkpointer), _freeze(model_config)))
+        if graph is not None:
+            self.hits += 1
+            return graph
+        return await asyncio.to_thread(self.get, agent_name, checkpointer, llm, model_config)
+
+    def warm(self, checkpointer=None, llm=None, model_config: dict | None = None, agent_names: list[str] | None = None):
+        """Compile graphs up front (at startup). A graph that fails to build is logged, not fatal."""
+        for agent_name in self.agent_names() if agent_names is None else agent_names:
+            try:
+                self.get(agent_name, checkpointer=checkpointer, llm=llm, model_config=model_config)
+            except Exception as e:
+                logger.warning(f"Could not pre-compile graph '{agent_name}': {e}")
+
+    async def awarm(self, checkpointer=None, llm=None, model_config: dict | None = None, agent_names: list[str] | None = None):
+        """warm() in a worker thread, so startup doesn't wait for it (requests that need a graph still
+        being built wait for that build)."""
+        await asyncio.to_thread(self.warm, checkpointer, llm, model_config, agent_names)
+        logger.info(f"Graph registry warmed: {self.stats()}")
+
+    def clear(self):
+        with self._lock:
+            self._graphs.clear()
+
+    def stats(self) -> dict:
+        return {
+            "compiled": len(self._graphs),
+            "hits": self.hits,
+            "builds": self.builds,
+            "build_seconds": round(self.build_seconds, 4),
+            "agents": sorted({key[0] for key in self._graphs}),
+            "available": self.agent_names(),
+            "import_seconds": {name: round(seconds, 4) for name, seconds in self.import_seconds.items()},
+        }
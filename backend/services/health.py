@@ -0,0 +1,118 @@
+"""
+Background health prober for the Ollama backend.
+
+Load balancers probe /health far more often than the model's state actually changes, so
+probing happens here on a schedule instead: every HEALTH_PROBE_INTERVAL_SECONDS the prober
+checks /api/tags (is Ollama up, is the model pulled), /api/ps (is the model loaded in
+memory) and, if HEALTH_PROBE_GENERATE=true, runs a one-token generation. The endpoints
+just return the cached result.
+"""
+import asyncio
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class HealthConfig:
+    INTERVAL_SECONDS = float(os.getenv("HEALTH_PROBE_INTERVAL_SECONDS", "15"))
+    # A one-token generation proves the model actually answers, at the cost of some GPU time
+    GENERATE = os.getenv("HEALTH_PROBE_GENERATE", "false").lower() == "true"
+    GENERATE_INTERVAL_SECONDS = float(os.getenv("HEALTH_PROBE_GENERATE_INTERVAL_SECONDS", "300"))
+    # Readiness fails if the last successful probe is older than this
+    STALE_AFTER_SECONDS = float(os.getenv("HEALTH_PROBE_STALE_AFTER_SECONDS", "60"))
+
+
+class HealthProber:
+    def __init__(self, ollama_client, model: str, interval_seconds: float = HealthConfig.INTERVAL_SECONDS,
+                 generate: bool = HealthConfig.GENERATE,
+                 generate_interval_seconds: float = HealthConfig.GENERATE_INTERVAL_SECONDS):
+        self.ollama_client = ollama_client
+        self.model = model
+        self.interval_seconds = interval_seconds
+        self.generate = generate
+        self.generate_interval_seconds = generate_interval_seconds
+        self.started_at = time.time()
+        self._task = None
+        self._last_generate = 0.0
+        self.probes = 0
+        self.result = {
+            "status": "starting",
+            "ollama_reachable": False,
+            "model_available": False,
+            "model_loaded": False,
+            "last_probe_at": None,
+            "last_success_at": None,
+            "last_probe_latency_ms": None,
+            "last_generate_latency_ms": None,
+            "error": None,
+        }
+
+    async def probe(self) -> dict:
+        """Run one probe and update the cached result."""
+        started = time.perf_counter()
+        result = dict(self.result)
+        result["last_probe_at"] = time.time()
+        try:
+            tags = await self.ollama_client.get("/api/tags")
+            tags.raise_for_status()
+            available = [model["name"] for model in tags.json().get("models", [])]
+            result["ollama_reachable"] = True
+            result["model_available"] = self.model in available
+
+            ps = await self.ollama_client.get("/api/ps")
+            loaded = [model["name"] for model in ps.json().get("models", [])] if ps.status_code == 200 else []
+            result["model_loaded"] = self.model in loaded
+
+            if self.generate and result["model_available"] and time.time() - self._last_generate >= self.generate_interval_seconds:
+                generate_started = time.perf_counter()
+                response = await self.ollama_client.post(
+                    "/api/generate",
+                    json={"model": self.model, "prompt": "ping", "stream": False, "options": {"num_predict": 1}},
+                )
+                response.raise_for_status()
+                self._last_generate = time.time()
+                result["last_generate_latency_ms"] = round((time.perf_counter() - generate_started) * 1000, 1)
+                result["model_loaded"] = True
+
+            result["status"] = "healthy" if result["model_available"] else "degraded"
+            result["error"] = None if result["model_available"] else f"Model {self.model} is not available in Ollama"
+            result["last_success_at"] = result["last_probe_at"]
+        except Exception as e:
+            result["status"] = "unhealthy"
+            result["ollama_reachable"] = False
+            result["model_loaded"] = False
+            result["error"] = str(e) or type(e).__name__
+
+        result["last_probe_latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        self.result = result
+        self.probes += 1
+        return result
+
+    async def _loop(self):
+        while True:
+            await self.probe()
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @property
+    def ready(self) -> bool:
+        last_success = self.result["last_success_at"]
+        fresh = last_success is not None and time.time() - last_success <= HealthConfig.STALE_AFTER_SECONDS
+        return fresh and self.result["model_available"]
+
+    def stats(self) -> dict:
+        return {"probes": self.probes, "interval_seconds": self.interval_seconds, "generate": self.generate}
@@ -0,0 +1,309 @@
+"""
+Background jobs for long agent runs.
+
+A site clone (Playwright, vision model, file writes) or a long ReAct tool loop can take
+minutes, and used to be tied to one streaming HTTP response. POST /jobs queues the same
+run instead and returns a job id straight away; JOBS_WORKERS worker tasks pick jobs up in
+submission order (generations still go through admission control like any other run).
+
+Clients poll GET /jobs/{job_id} for status and progress, or follow the job's events with
+GET /jobs/{job_id}/events?after=N (same events and protocols as /chat-message, resumable
+by index). DELETE /jobs/{job_id} cancels a queued or running job.
+
+Job state is kept in sqlite (JOBS_DB_PATH), so status and results outlive the process.
+Jobs still queued when the app stopped are queued again on startup; jobs that were running
+are marked "interrupted". Events are only kept in memory, like /chat-message's.
+
+  queued -> running -> succeeded | failed | cancelled      (interrupted: lost to a restart)
+
+Usage:
+
+jobs = JobManager(run_job)            # run_job(job) -> async generator of stream events
+await jobs.start()
+job = jobs.submit({"message": "...", "thread_id": "5"})
+jobs.get(job.job_id).to_dict()
+await jobs.cancel(job.job_id)
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from services.replay import ReplayStore
+from services.stream_protocol import dumps
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("queued", "running")
+STATUSES = ACTIVE_STATUSES + ("succeeded", "failed", "cancelled", "interrupted")
+
+
+class JobsConfig:
+    WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+    # Submitting beyond this many queued jobs is rejected (HTTP 429)
+    MAX_QUEUED = int(os.getenv("JOBS_MAX_QUEUED", "100"))
+    DB_PATH = os.getenv("JOBS_DB_PATH", "jobs.sqlite")
+    # Finished jobs' events stay followable this long (their status and result are kept in sqlite)
+    EVENTS_TTL_SECONDS = float(os.getenv("JOBS_EVENTS_TTL_SECONDS", "3600"))
+
+
+class JobQueueFull(Exception):
+    """JOBS_MAX_QUEUED jobs are already waiting."""
+
+
+class Job:
+    def __init__(self, job_id: str, request: dict, status: str = "queued", created_at: float | None = None,
+                 started_at: float | None = None, finished_at: float | None = None, events: int = 0,
+                 last_node: str | None = None, error: str | None = None, result: dict | None = None):
+        self.job_id = job_id
+        self.request = request
+        self.status = status
+        self.created_at = created_at or time.time()
+        self.started_at = started_at
+        self.finished_at = finished_at
+        self.events = events
+        self.last_node = last_node
+        self.error = error
+        self.result = result
+        self.cancel_requested = False
+
+    @property
+    def done(self) -> bool:
+        return self.status not in ACTIVE_STATUSES
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "request": self.request,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "events": self.events,
+            "last_node": self.last_node,
+            "error": self.error,
+            "result": self.result,
+        }
+
+
+class JobStore:
+    """The jobs table, on stdlib sqlite3 (calls are short, so they run inline under a lock)."""
+
+    def __init__(self, path: str = JobsConfig.DB_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                request TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                events INTEGER NOT NULL DEFAULT 0,
+                last_node TEXT,
+                error TEXT,
+                result TEXT
+            );
+            CREATE INDEX IF NOT EXISTS jobs_recent ON jobs (created_at DESC);
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+        """)
+
+    def save(self, job: Job):
+        with self.lock:
+            self.conn.execute("""
+                INSERT OR REPLACE INTO jobs (job_id, status, request, created_at, started_at, finished_at, events, last_node, error, result)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (job.job_id, job.status, dumps(job.request), job.created_at, job.started_at, job.finished_at,
+                  job.events, job.last_node, job.error, dumps(job.result) if job.result is not None else None))
+            self.conn.commit()
+
+    @staticmethod
+    def _job(row) -> Job:
+        job_id, status, request, created_at, started_at, finished_at, events, last_node, error, result = row
+        return Job(job_id, json.loads(request), status, created_at, started_at, finished_at, events, last_node, error,
+                   json.loads(result) if result else None)
+
+    def get(self, job_id: str) -> Job | None:
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._job(row) if row else None
+
+    def list(self, status: str | None = None, limit: int = 50) -> list[Job]:
+        with self.lock:
+            if status:
+                rows = self.conn.execute("SELECT * FROM jobs WHERE status = ? ORDER BY created_at DESC LIMIT ?", (status, limit)).fetchall()
+            else:
+                rows = self.conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [self._job(row) for row in rows]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class JobManager:
+    def __init__(self, run_job, store: JobStore | None = None, workers: int = JobsConfig.WORKERS,
+                 max_queued: int = JobsConfig.MAX_QUEUED):
+        self.run_job = run_job
+        self.store = store
+        self.workers = workers
+        self.max_queued = max_queued
+        # Jobs keep running with nobody following them, at their own pace
+        self.replay = ReplayStore(ttl_seconds=JobsConfig.EVENTS_TTL_SECONDS, grace_seconds=None, max_lag=None)
+        self._queue = asyncio.Queue()
+        self._active = {}  # job_id -> Job, queued or running
+        self._tasks = []
+        self._status_changed = asyncio.Event()  # replaced after every transition
+        self._stats = {"submitted": 0, "succeeded": 0, "failed": 0, "cancelled": 0}
+
+    async def start(self):
+        if self.store is None:
+            self.store = JobStore()
+        requeued = 0
+        for job in reversed(self.store.list(status="queued", limit=self.max_queued)):
+            self._active[job.job_id] = job
+            self._queue.put_nowait(job.job_id)
+            requeued += 1
+        for job in self.store.list(status="running", limit=1000):
+            job.status, job.finished_at, job.error = "interrupted", time.time(), "The app stopped while the job was running"
+            self.store.save(job)
+        if requeued:
+            logger.info(f"Re-queued {requeued} jobs from the last run")
+        self._tasks = [asyncio.create_task(self._worker(n)) for n in range(self.workers)]
+
+    async def aclose(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.replay.aclose()
+        for job in self._active.values():
+            if job.status == "running":
+                job.status, job.finished_at, job.error = "interrupted", time.time(), "The app stopped while the job was running"
+                self.store.save(job)
+        self._active.clear()
+        self.store.close()
+
+    def submit(self, request: dict) -> Job:
+        queued = sum(1 for job in self._active.values() if job.status == "queued")
+        if queued >= self.max_queued:
+            raise JobQueueFull(f"Too many jobs waiting ({queued} queued)")
+        job = Job(f"job_{uuid.uuid4().hex}", request)
+        self.store.save(job)
+        self._active[job.job_id] = job
+        self._queue.put_nowait(job.job_id)
+        self._stats["submitted"] += 1
+        logger.info(f"[{job.job_id}] Job queued")
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        return self._active.get(job_id) or self.store.get(job_id)
+
+    def list(self, status: str | None = None, limit: int = 50) -> list[Job]:
+        jobs = self.store.list(status, limit)
+        # Running jobs' progress is only in memory until they finish
+        return [self._active.get(job.job_id, job) for job in jobs]
+
+    def events(self, job_id: str):
+        """The job's StreamRun, while its events are still buffered."""
+        return self.replay.get(job_id)
+
+    async def wait_started(self, job_id: str):
+        """Wait until the job has left the queue (started, or cancelled while waiting)."""
+        while (job := self._active.get(job_id)) is not None and job.status == "queued":
+            await self._status_changed.wait()
+
+    def _notify(self):
+        self._status_changed.set()
+        self._status_changed = asyncio.Event()
+
+    async def cancel(self, job_id: str) -> Job | None:
+        job = self._active.get(job_id)
+        if job is None:
+            return self.store.get(job_id)
+        job.cancel_requested = True
+        run = self.replay.get(job_id) if job.status == "running" else None
+        if run is not None and run.task is not None:
+            run.task.cancel()
+            await asyncio.gather(run.task, return_exceptions=True)
+        if not job.done:
+            self._finish(job, "cancelled")
+        return job
+
+    def _finish(self, job: Job, status: str, error: str | None = None):
+        job.status, job.finished_at = status, time.time()
+        job.error = error or job.error
+        self.store.save(job)
+        self._active.pop(job.job_id, None)
+        if status in self._stats:
+            self._stats[status] += 1
+        self._notify()
+        logger.info(f"[{job.job_id}] Job {status}")
+
+    async def _tracked(self, job: Job, events):
+        """Pass the run's events through, keeping the job's progress up to date."""
+        reply = []  # text streamed by the latest node, i.e. the answer once the run ends
+        try:
+            async for event in events:
+                job.events += 1
+                if event["type"] == "update" and event.get("node"):
+                    if event["node"] != job.last_node:
+                        job.last_node, reply = event["node"], []
+                    reply.append(str(event.get("value", "")))
+                if event["type"] == "error":
+                    job.error = event.get("error")
+                elif event["type"] == "final":
+                    job.result = {"reply": "".join(reply), "node": job.last_node, "messages": event.get("messages", [])}
+                yield event
+        except Exception as e:
+            job.error = str(e)
+            raise
+        finally:
+            await events.aclose()
+
+    async def _worker(self, number: int):
+        while True:
+            job_id = await self._queue.get()
+            job = self._active.get(job_id)
+            if job is None or job.status != "queued":
+                continue  # cancelled while it was waiting
+            job.status, job.started_at = "running", time.time()
+            self.store.save(job)
+            logger.info(f"[{job_id}] Job started on worker {number}")
+            try:
+                events = self.run_job(job)
+            except Exception as e:
+                logger.error(f"[{job_id}] Could not start job: {e}", exc_info=True)
+                self._finish(job, "failed", str(e))
+                continue
+            run = self.replay.start(job_id, self._tracked(job, events))
+            self._notify()
+            # Shielded: when shutting down, aclose() cancels the run itself and marks the job interrupted
+            await asyncio.shield(run.task)
+            if job.done:
+                continue  # cancel() already recorded it
+            if job.cancel_requested:
+                self._finish(job, "cancelled")
+            elif job.error is not None:
+                self._finish(job, "failed")
+            else:
+                self._finish(job, "succeeded")
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queued": sum(1 for job in self._active.values() if job.status == "queued"),
+            "running": sum(1 for job in self._active.values() if job.status == "running"),
+            "max_queued": self.max_queued,
+            **self._stats,
+            "events": self.replay.stats(),
+        }
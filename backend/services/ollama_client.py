@@ -0,0 +1,126 @@
+"""
+Application-lifetime HTTP client for direct Ollama API calls.
+
+One httpx.AsyncClient (and so one connection pool) is opened at startup and closed at
+shutdown, instead of a new client, pool and TCP connection per request. Connections to
+the Ollama server are kept alive between requests. HTTP/2 can be enabled with
+OLLAMA_HTTP2=true when Ollama sits behind a TLS proxy that speaks it (needs the `h2`
+package); plain Ollama speaks HTTP/1.1 with keep-alive.
+
+Usage:
+
+client = OllamaClient(OllamaConfig.BASE_URL)
+await client.start()
+response = await client.get("/api/tags")
+await client.aclose()
+"""
+import logging
+import os
+import time
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class OllamaClientConfig:
+    MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "20"))
+    MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OLLAMA_MAX_KEEPALIVE_CONNECTIONS", "10"))
+    KEEPALIVE_EXPIRY = float(os.getenv("OLLAMA_KEEPALIVE_EXPIRY", "30"))
+    CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5"))
+    # Generations can take a while, so reads get a much longer timeout than connects
+    READ_TIMEOUT = float(os.getenv("OLLAMA_READ_TIMEOUT", "120"))
+    POOL_TIMEOUT = float(os.getenv("OLLAMA_POOL_TIMEOUT", "10"))
+    HTTP2 = os.getenv("OLLAMA_HTTP2", "false").lower() == "true"
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class OllamaClient:
+    def __init__(self, base_url: str, max_connections: int = OllamaClientConfig.MAX_CONNECTIONS,
+                 max_keepalive_connections: int = OllamaClientConfig.MAX_KEEPALIVE_CONNECTIONS,
+                 keepalive_expiry: float = OllamaClientConfig.KEEPALIVE_EXPIRY,
+                 http2: bool = OllamaClientConfig.HTTP2):
+        self.base_url = base_url.rstrip("/")
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(
+            connect=OllamaClientConfig.CONNECT_TIMEOUT,
+            read=OllamaClientConfig.READ_TIMEOUT,
+            write=OllamaClientConfig.CONNECT_TIMEOUT,
+            pool=OllamaClientConfig.POOL_TIMEOUT,
+        )
+        self.http2 = http2 and _http2_available()
+        if http2 and not self.http2:
+            logger.warning("OLLAMA_HTTP2=true but the h2 package is not installed; using HTTP/1.1 keep-alive")
+        self._client = None
+
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+
+    async def start(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(base_url=self.base_url, limits=self.limits, timeout=self.timeout, http2=self.http2)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        if self._client is None:
+            await self.start()
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        started = time.perf_counter()
+        try:
+            return await self._client.request(method, path, **kwargs)
+        except httpx.HTTPError:
+            self.errors += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self.requests += 1
+            self.total_seconds += time.perf_counter() - started
+
+    async def get(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", path, **kwargs)
+
+    def _pool_connections(self) -> dict:
+        # httpx does not expose pool internals publicly; read them defensively from httpcore
+        pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is None:
+            return {}
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {"open": len(connections), "idle": idle, "active": len(connections) - idle}
+
+    def stats(self) -> dict:
+        return {
+            "base_url": self.base_url,
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "connections": self._pool_connections(),
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "utilisation": round(self.in_flight / self.limits.max_connections, 3) if self.limits.max_connections else None,
+            "requests": self.requests,
+            "errors": self.errors,
+            "avg_latency_ms": round(self.total_seconds / self.requests * 1000, 1) if self.requests else None,
+        }
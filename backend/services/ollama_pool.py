@@ -0,0 +1,210 @@
+"""
+Pool of Ollama backends with model-aware routing.
+
+OLLAMA_BASE_URLS lists several Ollama hosts (default: just OLLAMA_BASE_URL). Every
+OLLAMA_POOL_POLL_SECONDS the pool asks each one which models it has pulled (/api/tags) and
+which are loaded in memory (/api/ps). Requests for a model go to the least-loaded healthy
+backend, preferring one that already has the model loaded, then one that has it pulled.
+A backend that fails with a connection error or timeout is taken out of rotation until a
+poll succeeds again, and the request is retried on the next backend.
+
+Each backend keeps its own pooled keep-alive OllamaClient. The pool has the same
+get()/post()/request() interface as OllamaClient, so it can be used anywhere a single
+client was.
+
+Usage:
+
+pool = OllamaPool(["http://gpu-1:11434", "http://gpu-2:11434"])
+await pool.start()
+async with pool.lease("qwen2.5:latest") as backend:
+    ...  # run a generation against backend.url
+response = await pool.post("/api/chat", json={"model": "qwen2.5:latest", ...})
+await pool.aclose()
+"""
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+
+from services.ollama_client import OllamaClient
+
+logger = logging.getLogger(__name__)
+
+
+class OllamaPoolConfig:
+    POLL_SECONDS = float(os.getenv("OLLAMA_POOL_POLL_SECONDS", "10"))
+
+
+class NoBackendAvailable(Exception):
+    """Every Ollama backend failed or is out of rotation."""
+
+
+class OllamaBackend:
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.client = OllamaClient(self.url)
+        self.healthy = True  # optimistic until the first poll says otherwise
+        self.available_models = set()
+        self.loaded_models = set()
+        self.leases = 0  # generations currently routed here by lease()
+        self.total_leases = 0
+        self.failures = 0
+        self.last_poll_at = None
+        self.last_error = None
+
+    @property
+    def load(self) -> int:
+        return self.leases + self.client.in_flight
+
+    async def poll(self):
+        try:
+            tags = await self.client.get("/api/tags")
+            tags.raise_for_status()
+            self.available_models = {model["name"] for model in tags.json().get("models", [])}
+            ps = await self.client.get("/api/ps")
+            self.loaded_models = {model["name"] for model in ps.json().get("models", [])} if ps.status_code == 200 else set()
+            self.healthy = True
+            self.last_error = None
+        except Exception as e:
+            self.mark_down(e)
+        self.last_poll_at = time.time()
+
+    def mark_down(self, error: Exception):
+        if self.healthy:
+            logger.warning(f"Ollama backend {self.url} out of rotation: {error}")
+        self.healthy = False
+        self.failures += 1
+        self.last_error = str(error) or type(error).__name__
+
+    def stats(self) -> dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "available_models": sorted(self.available_models),
+            "loaded_models": sorted(self.loaded_models),
+            "leases": self.leases,
+            "total_leases": self.total_leases,
+            "failures": self.failures,
+            "last_poll_at": self.last_poll_at,
+            "last_error": self.last_error,
+            "client": self.client.stats(),
+        }
+
+
+class OllamaPool:
+    def __init__(self, base_urls: list[str], poll_seconds: float = OllamaPoolConfig.POLL_SECONDS):
+        if not base_urls:
+            raise ValueError("OllamaPool needs at least one base URL")
+        self.backends = [OllamaBackend(url) for url in base_urls]
+        self.poll_seconds = poll_seconds
+        self._task = None
+        self.failovers = 0
+
+    @property
+    def primary(self) -> OllamaBackend:
+        return self.backends[0]
+
+    async def start(self):
+        for backend in self.backends:
+            await backend.client.start()
+        await self.poll()
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def aclose(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for backend in self.backends:
+            await backend.client.aclose()
+
+    async def poll(self):
+        await asyncio.gather(*(backend.poll() for backend in self.backends))
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            await self.poll()
+
+    def choose(self, model: str | None = None, exclude: set[str] = frozenset()) -> OllamaBackend:
+        """Least-loaded healthy backend, preferring ones with `model` loaded, then pulled."""
+        candidates = [backend for backend in self.backends if backend.url not in exclude]
+        if not candidates:
+            raise NoBackendAvailable("No Ollama backend left to try")
+        # If everything looks down, try anyway: the next poll may not have run yet
+        healthy = [backend for backend in candidates if backend.healthy] or candidates
+
+        def rank(backend: OllamaBackend):
+            hot = model is not None and model in backend.loaded_models
+            pulled = model is not None and model in backend.available_models
+            return (not hot, not pulled, backend.load, self.backends.index(backend))
+
+        return min(healthy, key=rank)
+
+    def acquire(self, model: str | None = None) -> OllamaBackend:
+        """Route one generation (e.g. a graph run) to a backend; counts towards its load until release()."""
+        backend = self.choose(model)
+        backend.leases += 1
+        backend.total_leases += 1
+        return backend
+
+    def release(self, backend: OllamaBackend):
+        backend.leases -= 1
+
+    @asynccontextmanager
+    async def lease(self, model: str | None = None):
+        backend = self.acquire(model)
+        try:
+            yield backend
+        finally:
+            self.release(backend)
+
+    async def request(self, method: str, path: str, model: str | None = None, **kwargs) -> httpx.Response:
+        """Send to the best backend for the request's model, failing over on connection errors."""
+        if model is None and isinstance(kwargs.get("json"), dict):
+            model = kwargs["json"].get("model")
+        tried = set()
+        while True:
+            backend = self.choose(model, exclude=tried)
+            try:
+                return await backend.client.request(method, path, **kwargs)
+            except httpx.TransportError as e:
+                backend.mark_down(e)
+                tried.add(backend.url)
+                if len(tried) == len(self.backends):
+                    raise
+                self.failovers += 1
+                logger.warning(f"Ollama {method} {path} failed on {backend.url}, failing over: {e}")
+
+    async def get(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", path, **kwargs)
+
+    def models(self) -> dict[str, dict]:
+        """Every model any backend has, with where it's pulled and where it's loaded."""
+        models = {}
+        for backend in self.backends:
+            for name in backend.available_models | backend.loaded_models:
+                entry = models.setdefault(name, {"backends": [], "loaded_on": []})
+                if name in backend.available_models:
+                    entry["backends"].append(backend.url)
+                if name in backend.loaded_models:
+                    entry["loaded_on"].append(backend.url)
+        return dict(sorted(models.items()))
+
+    def stats(self) -> dict:
+        return {
+            "backends": [backend.stats() for backend in self.backends],
+            "healthy": sum(1 for backend in self.backends if backend.healthy),
+            "failovers": self.failovers,
+            "poll_seconds": self.poll_seconds,
+        }
@@ -0,0 +1,180 @@
+"""
+Push channel for page updates.
+
+Previews used to find out about a new page by re-fetching /page. The hub listens to
+workspace writes and fans each one out to the clients subscribed to that thread, which
+/page/events streams as Server-Sent Events:
+
+  event: page_revision
+  data: {"thread_id", "name", "sha256", "previous_sha256", "bytes", "at"}
+
+Each subscriber has a small queue. A client too slow to keep up loses its oldest events
+rather than slowing writers down; only the latest revision matters to a preview anyway.
+
+The write listener only sees this process's writes. Other processes sharing WORKSPACE_ROOT
+(the MCP server) are picked up by polling the revision log of every subscribed thread each
+PAGE_EVENTS_POLL_SECONDS (a stat() per thread unless it changed); entries newer than the
+last one published for the thread go out the same way.
+
+Usage:
+
+hub = PageEventHub()
+hub.attach(workspace)                       # in the lifespan, on the event loop
+async with hub.subscribe(thread_id) as queue:
+    event = await queue.get()
+"""
+import asyncio
+import json
+import logging
+import os
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class PageEventsConfig:
+    QUEUE_SIZE = int(os.getenv("PAGE_EVENTS_QUEUE_SIZE", "16"))
+    # A comment line this often keeps proxies from closing an idle stream
+    HEARTBEAT_SECONDS = float(os.getenv("PAGE_EVENTS_HEARTBEAT_SECONDS", "15"))
+    # How often subscribed threads' revision logs are checked for other processes' writes (0 disables)
+    POLL_SECONDS = float(os.getenv("PAGE_EVENTS_POLL_SECONDS", "1"))
+
+
+def format_sse(event: str, data: dict, event_id: str | None = None) -> str:
+    """One Server-Sent Events message."""
+    return (f"id: {event_id}\n" if event_id else "") + f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class PageEventHub:
+    def __init__(self, queue_size: int = PageEventsConfig.QUEUE_SIZE, poll_seconds: float = PageEventsConfig.POLL_SECONDS):
+        self.queue_size = queue_size
+        self.poll_seconds = poll_seconds
+        self._subscribers = defaultdict(set)  # thread_id -> {asyncio.Queue}
+        self._loop = None
+        self._workspace = None
+        self._poller = None
+        self._last_at = {}  # thread_id -> "at" of the newest revision published (or already there on subscribe)
+        self._log_signatures = {}  # thread_id -> (mtime_ns, size) of its revision log at the last poll
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.polled = 0
+
+    def attach(self, workspace):
+        """Start publishing the workspace's writes; must be called from the event loop."""
+        self._loop = asyncio.get_running_loop()
+        self._workspace = workspace
+        workspace.add_listener(self._on_write)
+        if self.poll_seconds > 0:
+            self._poller = asyncio.create_task(self._poll())
+
+    def detach(self):
+        if self._poller is not None:
+            self._poller.cancel()
+            self._poller = None
+        if self._workspace is not None:
+            self._workspace.remove_listener(self._on_write)
+            self._workspace = None
+
+    def _on_write(self, thread_id: str, name: str, revision: dict, path: str):
+        # Runs in whichever thread did the write
+        if self._loop is None or not self._subscribers.get(str(thread_id)):
+            return
+        previous = self._workspace.revisions(thread_id, name)[-2:-1]
+        event = {
+            "thread_id": str(thread_id),
+            "name": name,
+            "sha256": revision["sha256"],
+            "previous_sha256": previous[0]["sha256"] if previous else None,
+            "bytes": revision["bytes"],
+            "at": revision["at"],
+        }
+        try:
+            self._loop.call_soon_threadsafe(self.publish, event)
+        except RuntimeError:
+            pass  # the loop is closed: shutting down
+
+    def _log_signature(self, thread_id: str) -> tuple | None:
+        try:
+            stat = os.stat(self._workspace.log_path(thread_id))
+        except (OSError, ValueError):
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _unpublished(self, thread_id: str) -> list[dict]:
+        """Revision log entries newer than the last one published, as events (runs in a worker thread)."""
+        signature = self._log_signature(thread_id)
+        if signature is None or signature == self._log_signatures.get(thread_id):
+            return []
+        self._log_signatures[thread_id] = signature
+        last_at = self._last_at.get(thread_id, 0)
+        events, previous = [], {}
+        for entry in self._workspace.revisions(thread_id):
+            if entry["at"] > last_at:
+                events.append({
+                    "thread_id": thread_id,
+                    "name": entry["name"],
+                    "sha256": entry["sha256"],
+                    "previous_sha256": previous.get(entry["name"]),
+                    "bytes": entry["bytes"],
+                    "at": entry["at"],
+                })
+            previous[entry["name"]] = entry["sha256"]
+        return events
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            for thread_id in list(self._subscribers):
+                try:
+                    events = await asyncio.to_thread(self._unpublished, thread_id)
+                except Exception as e:
+                    logger.warning(f"Could not poll the revision log of thread {thread_id}: {e}")
+                    continue
+                for event in events:
+                    if self.publish(event):
+                        self.polled += 1
+
+    def publish(self, event: dict) -> bool:
+        # The write listener and the log poller can both see a write: publish it once
+        if event["at"] <= self._last_at.get(event["thread_id"], 0):
+            return False
+        self._last_at[event["thread_id"]] = event["at"]
+        self.published += 1
+        for queue in list(self._subscribers.get(event["thread_id"], ())):
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(event)
+            self.delivered += 1
+        return True
+
+    @asynccontextmanager
+    async def subscribe(self, thread_id: str):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        if not self._subscribers.get(str(thread_id)) and self._workspace is not None:
+            # Writes from before the first subscriber aren't news
+            latest = (await asyncio.to_thread(self._workspace.revisions, thread_id))[-1:]
+            self._last_at[str(thread_id)] = max(self._last_at.get(str(thread_id), 0), latest[0]["at"] if latest else 0)
+        self._subscribers[str(thread_id)].add(queue)
+        try:
+            yield queue
+        finally:
+            subscribers = self._subscribers.get(str(thread_id))
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[str(thread_id)]
+                    self._log_signatures.pop(str(thread_id), None)
+                    self._last_at.pop(str(thread_id), None)
+
+    def stats(self) -> dict:
+        return {
+            "threads": len(self._subscribers),
+            "subscribers": sum(len(queues) for queues in self._subscribers.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "from_other_processes": self.polled,
+        }
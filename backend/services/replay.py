@@ -0,0 +1,261 @@
+"""
+Replay buffers that let a client pick a /chat-message stream back up after a dropped connection.
+
+Each chat run executes in its own task and appends its stream events to a StreamRun, and
+the HTTP response just follows that buffer. When the connection drops, the run keeps
+going for STREAM_RESUME_GRACE_SECONDS; a client that reconnects in time (GET
+/chat-message/{request_id}/resume?after=N) is attached to the still-running generation,
+or gets the rest of the completed one, instead of paying for the whole generation again.
+If nobody comes back, the run is cancelled, freeing the model as before.
+
+Events are numbered from 0 ("start"). NDJSON clients resume with after = lines received - 1;
+SSE clients get the number as the event id (Last-Event-ID). Each run keeps at most
+STREAM_REPLAY_MAX_EVENTS events, finished runs are kept for STREAM_REPLAY_TTL_SECONDS, and
+finished runs are evicted oldest first once all buffers hold more than STREAM_REPLAY_MAX_BYTES.
+
+The buffer still pushes back on the graph run, like the streamer's bounded queue: while a client
+is attached, the run waits whenever the slowest follower is STREAM_REPLAY_MAX_LAG events behind,
+so a slow reader slows the generation down instead of falling out of the buffer. A running run
+also keeps its buffer under STREAM_REPLAY_MAX_RUN_BYTES by dropping the oldest events every
+follower has read (a resume from before them gets a gap); over the cap with unread events, it
+waits for its followers like it does over the lag.
+
+Usage:
+
+store = ReplayStore()
+run = store.start(request_id, events())      # events(): async generator of event dicts
+async for index, event in run.follow(after=-1):
+    ...
+"""
+import asyncio
+import itertools
+import logging
+import os
+import time
+from collections import OrderedDict, deque
+
+from services.stream_protocol import dumps
+
+logger = logging.getLogger(__name__)
+
+
+class ReplayConfig:
+    MAX_EVENTS = int(os.getenv("STREAM_REPLAY_MAX_EVENTS", "4096"))
+    MAX_BYTES = int(os.getenv("STREAM_REPLAY_MAX_BYTES", str(64 * 1024 * 1024)))
+    TTL_SECONDS = float(os.getenv("STREAM_REPLAY_TTL_SECONDS", "300"))
+    # A running run waits for its slowest follower this many events behind (kept below MAX_EVENTS)
+    MAX_LAG = int(os.getenv("STREAM_REPLAY_MAX_LAG", "256"))
+    MAX_RUN_BYTES = int(os.getenv("STREAM_REPLAY_MAX_RUN_BYTES", str(8 * 1024 * 1024)))
+    # How long a run keeps going with no client attached before it is cancelled
+    GRACE_SECONDS = float(os.getenv("STREAM_RESUME_GRACE_SECONDS", "30"))
+
+
+class ReplayGap(Exception):
+    """The requested events were already dropped from the run's buffer."""
+
+
+class StreamRun:
+    def __init__(self, request_id: str, max_events: int, grace_seconds: float | None,
+                 max_lag: int | None = ReplayConfig.MAX_LAG, max_bytes: int = ReplayConfig.MAX_RUN_BYTES):
+        self.request_id = request_id
+        self.grace_seconds = grace_seconds
+        self.max_lag = None if max_lag is None else max(1, min(max_lag, max_events - 1))
+        self.max_bytes = max_bytes
+        self.events = deque(maxlen=max_events)  # (index, event, size)
+        self.next_index = 0
+        self.bytes = 0
+        self.done = False
+        self.created_at = time.time()
+        self.finished_at = None
+        self.resumes = 0
+        self.trimmed = 0
+        self.task = None
+        self._positions = {}  # follower -> index of the next event it needs
+        self._changed = asyncio.Event()
+        self._advanced = asyncio.Event()
+        self._grace_timer = None
+
+    @property
+    def first_index(self) -> int:
+        return self.events[0][0] if self.events else self.next_index
+
+    @property
+    def followers(self) -> int:
+        return len(self._positions)
+
+    def append(self, event: dict):
+        if len(self.events) == self.events.maxlen:
+            self.bytes -= self.events[0][2]
+        size = len(dumps(event))
+        self.events.append((self.next_index, event, size))
+        self.next_index += 1
+        self.bytes += size
+        self._trim()
+        self._changed.set()
+
+    def _trim(self):
+        """Over the byte cap, drop the oldest events every follower has already read."""
+        read = min(self._positions.values(), default=self.next_index)
+        while self.bytes > self.max_bytes and self.events and self.events[0][0] < read:
+            self.bytes -= self.events.popleft()[2]
+            self.trimmed += 1
+
+    def _behind(self) -> bool:
+        if self.max_lag is None or not self._positions:
+            return False
+        return self.next_index - min(self._positions.values()) >= self.max_lag or self.bytes > self.max_bytes
+
+    async def wait_for_followers(self):
+        """Back-pressure: wait while the slowest follower is too far behind (or holds the run over its byte cap)."""
+        while True:
+            self._trim()  # followers may have read enough to get the run back under its byte cap
+            if not self._behind():
+                return
+            self._advanced.clear()
+            await self._advanced.wait()
+
+    def finish(self):
+        self.done = True
+        self.finished_at = time.time()
+        self._cancel_grace_timer()
+        self._changed.set()
+
+    async def follow(self, after: int = -1):
+        """Yield (index, event) for every event after `after`, live until the run finishes."""
+        if after + 1 < self.first_index:
+            raise ReplayGap(f"Events {after + 1}..{self.first_index - 1} of {self.request_id} are no longer buffered")
+        follower = object()
+        position = max(after + 1, 0)
+        self._positions[follower] = position
+        self._cancel_grace_timer()
+        try:
+            while True:
+                self._changed.clear()
+                if position < self.first_index:
+                    raise ReplayGap(f"Fell behind the buffer of {self.request_id}")
+                # Only the events this follower hasn't seen yet, copied so appends can't disturb the loop
+                for index, event, _ in list(itertools.islice(self.events, position - self.first_index, None)):
+                    yield index, event
+                    position = self._positions[follower] = index + 1
+                    self._advanced.set()
+                if self.done and position >= self.next_index:
+                    return
+                if position >= self.next_index:
+                    await self._changed.wait()
+        finally:
+            del self._positions[follower]
+            self._advanced.set()  # the run may have been waiting on this follower
+            self._trim()
+            if self.followers == 0 and not self.done and self.grace_seconds is not None:
+                logger.info(f"[{self.request_id}] Client detached, keeping the run for {self.grace_seconds:.0f}s")
+                self._start_grace_timer()
+
+    def _start_grace_timer(self):
+        self._cancel_grace_timer()
+        self._grace_timer = asyncio.get_running_loop().call_later(self.grace_seconds, self._abandon)
+
+    def _cancel_grace_timer(self):
+        if self._grace_timer is not None:
+            self._grace_timer.cancel()
+            self._grace_timer = None
+
+    def _abandon(self):
+        self._grace_timer = None
+        if self.followers == 0 and not self.done and self.task is not None:
+            logger.info(f"[{self.request_id}] Nobody resumed the stream, cancelling the run")
+            self.task.cancel()
+
+
+class ReplayStore:
+    def __init__(self, max_events: int = ReplayConfig.MAX_EVENTS, max_bytes: int = ReplayConfig.MAX_BYTES,
+                 ttl_seconds: float = ReplayConfig.TTL_SECONDS, grace_seconds: float | None = ReplayConfig.GRACE_SECONDS,
+                 max_lag: int | None = ReplayConfig.MAX_LAG, max_run_bytes: int = ReplayConfig.MAX_RUN_BYTES):
+        """grace_seconds=None keeps runs going with nobody attached, and max_lag=None never makes them
+        wait for a follower (background jobs: a slow reader gets a gap rather than slowing the job)."""
+        self.max_events = max_events
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.grace_seconds = grace_seconds
+        self.max_lag = max_lag
+        self.max_run_bytes = max_run_bytes
+        self._runs = OrderedDict()  # request_id -> StreamRun, oldest first
+        self.started = 0
+        self.abandoned = 0
+        self.resumed = 0
+        self.evicted = 0
+
+    def start(self, request_id: str, events) -> StreamRun:
+        """Run the `events` async generator in its own task, buffering everything it yields."""
+        self.sweep()
+        run = StreamRun(request_id, self.max_events, self.grace_seconds, self.max_lag, self.max_run_bytes)
+        run.task = asyncio.create_task(self._pump(run, events))
+        if self.grace_seconds is not None:
+            # Until its first follow(): a client that is gone before then never detaches
+            run._start_grace_timer()
+        self._runs[request_id] = run
+        self.started += 1
+        return run
+
+    async def _pump(self, run: StreamRun, events):
+        try:
+            async for event in events:
+                await run.wait_for_followers()
+                run.append(event)
+        except asyncio.CancelledError:
+            self.abandoned += 1
+            # Tells a late resume that the stream ends here
+            run.append({"type": "error", "error": "Run cancelled before it finished", "request_id": run.request_id})
+        except Exception as e:
+            logger.error(f"[{run.request_id}] Stream run failed: {e}", exc_info=True)
+            run.append({"type": "error", "error": str(e), "request_id": run.request_id})
+        finally:
+            await events.aclose()
+            run.finish()
+
+    def get(self, request_id: str) -> StreamRun | None:
+        self.sweep()
+        return self._runs.get(request_id)
+
+    def resume(self, request_id: str) -> StreamRun | None:
+        run = self.get(request_id)
+        if run is not None:
+            run.resumes += 1
+            self.resumed += 1
+        return run
+
+    def sweep(self):
+        now = time.time()
+        for request_id, run in list(self._runs.items()):
+            if run.done and run.followers == 0 and now - run.finished_at > self.ttl_seconds:
+                del self._runs[request_id]
+        while self.bytes > self.max_bytes:
+            oldest = next((request_id for request_id, run in self._runs.items() if run.done and run.followers == 0), None)
+            if oldest is None:
+                break
+            del self._runs[oldest]
+            self.evicted += 1
+
+    @property
+    def bytes(self) -> int:
+        return sum(run.bytes for run in self._runs.values())
+
+    async def aclose(self):
+        for run in self._runs.values():
+            if run.task is not None and not run.task.done():
+                run.task.cancel()
+        await asyncio.gather(*(run.task for run in self._runs.values() if run.task is not None), return_exceptions=True)
+        self._runs.clear()
+
+    def stats(self) -> dict:
+        return {
+            "runs": len(self._runs),
+            "running": sum(1 for run in self._runs.values() if not run.done),
+            "detached": sum(1 for run in self._runs.values() if not run.done and run.followers == 0),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "started": self.started,
+            "resumed": self.resumed,
+            "abandoned": self.abandoned,
+            "evicted": self.evicted,
+            "trimmed_events": sum(run.trimmed for run in self._runs.values()),
+        }
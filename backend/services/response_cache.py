@@ -0,0 +1,205 @@
+"""
+Response cache for /chat-message.
+
+Lots of chat requests are near-duplicates ("hello", "make the background dark"), and each one
+used to run the whole graph. Completed runs are cached here as the stream events that were
+sent to the client, keyed on the normalised message, the agent, the model, a hash of the
+current page and a hash of the thread's earlier messages, and replayed event for event (in the
+client's protocol) on a hit. A reply is only reused for the same conversation so far: "yes,
+do that" means something different in every thread.
+
+Lookups are exact-match first. With RESPONSE_CACHE_SEMANTIC=true, a miss falls back to
+comparing an Ollama embedding of the message (/api/embed) against cached messages for the
+same agent, model, page and history, and anything at least RESPONSE_CACHE_SEMANTIC_THRESHOLD similar
+counts as a hit. Entries are evicted least-recently-used first once the cache is over
+RESPONSE_CACHE_MAX_BYTES, and expire after RESPONSE_CACHE_TTL_SECONDS.
+
+Only side-effect free runs should be stored (no tool calls, no page writes): replaying a
+response does not replay what the graph did.
+
+Usage:
+
+cache = ResponseCache(ollama_client)
+hit = await cache.lookup(message, agent, model, existing_html_content, history)
+if hit.entry is None:
+    cache.store(hit, events, reply=..., last_node=...)
+"""
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from services.stream_protocol import dumps
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCacheConfig:
+    ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+    TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+    MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+    SEMANTIC = os.getenv("RESPONSE_CACHE_SEMANTIC", "false").lower() == "true"
+    SEMANTIC_THRESHOLD = float(os.getenv("RESPONSE_CACHE_SEMANTIC_THRESHOLD", "0.95"))
+    EMBED_MODEL = os.getenv("RESPONSE_CACHE_EMBED_MODEL", "nomic-embed-text")
+
+
+def normalize_message(message: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation: "Hello!! " == "hello"."""
+    return re.sub(r"[\s.!?]+$", "", " ".join(message.lower().split()))
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _cosine(a: list[float], b: list[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+@dataclass
+class CacheLookup:
+    """Result of a lookup; on a miss it carries what store() needs."""
+    key: str
+    scope: tuple
+    entry: "CacheEntry | None" = None
+    kind: str | None = None  # "exact" or "semantic" on a hit
+    embedding: list[float] | None = None
+
+
+@dataclass
+class CacheEntry:
+    events: list[dict]
+    scope: tuple
+    reply: str | None
+    last_node: str | None
+    embedding: list[float] | None
+    created_at: float = field(default_factory=time.time)
+
+    @property
+    def size(self) -> int:
+        return sum(len(dumps(event)) for event in self.events) + len((self.reply or "").encode())
+
+
+class ResponseCache:
+    def __init__(self, ollama_client=None, enabled: bool = ResponseCacheConfig.ENABLED,
+                 ttl_seconds: float = ResponseCacheConfig.TTL_SECONDS, max_bytes: int = ResponseCacheConfig.MAX_BYTES,
+                 semantic: bool = ResponseCacheConfig.SEMANTIC,
+                 semantic_threshold: float = ResponseCacheConfig.SEMANTIC_THRESHOLD,
+                 embed_model: str = ResponseCacheConfig.EMBED_MODEL):
+        self.ollama_client = ollama_client
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.semantic = semantic and ollama_client is not None
+        self.semantic_threshold = semantic_threshold
+        self.embed_model = embed_model
+        self._entries = OrderedDict()  # key -> CacheEntry, least recently used first
+        self.bytes = 0
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.embed_errors = 0
+
+    def _key(self, message: str, scope: tuple) -> str:
+        return _sha256(json.dumps([normalize_message(message), *scope]))
+
+    def _expired(self, entry: CacheEntry, now: float) -> bool:
+        return now - entry.created_at > self.ttl_seconds
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self.bytes -= entry.size
+
+    async def _embed(self, message: str) -> list[float] | None:
+        try:
+            response = await self.ollama_client.post("/api/embed", json={"model": self.embed_model, "input": normalize_message(message)})
+            response.raise_for_status()
+            return response.json()["embeddings"][0]
+        except Exception as e:
+            self.embed_errors += 1
+            logger.debug(f"Response cache embedding failed: {e}")
+            return None
+
+    async def lookup(self, message: str, agent: str, model: str, existing_html_content: str,
+                     history: list | None = None) -> CacheLookup:
+        """history: the thread's earlier messages as JSON-serialisable values, e.g. [(type, content), ...]."""
+        scope = (agent, model, _sha256(existing_html_content or ""), _sha256(json.dumps(history or [], default=str)))
+        result = CacheLookup(key=self._key(message, scope), scope=scope)
+        if not self.enabled:
+            return result
+
+        now = time.time()
+        entry = self._entries.get(result.key)
+        if entry is not None and self._expired(entry, now):
+            self._remove(result.key)
+            entry = None
+        if entry is not None:
+            self._entries.move_to_end(result.key)
+            self.exact_hits += 1
+            result.entry, result.kind = entry, "exact"
+            return result
+
+        if self.semantic:
+            result.embedding = await self._embed(message)
+            if result.embedding is not None:
+                best_key, best_score = None, self.semantic_threshold
+                for key, candidate in self._entries.items():
+                    if candidate.scope != scope or candidate.embedding is None or self._expired(candidate, now):
+                        continue
+                    score = _cosine(result.embedding, candidate.embedding)
+                    if score >= best_score:
+                        best_key, best_score = key, score
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self.semantic_hits += 1
+                    result.entry, result.kind = self._entries[best_key], "semantic"
+                    return result
+
+        self.misses += 1
+        return result
+
+    def store(self, lookup: CacheLookup, events: list[dict], reply: str | None = None, last_node: str | None = None):
+        """Cache a completed run's stream events (everything after the "start" event)."""
+        if not self.enabled:
+            return
+        entry = CacheEntry(events=events, scope=lookup.scope, reply=reply, last_node=last_node, embedding=lookup.embedding)
+        if entry.size > self.max_bytes:
+            return
+        if lookup.key in self._entries:
+            self._remove(lookup.key)
+        self._entries[lookup.key] = entry
+        self.bytes += entry.size
+        self.stores += 1
+        while self.bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "semantic": self.semantic,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.exact_hits + self.semantic_hits) / lookups, 3) if lookups else None,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "embed_errors": self.embed_errors,
+        }
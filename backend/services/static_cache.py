@@ -0,0 +1,259 @@
+"""
+In-memory cache for the files the app serves (/, /chat, /conversations, /page, and the
+generated pages and assets under /workspace/{thread_id}/).
+
+Those routes used to open and read their file on every request and send it with no
+validators, and the preview iframe reloads /page constantly. Files are now read once and
+kept in memory along with:
+
+  * a strong ETag (content hash) and Last-Modified, so clients revalidate with
+    If-None-Match / If-Modified-Since and get a bodiless 304 when nothing changed
+  * gzip (and brotli, when the brotli package is installed) variants, compressed once on
+    first use and picked from the client's Accept-Encoding
+  * optionally, a copy with a <base href> injected, so a page served from another URL
+    (/page) still resolves its relative assets against its own directory
+
+An entry is dropped when the file's mtime, inode or size changes (checked at most every
+STATIC_CACHE_STAT_INTERVAL_SECONDS), or straight away when invalidate() is called, e.g. by a
+workspace write. Entries are evicted least-recently-used first beyond STATIC_CACHE_MAX_BYTES.
+aresponse() is for async handlers: the stat, read and compression run in a worker thread,
+unless the answer is already in memory.
+
+Usage:
+
+cache = StaticFileCache()
+response = await cache.aresponse(request, "chat.html")   # None if the file doesn't exist
+response = await cache.aresponse(request, page_path, base_href="/workspace/5/")
+cache.invalidate("/abs/path/to/page.html")
+"""
+import asyncio
+import gzip
+import hashlib
+import html
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from stat import S_ISREG
+
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+_HEAD_TAG = re.compile(rb"<head\b[^>]*>", re.IGNORECASE)
+_HTML_TAG = re.compile(rb"<html\b[^>]*>", re.IGNORECASE)
+_BASE_TAG = re.compile(rb"<base\b", re.IGNORECASE)
+
+
+class StaticCacheConfig:
+    ENABLED = os.getenv("STATIC_CACHE_ENABLED", "true").lower() == "true"
+    MAX_BYTES = int(os.getenv("STATIC_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+    STAT_INTERVAL_SECONDS = float(os.getenv("STATIC_CACHE_STAT_INTERVAL_SECONDS", "1"))
+    # Smaller bodies aren't worth compressing
+    COMPRESS_MIN_BYTES = int(os.getenv("STATIC_CACHE_COMPRESS_MIN_BYTES", "1024"))
+
+
+class CachedFile:
+    def __init__(self, path: str, body: bytes, stat: os.stat_result):
+        self.path = path
+        self.body = body
+        self.stat = stat
+        self.signature = (stat.st_mtime_ns, stat.st_ino, stat.st_size)
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        self.mtime = int(stat.st_mtime)
+        self.last_modified = formatdate(stat.st_mtime, usegmt=True)
+        self.checked_at = time.monotonic()
+        self.variants = {"identity": body}
+        self.rebased = {}  # base href -> CachedFile with a <base> tag injected
+
+    @property
+    def size(self) -> int:
+        return sum(len(body) for body in self.variants.values()) + sum(entry.size for entry in self.rebased.values())
+
+    def with_base(self, href: str) -> "CachedFile":
+        """This file with <base href> inserted after <head> (unchanged if it already has a <base>)."""
+        if href not in self.rebased:
+            body = self.body
+            if not _BASE_TAG.search(body):
+                tag = f'<base href="{html.escape(href)}">'.encode()
+                match = _HEAD_TAG.search(body) or _HTML_TAG.search(body)
+                body = body[:match.end()] + tag + body[match.end():] if match else tag + body
+            self.rebased[href] = CachedFile(self.path, body, self.stat)
+        return self.rebased[href]
+
+    def variant(self, encoding: str) -> bytes:
+        if encoding not in self.variants:
+            if encoding == "br":
+                self.variants[encoding] = brotli.compress(self.body)
+            else:
+                self.variants[encoding] = gzip.compress(self.body, compresslevel=6, mtime=0)
+        return self.variants[encoding]
+
+
+def _accepted_encoding(accept_encoding: str) -> str:
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip()] = quality
+    for encoding in (("br", "gzip") if BROTLI_AVAILABLE else ("gzip",)):
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return "identity"
+
+
+class StaticFileCache:
+    def __init__(self, enabled: bool = StaticCacheConfig.ENABLED, max_bytes: int = StaticCacheConfig.MAX_BYTES,
+                 stat_interval_seconds: float = StaticCacheConfig.STAT_INTERVAL_SECONDS,
+                 compress_min_bytes: int = StaticCacheConfig.COMPRESS_MIN_BYTES):
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+        self.stat_interval_seconds = stat_interval_seconds
+        self.compress_min_bytes = compress_min_bytes
+        self._entries = OrderedDict()  # absolute path -> CachedFile, least recently used first
+        self._lock = threading.Lock()  # invalidate() is called from worker threads
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+
+    def get(self, path: str) -> CachedFile | None:
+        path = os.path.abspath(path)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and now - entry.checked_at < self.stat_interval_seconds:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            stat = None
+        if stat is None or not S_ISREG(stat.st_mode):
+            self.invalidate(path)
+            return None
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.signature == (stat.st_mtime_ns, stat.st_ino, stat.st_size):
+                entry.checked_at = now
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry
+        with open(path, "rb") as f:
+            entry = CachedFile(path, f.read(), stat)
+        self.misses += 1
+        if self.enabled:
+            with self._lock:
+                self._entries[path] = entry
+                self._evict()
+        return entry
+
+    def _evict(self):
+        while len(self._entries) > 1 and sum(entry.size for entry in self._entries.values()) > self.max_bytes:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, path: str):
+        with self._lock:
+            if self._entries.pop(os.path.abspath(path), None) is not None:
+                self.invalidations += 1
+
+    def response(self, request: Request, path: str, media_type: str = "text/html; charset=utf-8",
+                 base_href: str | None = None) -> Response | None:
+        """The file as a conditional, compressed response (None if it doesn't exist).
+
+        base_href injects a <base> tag, for HTML served from a URL other than its own."""
+        entry = self.get(path)
+        if entry is None:
+            return None
+        if base_href is not None:
+            with self._lock:
+                entry = entry.with_base(base_href)
+                self._evict()
+        headers = {
+            "ETag": entry.etag,
+            "Last-Modified": entry.last_modified,
+            # Always revalidate: cheap with a 304, and the preview must see new pages straight away
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+        if self._not_modified(request, entry):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+
+        encoding = self._encoding(request, entry)
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        with self._lock:
+            body = entry.variant(encoding)
+            self._evict()
+        return Response(content=body, media_type=media_type, headers=headers)
+
+    async def aresponse(self, request: Request, path: str, media_type: str = "text/html; charset=utf-8",
+                        base_href: str | None = None) -> Response | None:
+        """response() without blocking the event loop on the file system or compression."""
+        if self._in_memory(request, path, base_href):
+            return self.response(request, path, media_type, base_href)
+        return await asyncio.to_thread(self.response, request, path, media_type, base_href)
+
+    def _in_memory(self, request: Request, path: str, base_href: str | None) -> bool:
+        """Whether response() can answer without a stat, a read or compressing."""
+        with self._lock:
+            entry = self._entries.get(os.path.abspath(path))
+            if entry is None or time.monotonic() - entry.checked_at >= self.stat_interval_seconds:
+                return False
+            if base_href is not None:
+                entry = entry.rebased.get(base_href)
+                if entry is None:
+                    return False
+            return self._not_modified(request, entry) or self._encoding(request, entry) in entry.variants
+
+    def _encoding(self, request: Request, entry: CachedFile) -> str:
+        if len(entry.body) < self.compress_min_bytes:
+            return "identity"
+        return _accepted_encoding(request.headers.get("accept-encoding", ""))
+
+    @staticmethod
+    def _not_modified(request: Request, entry: CachedFile) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return "*" in tags or entry.etag in tags
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return entry.mtime <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = len(self._entries)
+            size = sum(entry.size for entry in self._entries.values())
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "invalidations": self.invalidations,
+            "brotli": BROTLI_AVAILABLE,
+        }
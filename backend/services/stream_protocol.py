@@ -0,0 +1,117 @@
+"""
+Wire formats for the /chat-message stream.
+
+The original format ("ndjson") sends one JSON line per model token, each repeating "model"
+and "node". Clients can ask for a leaner protocol instead (ChatMessage.protocol):
+
+  * "ndjson"  - one line per event, exactly as before (the default)
+  * "compact" - NDJSON where tokens are coalesced into frames of up to STREAM_COALESCE_BYTES,
+                flushed at least every STREAM_COALESCE_MS, and "model" is only sent in "start"
+  * "sse"     - the compact events as Server-Sent Events, each with an increasing "id:" (the
+                event's index in the run, so it doubles as Last-Event-ID for a resume)
+
+Events are plain dicts ({"type": "update", "node": ..., "value": ...}); StreamEncoder turns
+them into the chosen wire format, so the same events can be replayed (e.g. from the
+response cache) in any protocol. JSON is encoded with orjson when it's installed.
+
+Usage:
+
+encoder = StreamEncoder("compact")
+coalescer = encoder.coalescer()           # None for "ndjson"
+for event in coalescer.add(node, token):  # frames that are ready to send
+    yield encoder.encode(event)
+for event in coalescer.due():             # call regularly, e.g. on stream ticks
+    yield encoder.encode(event)
+"""
+import json
+import os
+import time
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+PROTOCOLS = ("ndjson", "compact", "sse")
+
+
+class StreamProtocolConfig:
+    COALESCE_MS = float(os.getenv("STREAM_COALESCE_MS", "30"))
+    COALESCE_BYTES = int(os.getenv("STREAM_COALESCE_BYTES", "256"))
+
+
+def dumps(obj) -> str:
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, default=str).decode()
+    return json.dumps(obj, separators=(",", ":"), default=str)
+
+
+class TokenCoalescer:
+    """Buffers token updates per node into frames bounded by size and age."""
+
+    def __init__(self, flush_ms: float = StreamProtocolConfig.COALESCE_MS,
+                 flush_bytes: int = StreamProtocolConfig.COALESCE_BYTES):
+        self.flush_seconds = flush_ms / 1000
+        self.flush_bytes = flush_bytes
+        self._node = None
+        self._parts = []
+        self._bytes = 0
+        self._started_at = None
+        self.tokens = 0
+        self.frames = 0
+
+    def add(self, node: str, value: str) -> list[dict]:
+        self.tokens += 1
+        frames = self.flush() if node != self._node else []
+        if not self._parts:
+            self._node, self._started_at = node, time.monotonic()
+        self._parts.append(value)
+        self._bytes += len(value.encode())
+        if self._bytes >= self.flush_bytes:
+            frames += self.flush()
+        return frames + self.due()
+
+    def due(self) -> list[dict]:
+        """The pending frame, if it has waited long enough."""
+        if self._parts and time.monotonic() - self._started_at >= self.flush_seconds:
+            return self.flush()
+        return []
+
+    def flush(self) -> list[dict]:
+        if not self._parts:
+            return []
+        frame = {"type": "update", "node": self._node, "value": "".join(self._parts)}
+        self._parts, self._bytes, self._started_at = [], 0, None
+        self.frames += 1
+        return [frame]
+
+
+class StreamEncoder:
+    def __init__(self, protocol: str = "ndjson"):
+        if protocol not in PROTOCOLS:
+            raise ValueError(f"Unknown protocol '{protocol}'")
+        self.protocol = protocol
+        self.sequence = 0
+
+    @property
+    def media_type(self) -> str:
+        # "ndjson" keeps the content type the endpoint has always used
+        return "application/x-ndjson" if self.protocol == "compact" else "text/event-stream"
+
+    def coalescer(self) -> TokenCoalescer | None:
+        return None if self.protocol == "ndjson" else TokenCoalescer()
+
+    def encode(self, event: dict, index: int | None = None) -> str:
+        """`index` is the event's position in the run (see services/replay.py), used as the SSE id."""
+        self.sequence = index if index is not None else self.sequence + 1
+        if self.protocol == "ndjson":
+            return dumps(event) + "\n"
+        if event["type"] != "start":
+            # Static fields only go out once, in "start"
+            event = {key: value for key, value in event.items() if key != "model"}
+            if event["type"] == "final":
+                event = {key: value for key, value in event.items() if key not in ("node", "value")}
+        if self.protocol == "sse":
+            return f"id: {self.sequence}\nevent: {event['type']}\ndata: {dumps(event)}\n\n"
+        return dumps(event) + "\n"
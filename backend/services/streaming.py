@@ -0,0 +1,95 @@
+"""
+Non-blocking streaming of LangGraph runs.
+
+The graph runs in its own asyncio task (graph.astream) and pushes chunks into a
+bounded queue that the HTTP response drains. The bounded queue is the back-pressure:
+when a client reads slowly the graph task waits instead of buffering the whole
+generation in memory. When the consumer stops early (the generator is closed, or the
+replay store cancels a run nobody resumed) the graph task is cancelled, which closes the
+in-flight model request and frees the model for other clients.
+
+Usage:
+
+streamer = GraphStreamer()
+async for chunk in streamer.stream(graph, graph_input, config, stream_mode=["updates", "messages"]):
+    ...
+
+With tick_seconds set, the stream also yields None whenever nothing arrived for that long,
+so the consumer gets a chance to flush buffered output while the graph is quiet.
+"""
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Max number of chunks buffered between the graph task and a slow client
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "64"))
+
+# Sentinel marking the end of a run
+_DONE = object()
+
+
+class GraphStreamer:
+    def __init__(self, queue_size: int = STREAM_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.active = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.failed = 0
+
+    async def _produce(self, graph, graph_input, config, stream_mode, queue: asyncio.Queue):
+        try:
+            async for chunk in graph.astream(graph_input, config=config, stream_mode=stream_mode):
+                # Blocks while the queue is full -> back-pressure onto the graph run
+                await queue.put(chunk)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await queue.put(e)
+            return
+        await queue.put(_DONE)
+
+    async def stream(self, graph, graph_input, config, stream_mode, tick_seconds: float | None = None):
+        """Yield graph chunks as they are produced. Cancels the graph run if the consumer stops early."""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        producer = asyncio.create_task(self._produce(graph, graph_input, config, stream_mode, queue))
+        self.active += 1
+        finished = False
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout=tick_seconds)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+
+                if item is _DONE:
+                    finished = True
+                    self.completed += 1
+                    return
+                if isinstance(item, Exception):
+                    finished = True
+                    self.failed += 1
+                    raise item
+                yield item
+        finally:
+            self.active -= 1
+            if not producer.done():
+                producer.cancel()
+                if not finished:
+                    self.cancelled += 1
+                    logger.info("Client stopped reading, cancelled in-flight graph run")
+                try:
+                    await producer
+                except (asyncio.CancelledError, Exception):
+                    pass
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "completed": self.completed,
+            "cancelled": self.cancelled,
+            "failed": self.failed,
+            "queue_size": self.queue_size,
+        }
@@ -0,0 +1,106 @@
+### Tests for batch retries and thread rollback (run from backend/: python -m pytest services)
+import asyncio
+
+import pytest
+
+from services.batch import NotRetryable, parse_batch, run_batch, run_item_with_retries
+
+
+class _FakeThreads:
+    """Stands in for the checkpointer and chat run behind /chat-batch's run_item.
+
+    A thread's history is a list of messages. Like the endpoint, a record on a named thread
+    remembers where the thread was before its first attempt, retries from there, and refuses to
+    retry when the thread had nothing to roll back to. "flaky" messages fail their first attempt
+    after writing a partial turn."""
+
+    def __init__(self, threads: dict[str, list[str]] | None = None):
+        self.threads = threads or {}
+        self.rollback_to = {}
+        self.failed = set()
+
+    async def run_item(self, item: dict, attempt: int):
+        thread_id = item.get("thread_id") or f"scratch_{item['index']}_{attempt}"
+        if item.get("thread_id") and attempt == 0:
+            self.rollback_to[item["index"]] = len(self.threads[thread_id]) if thread_id in self.threads else None
+        elif item.get("thread_id"):
+            rollback_to = self.rollback_to[item["index"]]
+            if rollback_to is None:
+                raise NotRetryable(f"thread {thread_id} had no checkpoint to roll back to")
+            del self.threads[thread_id][rollback_to:]
+        history = self.threads.setdefault(thread_id, [])
+        history.append(item["message"])
+        yield {"type": "update", "node": "router", "value": "partial"}
+        if "flaky" in item["message"] and item["index"] not in self.failed:
+            self.failed.add(item["index"])
+            yield {"type": "error", "error": "transient"}
+            return
+        history.append(f"answer to {item['message']}")
+        yield {"type": "update", "node": "agent", "value": f"answer to {item['message']}"}
+
+
+def _run(item: dict, fake: _FakeThreads, retries: int = 2) -> dict:
+    return asyncio.run(run_item_with_retries(item, fake.run_item, retries, retry_backoff_seconds=0, timeout=5))
+
+
+def test_retry_rolls_the_thread_back_to_before_the_first_attempt():
+    fake = _FakeThreads({"keep": ["hello", "answer to hello"]})
+    result = _run({"index": 0, "thread_id": "keep", "message": "flaky"}, fake)
+    assert (result["status"], result["attempts"], result["reply"]) == ("succeeded", 2, "answer to flaky")
+    assert fake.threads["keep"] == ["hello", "answer to hello", "flaky", "answer to flaky"]
+
+
+def test_thread_without_a_checkpoint_is_not_retried():
+    fake = _FakeThreads({"other": ["untouched"]})
+    result = _run({"index": 0, "thread_id": "fresh", "message": "flaky"}, fake)
+    assert (result["status"], result["attempts"]) == ("failed", 1)
+    assert result["error"].startswith("transient (not retried:")
+    # Nothing was deleted to make a retry possible
+    assert fake.threads == {"fresh": ["flaky"], "other": ["untouched"]}
+
+
+def test_scratch_records_retry_on_a_new_thread():
+    fake = _FakeThreads()
+    result = _run({"index": 3, "message": "flaky"}, fake)
+    assert (result["status"], result["attempts"]) == ("succeeded", 2)
+    assert fake.threads == {"scratch_3_0": ["flaky"], "scratch_3_1": ["flaky", "answer to flaky"]}
+
+
+def test_record_that_keeps_failing_reports_its_last_error():
+    async def run_item(item, attempt):
+        raise RuntimeError(f"down ({attempt})")
+        yield
+
+    result = asyncio.run(run_item_with_retries({"index": 0, "message": "x"}, run_item, 2, retry_backoff_seconds=0, timeout=5))
+    assert (result["status"], result["attempts"], result["error"]) == ("failed", 3, "down (2)")
+
+
+def test_timed_out_attempt_is_retried():
+    async def run_item(item, attempt):
+        if attempt == 0:
+            await asyncio.sleep(10)
+        yield {"type": "update", "node": "agent", "value": "done"}
+
+    result = asyncio.run(run_item_with_retries({"index": 0, "message": "x"}, run_item, 1, retry_backoff_seconds=0, timeout=0.05))
+    assert (result["status"], result["attempts"], result["reply"]) == ("succeeded", 2, "done")
+
+
+def test_run_batch_reports_every_record_and_a_summary():
+    items, errors = parse_batch('{"message": "a"}\nnot json\n{"message": "flaky", "thread_id": "fresh"}\n{"message": "b"}\n')
+    fake = _FakeThreads()
+
+    async def main():
+        return [line async for line in run_batch(items, fake.run_item, concurrency=2, retries=1, errors=errors,
+                                                 retry_backoff_seconds=0, timeout=5)]
+
+    lines = asyncio.run(main())
+    results = {line["index"]: line for line in lines if line["type"] == "result"}
+    assert {index: result["status"] for index, result in results.items()} == {0: "succeeded", 1: "failed", 2: "failed", 3: "succeeded"}
+    summary = lines[-1]
+    assert (summary["type"], summary["items"], summary["succeeded"], summary["retried"]) == ("summary", 4, 2, 0)
+
+
+@pytest.mark.parametrize("body", ['{"thread_id": "t"}', '{"message": "  "}', '["message"]'])
+def test_records_without_a_message_are_rejected(body):
+    items, errors = parse_batch(body)
+    assert items == [] and errors[0]["status"] == "failed"
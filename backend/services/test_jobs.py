@@ -0,0 +1,95 @@
+### Tests for background jobs (run from backend/: python -m pytest services)
+import asyncio
+
+import pytest
+
+from services.jobs import Job, JobManager, JobQueueFull, JobStore
+
+
+async def _run_job(job: Job):
+    if job.request.get("fail"):
+        yield {"type": "error", "error": "model unavailable"}
+        return
+    for token in ("Hel", "lo"):
+        yield {"type": "update", "node": "respond_naturally", "value": token}
+        await asyncio.sleep(job.request.get("delay", 0))
+    yield {"type": "final", "messages": ["Hello"]}
+
+
+async def _finished(jobs: JobManager, job_id: str) -> Job:
+    for _ in range(500):
+        job = jobs.get(job_id)
+        if job.done:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"{job_id} is still {job.status}")
+
+
+def test_job_runs_in_the_background_and_keeps_its_result(tmp_path):
+    async def main():
+        jobs = JobManager(_run_job, JobStore(str(tmp_path / "jobs.sqlite")), workers=1)
+        await jobs.start()
+        job = jobs.submit({"message": "hi"})
+        assert job.status == "queued"
+        done = await _finished(jobs, job.job_id)
+        assert (done.status, done.events, done.result["reply"], done.result["messages"]) == ("succeeded", 3, "Hello", ["Hello"])
+        assert [event["type"] async for _, event in jobs.events(job.job_id).follow()] == ["update", "update", "final"]
+        await jobs.aclose()
+
+    asyncio.run(main())
+
+
+def test_error_event_fails_the_job(tmp_path):
+    async def main():
+        jobs = JobManager(_run_job, JobStore(str(tmp_path / "jobs.sqlite")), workers=1)
+        await jobs.start()
+        done = await _finished(jobs, jobs.submit({"message": "hi", "fail": True}).job_id)
+        assert (done.status, done.error) == ("failed", "model unavailable")
+        await jobs.aclose()
+
+    asyncio.run(main())
+
+
+def test_cancel_stops_a_running_job_and_drops_a_queued_one(tmp_path):
+    async def main():
+        jobs = JobManager(_run_job, JobStore(str(tmp_path / "jobs.sqlite")), workers=1)
+        await jobs.start()
+        running = jobs.submit({"message": "slow", "delay": 10})
+        queued = jobs.submit({"message": "next"})
+        await jobs.wait_started(running.job_id)
+        assert (await jobs.cancel(queued.job_id)).status == "cancelled"
+        assert (await jobs.cancel(running.job_id)).status == "cancelled"
+        assert jobs.stats()["cancelled"] == 2
+        assert jobs.store.get(running.job_id).status == "cancelled"
+        await jobs.aclose()
+
+    asyncio.run(main())
+
+
+def test_submitting_beyond_the_queue_limit_is_rejected(tmp_path):
+    async def main():
+        jobs = JobManager(_run_job, JobStore(str(tmp_path / "jobs.sqlite")), workers=1, max_queued=2)
+        jobs.submit({"message": "a"})
+        jobs.submit({"message": "b"})
+        with pytest.raises(JobQueueFull):
+            jobs.submit({"message": "c"})
+        jobs.store.close()
+
+    asyncio.run(main())
+
+
+def test_restart_requeues_queued_jobs_and_interrupts_running_ones(tmp_path):
+    path = str(tmp_path / "jobs.sqlite")
+    store = JobStore(path)
+    store.save(Job("job_queued", {"message": "hi"}))
+    store.save(Job("job_running", {"message": "hi"}, status="running"))
+    store.close()
+
+    async def main():
+        jobs = JobManager(_run_job, JobStore(path), workers=1)
+        await jobs.start()
+        assert (await _finished(jobs, "job_queued")).status == "succeeded"
+        assert jobs.get("job_running").status == "interrupted"
+        await jobs.aclose()
+
+    asyncio.run(main())
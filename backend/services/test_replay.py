@@ -0,0 +1,125 @@
+### Tests for the /chat-message replay buffers (run from backend/: python -m pytest services)
+import asyncio
+
+import pytest
+
+from services.replay import ReplayGap, ReplayStore
+
+
+async def _events(count: int, started: asyncio.Event | None = None):
+    for n in range(count):
+        yield {"type": "update", "node": "agent", "value": f"token {n}"}
+        await asyncio.sleep(0)
+    if started is not None:
+        await started.wait()  # keeps the run going until the test lets it finish
+
+
+async def _read(run, after: int = -1, limit: int | None = None) -> list[int]:
+    indexes = []
+    async for index, _ in run.follow(after):
+        indexes.append(index)
+        if limit is not None and len(indexes) == limit:
+            break
+    return indexes
+
+
+def test_follow_gets_every_event_in_order():
+    async def main():
+        store = ReplayStore(grace_seconds=None)
+        run = store.start("r1", _events(50))
+        assert await _read(run) == list(range(50))
+        await run.task
+        # A late follower of the finished run gets the same events
+        assert await _read(run) == list(range(50))
+        await store.aclose()
+
+    asyncio.run(main())
+
+
+def test_resume_continues_after_the_last_event_received():
+    async def main():
+        store = ReplayStore(grace_seconds=None)
+        run = store.start("r1", _events(30))
+        assert await _read(run, limit=10) == list(range(10))
+        assert await _read(store.resume("r1"), after=9) == list(range(10, 30))
+        assert store.stats()["resumed"] == 1
+        await store.aclose()
+
+    asyncio.run(main())
+
+
+def test_resume_from_dropped_events_is_a_gap():
+    async def main():
+        store = ReplayStore(max_events=8, grace_seconds=None, max_lag=None)
+        run = store.start("r1", _events(20))
+        await run.task
+        assert run.first_index == 12
+        with pytest.raises(ReplayGap):
+            await _read(run, after=5)
+        assert await _read(run, after=11) == list(range(12, 20))
+        await store.aclose()
+
+    asyncio.run(main())
+
+
+def test_follower_that_falls_out_of_the_buffer_gets_a_gap():
+    async def main():
+        # max_lag=None: the run never waits, like a background job's
+        store = ReplayStore(max_events=8, grace_seconds=None, max_lag=None)
+        run = store.start("r1", _events(40))
+        follow = run.follow()
+        assert (await follow.__anext__())[0] == 0
+        await run.task
+        with pytest.raises(ReplayGap):
+            async for _ in follow:
+                pass
+        await store.aclose()
+
+    asyncio.run(main())
+
+
+def test_slow_follower_holds_the_run_back():
+    async def main():
+        store = ReplayStore(grace_seconds=None, max_lag=5)
+        run = store.start("r1", _events(100))
+        follow = run.follow()
+        await follow.__anext__()
+        for _ in range(20):
+            await asyncio.sleep(0)
+        assert not run.done
+        assert run.next_index - 1 <= 5
+        assert [index async for index, _ in follow] == list(range(1, 100))
+        await store.aclose()
+
+    asyncio.run(main())
+
+
+def test_byte_cap_drops_only_events_every_follower_has_read():
+    async def main():
+        release = asyncio.Event()
+        store = ReplayStore(grace_seconds=None, max_run_bytes=1000)
+        run = store.start("r1", _events(200, release))
+        assert await _read(run, limit=200) == list(range(200))
+        assert run.trimmed > 0 and run.bytes <= 1000
+        with pytest.raises(ReplayGap):
+            await _read(run, after=-1, limit=1)
+        release.set()
+        await run.task
+        assert store.stats()["trimmed_events"] == run.trimmed
+        await store.aclose()
+
+    asyncio.run(main())
+
+
+def test_detached_run_is_cancelled_after_the_grace_period():
+    async def main():
+        store = ReplayStore(grace_seconds=0.05)
+        run = store.start("r1", _events(5, asyncio.Event()))
+        assert await _read(run, limit=5) == list(range(5))
+        await asyncio.wait_for(asyncio.shield(run.task), 1)
+        events = [event async for _, event in run.follow(after=4)]
+        assert events[-1]["type"] == "error"
+        assert store.stats()["abandoned"] == 1
+        await store.aclose()
+
+    asyncio.run(main())
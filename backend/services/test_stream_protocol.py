@@ -0,0 +1,59 @@
+### Tests for the /chat-message wire formats (run from backend/: python -m pytest services)
+import json
+import time
+
+import pytest
+
+from services.stream_protocol import StreamEncoder, TokenCoalescer
+
+
+def test_tokens_are_coalesced_per_node():
+    coalescer = TokenCoalescer(flush_ms=60_000, flush_bytes=1024)
+    frames = []
+    for node, value in [("design", "a"), ("design", "b"), ("write", "c"), ("write", "d")]:
+        frames += coalescer.add(node, value)
+    frames += coalescer.flush()
+    assert frames == [{"type": "update", "node": "design", "value": "ab"}, {"type": "update", "node": "write", "value": "cd"}]
+    assert (coalescer.tokens, coalescer.frames) == (4, 2)
+
+
+def test_frames_are_flushed_by_size():
+    coalescer = TokenCoalescer(flush_ms=60_000, flush_bytes=4)
+    frames = [frame for token in "abcdefghij" for frame in coalescer.add("n", token)]
+    assert [frame["value"] for frame in frames] == ["abcd", "efgh"]
+    assert coalescer.flush()[0]["value"] == "ij"
+
+
+def test_frames_are_flushed_by_age():
+    coalescer = TokenCoalescer(flush_ms=10, flush_bytes=1024)
+    assert coalescer.add("n", "a") == []
+    assert coalescer.due() == []
+    time.sleep(0.02)
+    assert coalescer.due() == [{"type": "update", "node": "n", "value": "a"}]
+    assert coalescer.due() == []
+
+
+def test_ndjson_is_unchanged_and_has_no_coalescer():
+    encoder = StreamEncoder("ndjson")
+    event = {"type": "update", "node": "n", "value": "x", "model": "m"}
+    assert json.loads(encoder.encode(event)) == event
+    assert encoder.coalescer() is None
+
+
+def test_compact_sends_static_fields_only_in_start():
+    encoder = StreamEncoder("compact")
+    assert json.loads(encoder.encode({"type": "start", "model": "m"})) == {"type": "start", "model": "m"}
+    assert json.loads(encoder.encode({"type": "update", "node": "n", "value": "x", "model": "m"})) == {"type": "update", "node": "n", "value": "x"}
+    assert json.loads(encoder.encode({"type": "final", "node": "n", "value": "", "model": "m", "request_id": "r"})) == {"type": "final", "request_id": "r"}
+
+
+def test_sse_ids_follow_the_run_index():
+    encoder = StreamEncoder("sse")
+    assert encoder.encode({"type": "start"}, index=0).startswith("id: 0\nevent: start\ndata: ")
+    assert encoder.encode({"type": "update", "node": "n", "value": "x"}, index=7).startswith("id: 7\nevent: update\n")
+    assert encoder.encode({"type": "update", "node": "n", "value": "y"}).startswith("id: 8\n")
+
+
+def test_unknown_protocol_is_rejected():
+    with pytest.raises(ValueError):
+        StreamEncoder("xml")
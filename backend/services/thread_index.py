@@ -0,0 +1,214 @@
+"""
+Incrementally maintained index of conversation threads.
+
+Every time a checkpoint is written the checkpointer upserts one row here: last-updated time,
+message count, a title (first user message), a preview (last message) and the agent name.
+/threads pages through this table with a keyset cursor on (updated_at, thread_id), so
+listing threads no longer scans every checkpoint of every thread.
+
+Usage:
+
+index = ThreadIndex("thread_index.sqlite")
+index.record(config, checkpoint, metadata)      # called by the checkpointer on put
+page, next_cursor = index.list(limit=20)
+"""
+import base64
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+TITLE_CHARS = 50
+PREVIEW_CHARS = 100
+
+
+def create_thread_index(checkpointer) -> "ThreadIndex":
+    """Keep the index next to the checkpoints it describes.
+
+    With the sqlite backend the index shares the checkpointer's connection, so index rows are
+    committed in the same batched transaction as the checkpoint they summarise.
+    """
+    configured = os.getenv("THREAD_INDEX_PATH")
+    backend = checkpointer.stats()["backend"]
+    if configured:
+        return ThreadIndex(configured)
+    if backend == "sqlite":
+        return ThreadIndex(conn=checkpointer.conn, lock=checkpointer.lock)
+    if backend == "memory":
+        return ThreadIndex(":memory:")
+    return ThreadIndex("thread_index.sqlite")
+
+
+def _message_text(message) -> str:
+    content = getattr(message, "content", None)
+    if content is None and isinstance(message, dict):
+        content = message.get("content", "")
+    if isinstance(content, list):
+        # Multimodal content: keep the text parts only
+        content = " ".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    return str(content or "")
+
+
+def _message_type(message) -> str | None:
+    if isinstance(message, dict):
+        return message.get("type") or message.get("role")
+    return getattr(message, "type", None)
+
+
+def _truncate(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+def encode_cursor(updated_at: float, thread_id: str) -> str:
+    return base64.urlsafe_b64encode(f"{updated_at!r}|{thread_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[float, str]:
+    updated_at, thread_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+    return float(updated_at), thread_id
+
+
+class ThreadIndex:
+    def __init__(self, path: str = ":memory:", conn: sqlite3.Connection = None, lock=None):
+        self.path = path
+        # When handed a connection, its owner commits (and closes) it
+        self.owns_connection = conn is None
+        self.lock = lock or threading.RLock()
+        self.conn = conn or sqlite3.connect(path, check_same_thread=False)
+        if self.owns_connection and path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS thread_index (
+                thread_id TEXT PRIMARY KEY,
+                agent TEXT,
+                title TEXT,
+                preview TEXT,
+                message_count INTEGER NOT NULL DEFAULT 0,
+                checkpoint_id TEXT,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS thread_index_recent ON thread_index (updated_at DESC, thread_id DESC);
+        """)
+        self.records = 0
+
+    def record(self, config: dict, checkpoint: dict, metadata: dict | None = None, updated_at: float | None = None):
+        """Upsert the summary row for the thread a checkpoint belongs to."""
+        configurable = config.get("configurable", {})
+        if configurable.get("checkpoint_ns"):
+            return  # subgraph checkpoints belong to their parent thread
+        thread_id = configurable.get("thread_id")
+        if thread_id is None:
+            return
+
+        messages = (checkpoint.get("channel_values") or {}).get("messages") or []
+        first_user_message = next((m for m in messages if _message_type(m) in ("human", "user")), None)
+        title = _truncate(_message_text(first_user_message), TITLE_CHARS) if first_user_message is not None else None
+        preview = _truncate(_message_text(messages[-1]), PREVIEW_CHARS) if messages else None
+        agent = (metadata or {}).get("agent") or configurable.get("agent")
+
+        with self.lock:
+            self.conn.execute("""
+                INSERT INTO thread_index (thread_id, agent, title, preview, message_count, checkpoint_id, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(thread_id) DO UPDATE SET
+                    agent = COALESCE(excluded.agent, thread_index.agent),
+                    title = COALESCE(thread_index.title, excluded.title),
+                    preview = excluded.preview,
+                    message_count = excluded.message_count,
+                    checkpoint_id = excluded.checkpoint_id,
+                    updated_at = excluded.updated_at
+            """, (thread_id, agent, title, preview, len(messages), checkpoint.get("id"), updated_at or time.time()))
+            self._commit()
+            self.records += 1
+
+    def _commit(self):
+        if self.owns_connection:
+            self.conn.commit()
+
+    def delete(self, thread_id: str):
+        with self.lock:
+            self.conn.execute("DELETE FROM thread_index WHERE thread_id = ?", (thread_id,))
+            self._commit()
+
+    def count(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM thread_index").fetchone()[0]
+
+    def agent(self, thread_id: str) -> str | None:
+        """Name of the agent that last wrote the thread, if it was recorded."""
+        with self.lock:
+            row = self.conn.execute("SELECT agent FROM thread_index WHERE thread_id = ?", (thread_id,)).fetchone()
+        return row[0] if row else None
+
+    def list(self, limit: int = 20, cursor: str | None = None) -> tuple[list[dict], str | None]:
+        """One page of threads, most recently updated first, plus the cursor for the next page."""
+        params = []
+        where = ""
+        if cursor:
+            updated_at, thread_id = decode_cursor(cursor)
+            where = "WHERE (updated_at < ?) OR (updated_at = ? AND thread_id < ?)"
+            params = [updated_at, updated_at, thread_id]
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT thread_id, agent, title, preview, message_count, updated_at FROM thread_index "
+                f"{where} ORDER BY updated_at DESC, thread_id DESC LIMIT ?",
+                params + [limit + 1],
+            ).fetchall()
+
+        threads = [
+            {
+                "thread_id": thread_id,
+                "agent": agent,
+                "title": title,
+                "preview": preview,
+                "message_count": message_count,
+                "updated_at": updated_at,
+            }
+            for thread_id, agent, title, preview, message_count, updated_at in rows[:limit]
+        ]
+        next_cursor = None
+        if len(rows) > limit:
+            last = threads[-1]
+            next_cursor = encode_cursor(last["updated_at"], last["thread_id"])
+        return threads, next_cursor
+
+    async def backfill(self, checkpointer) -> int:
+        """Build the index from existing checkpoints once (e.g. first start after upgrading)."""
+        if self.count() > 0:
+            return 0
+        seen = set()
+        async for checkpoint_tuple in checkpointer.alist(None):
+            configurable = checkpoint_tuple.config["configurable"]
+            thread_id = configurable["thread_id"]
+            if configurable.get("checkpoint_ns") or thread_id in seen:
+                continue
+            # alist returns the newest checkpoint first, so the first one seen per thread is current
+            seen.add(thread_id)
+            created_at = checkpoint_tuple.checkpoint.get("ts")
+            self.record(
+                checkpoint_tuple.config,
+                checkpoint_tuple.checkpoint,
+                checkpoint_tuple.metadata,
+                updated_at=_iso_timestamp(created_at) if created_at else None,
+            )
+        if seen:
+            logger.info(f"Thread index backfilled with {len(seen)} threads")
+        return len(seen)
+
+    def close(self):
+        if self.owns_connection:
+            with self.lock:
+                self.conn.close()
+
+    def stats(self) -> dict:
+        return {"threads": self.count(), "records": self.records}
+
+
+def _iso_timestamp(ts: str) -> float:
+    return datetime.fromisoformat(ts).timestamp()
@@ -323,6 +323,7 @@ export const ChatWindow: React.FC = () => {
     currentMessages, 
     currentConversationId,
     isStreaming,
+    queuePosition,
     error,
     isSidebarVisible,
     selectedAgent,
@@ -545,7 +546,7 @@ export const ChatWindow: React.FC = () => {
         {isStreaming && (
           <div className="text-sm text-dark-accent flex items-center gap-2">
             <Loader2 className="w-4 h-4 animate-spin" />
-            Thinking...
+            {queuePosition ? `Waiting for the model (#${queuePosition} in queue)...` : 'Thinking...'}
           </div>
         )}
         
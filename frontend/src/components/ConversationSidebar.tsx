@@ -60,12 +60,14 @@ const ConversationItem: React.FC<ConversationItemProps> = ({
 export const ConversationSidebar: React.FC = () => {
   const { 
     conversations, 
+    conversationsCursor,
     currentConversationId, 
     isLoading,
     isSidebarVisible,
     selectConversation,
     createNewConversation,
     loadConversations,
+    loadMoreConversations,
     toggleSidebar,
     error
   } = useChatStore();
@@ -132,14 +134,25 @@ export const ConversationSidebar: React.FC = () => {
             <p className="text-xs">Start a new conversation to get started!</p>
           </div>
         ) : (
-          conversations.map((conversation) => (
-            <ConversationItem
-              key={conversation.id}
-              conversation={conversation}
-              isActive={conversation.id === currentConversationId}
-              onClick={() => handleSelectConversation(conversation.id)}
-            />
-          ))
+          <>
+            {conversations.map((conversation) => (
+              <ConversationItem
+                key={conversation.id}
+                conversation={conversation}
+                isActive={conversation.id === currentConversationId}
+                onClick={() => handleSelectConversation(conversation.id)}
+              />
+            ))}
+            {conversationsCursor && (
+              <button
+                onClick={loadMoreConversations}
+                disabled={isLoading}
+                className="w-full p-3 text-sm text-dark-text/60 hover:text-dark-text hover:bg-dark-border/30 transition-colors disabled:opacity-50"
+              >
+                {isLoading ? 'Loading...' : 'Load more'}
+              </button>
+            )}
+          </>
         )}
       </div>
     </div>
@@ -4,6 +4,7 @@ import type {
   ChatMessageRequest, 
   StreamResponse,
   ConversationSummary,
+  ThreadPage,
   UIMessage,
   Message 
 } from '@/types/chat';
@@ -23,6 +24,22 @@ class ApiService {
     return response.data;
   }
 
+  // Fetch one page of conversation summaries (served from the backend's thread index)
+  async getConversationSummaries(cursor?: string | null, limit = 20): Promise<{ summaries: ConversationSummary[]; nextCursor: string | null }> {
+    const response = await api.get<ThreadPage>('/threads', {
+      params: { summary: true, limit, ...(cursor ? { cursor } : {}) },
+    });
+    const summaries = response.data.threads.map((thread) => ({
+      id: thread.thread_id,
+      title: thread.title || 'New Conversation',
+      preview: thread.preview || 'No messages yet...',
+      lastMessage: thread.preview || undefined,
+      timestamp: new Date(thread.updated_at * 1000),
+      messageCount: thread.message_count,
+    }));
+    return { summaries, nextCursor: response.data.next_cursor };
+  }
+
   // Fetch specific conversation history
   async getConversationHistory(threadId: string): Promise<Conversation> {
     const response = await api.get<Conversation>(`/chat-history/${threadId}`);
@@ -44,6 +61,10 @@ class ApiService {
         body: JSON.stringify(request),
       });
 
+      if (response.status === 429) {
+        throw new Error('The model is busy right now, please try again in a moment.');
+      }
+
       if (!response.ok) {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
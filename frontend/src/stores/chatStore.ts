@@ -6,12 +6,14 @@ import apiService from '@/services/api';
 interface ChatState {
   // Conversations
   conversations: ConversationSummary[];
+  conversationsCursor: string | null;
   currentConversationId: string | null;
   currentMessages: UIMessage[];
   
   // UI State
   isLoading: boolean;
   isStreaming: boolean;
+  queuePosition: number | null;
   error: string | null;
   isSidebarVisible: boolean;
   selectedAgent: string;
@@ -20,6 +22,7 @@ interface ChatState {
   
   // Actions
   loadConversations: () => Promise<void>;
+  loadMoreConversations: () => Promise<void>;
   selectConversation: (conversationId: string) => Promise<void>;
   createNewConversation: () => void;
   sendMessage: (message: string) => Promise<void>;
@@ -35,10 +38,12 @@ export const useChatStore = create<ChatState>()(
     (set, get) => ({
       // Initial state
       conversations: [],
+      conversationsCursor: null,
       currentConversationId: null,
       currentMessages: [],
       isLoading: false,
       isStreaming: false,
+      queuePosition: null,
       error: null,
       isSidebarVisible: true,
       selectedAgent: '',
@@ -49,13 +54,11 @@ export const useChatStore = create<ChatState>()(
       loadConversations: async () => {
         set({ isLoading: true, error: null });
         try {
-          const conversations = await apiService.getConversations();
-          const summaries = conversations.map(conv => 
-            apiService.generateConversationSummary(conv)
-          );
+          const { summaries, nextCursor } = await apiService.getConversationSummaries();
           
           set({ 
             conversations: summaries,
+            conversationsCursor: nextCursor,
             isLoading: false 
           });
 
@@ -71,6 +74,27 @@ export const useChatStore = create<ChatState>()(
         }
       },
 
+      // Load the next page of conversations
+      loadMoreConversations: async () => {
+        const { conversationsCursor, conversations } = get();
+        if (!conversationsCursor) return;
+
+        set({ isLoading: true, error: null });
+        try {
+          const { summaries, nextCursor } = await apiService.getConversationSummaries(conversationsCursor);
+          set({
+            conversations: [...conversations, ...summaries],
+            conversationsCursor: nextCursor,
+            isLoading: false
+          });
+        } catch (error) {
+          set({ 
+            error: error instanceof Error ? error.message : 'Failed to load conversations',
+            isLoading: false 
+          });
+        }
+      },
+
       // Select and load a specific conversation
       selectConversation: async (conversationId: string) => {
         set({ isLoading: true, error: null });
@@ -183,11 +207,20 @@ export const useChatStore = create<ChatState>()(
               message,
               thread_id: currentConversationId,
               agent: selectedAgent,
+              protocol: 'compact',
             },
             (response: StreamResponse) => {
               const messages = get().currentMessages;
               const aiMessageIndex = messages.findIndex(m => m.id === aiMessageId);
               
+              if (response.type === 'queued') {
+                set({ queuePosition: response.position ?? null });
+                return;
+              }
+              if (get().queuePosition !== null) {
+                set({ queuePosition: null });
+              }
+
               if (response.type === 'update' && response.value) {
                 // Update AI message content
                 const updatedMessages = [...messages];
@@ -222,7 +255,7 @@ export const useChatStore = create<ChatState>()(
             error: error instanceof Error ? error.message : 'Failed to send message' 
           });
         } finally {
-          set({ isStreaming: false });
+          set({ isStreaming: false, queuePosition: null });
         }
       },
 
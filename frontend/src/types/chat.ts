@@ -46,6 +46,21 @@ export interface Conversation {
   state: ConversationState;
 }
 
+// Summary-only thread listing from GET /threads?summary=true
+export interface ThreadSummary {
+  thread_id: string;
+  agent: string | null;
+  title: string | null;
+  preview: string | null;
+  message_count: number;
+  updated_at: number; // unix seconds
+}
+
+export interface ThreadPage {
+  threads: ThreadSummary[];
+  next_cursor: string | null;
+}
+
 // UI-specific message type for easier handling
 export interface UIMessage {
   id: string;
@@ -61,11 +76,13 @@ export interface ChatMessageRequest {
   message: string;
   thread_id?: string;
   agent?: string;
+  protocol?: 'ndjson' | 'compact' | 'sse'; // 'compact' batches tokens into fewer, smaller events
 }
 
 export interface StreamResponse {
-  type: 'start' | 'update' | 'final' | 'error';
+  type: 'start' | 'queued' | 'update' | 'final' | 'error';
   request_id?: string;
+  position?: number; // queue position while waiting for the model ('queued' events)
   node?: string;
   value?: string;
   error?: string;
@@ -9,8 +9,14 @@ from mcp.server.fastmcp.prompts import base
 import json
 import datetime
 import argparse
+import os
 import sys
 
+# Shares the backend's per-thread workspace (WORKSPACE_ROOT), so pages written here show up at /page
+# (and reach /page/events subscribers through the backend's revision log polling, PAGE_EVENTS_POLL_SECONDS)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+from agents.utils.workspace import DEFAULT_THREAD_ID, workspace
+
 # Create an MCP server
 mcp = FastMCP("Demo Server")
 
@@ -49,10 +55,9 @@ def calculate_bmi(weight_kg: float, height_m: float) -> str:
     return f"BMI: {bmi:.2f} ({category})"
 
 @mcp.tool()
-def write_html_content(html_content: str) -> str:
-    """Write the HTML content to the file"""
-    with open("/Users/<user>/LlamaBot/page.html", "w") as f:
-        f.write(html_content)
+def write_html_content(html_content: str, thread_id: str = DEFAULT_THREAD_ID) -> str:
+    """Write the HTML content to the conversation's page.html"""
+    workspace.write(thread_id, "page.html", html_content)
     return f"HTML content: {html_content} is now written to the file."
 
 # Resources